@@ -1,13 +1,8 @@
 import re
 import math
 import numpy as np
-from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
-import matplotlib.pyplot as plt
 import color_hists
-
-histogram_dict = color_hists.histograms
-keys_sorted = sorted(list(histogram_dict.keys()), key=lambda x: int(re.match(r'split_(\d+)_\d+_iframe_\d+\.jpg', x).group(1)))
-histograms_sorted = [np.concatenate((histogram_dict[key][0], histogram_dict[key][1], histogram_dict[key][2])) for key in keys_sorted]
+from coarse_to_fine import coarse_to_fine_search
 
 def calculate_program_boundary(group1_keys, group2_keys):
     """
@@ -40,9 +35,18 @@ def calculate_program_boundary(group1_keys, group2_keys):
     
     return program_boundary
 
-def compute_sliding_lda_scores_with_windows(histograms, keys, window_size=1000):
+def compute_sliding_lda_scores_with_windows(histograms, keys, window_size=1000, start_indices=None):
+    """
+    Fits an LDA on each pair of adjacent windows and uses its accuracy as the score.
+    If "start_indices" is given (for example the candidates from audio_features.py), only the
+    windows starting at those indices are scored.
+    """
+    from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+
     lda_scores_with_windows = []
-    for start_index in range(len(histograms) - 2 * window_size + 1):
+    if start_indices is None:
+        start_indices = range(len(histograms) - 2 * window_size + 1)
+    for start_index in start_indices:
         group1_histograms = histograms[start_index:start_index + window_size]
         group2_histograms = histograms[start_index + window_size:start_index + 2 * window_size]
         
@@ -64,20 +68,44 @@ def compute_sliding_lda_scores_with_windows(histograms, keys, window_size=1000):
     return lda_scores_with_windows
 
 
-def plot_low_lda_scores(lda_scores_with_windows, threshold):
+def compute_lda_coarse_to_fine(histograms, keys, window_size=1000, stride=100, radius=None, height=0.98,
+                               max_candidates=20, coarse_indices=None, verbose=False):
+    """
+    Computes sliding LDA scores with a coarse-to-fine search: first every "stride"-th window (or the windows
+    at "coarse_indices", for example coarse_to_fine.shot_start_indices(keys)), then all windows within
+    "radius" of the coarse peaks above "height" (the high-score threshold of "main"). See coarse_to_fine.py
+    for the recall settings; "verbose" prints the number of scored windows.
+
+    Returns (start_indices, lda_scores_with_windows): the scored window indices (not contiguous) and the
+    tuples of "compute_sliding_lda_scores_with_windows" for them. Pass the start indices to the plot functions.
+    """
+    n_windows = len(histograms) - 2 * window_size + 1
+    score_windows = lambda start_indices: compute_sliding_lda_scores_with_windows(histograms, keys, window_size,
+                                                                                  start_indices)
+    return coarse_to_fine_search(score_windows, n_windows, stride=stride, radius=radius, height=height,
+                                 max_candidates=max_candidates, coarse_indices=coarse_indices, verbose=verbose)
+
+
+def plot_low_lda_scores(lda_scores_with_windows, threshold, start_indices=None):
+    import matplotlib.pyplot as plt
+
+    # Window index of every score (the output of "compute_lda_coarse_to_fine" is not contiguous)
+    indices = list(range(len(lda_scores_with_windows)) if start_indices is None else start_indices)
+
     # Extract LDA scores
     lda_scores = [score for _, score, _, _ in lda_scores_with_windows]
     
     # Find the indices and program boundaries of scores below the threshold
-    indices_below_threshold = [i for i, score in enumerate(lda_scores) if score <= threshold]
-    boundaries_below_threshold = [calculate_program_boundary(lda_scores_with_windows[i][2], lda_scores_with_windows[i][3]) for i in indices_below_threshold]
-    scores_below_threshold = [lda_scores[i] for i in indices_below_threshold]
+    positions_below_threshold = [i for i, score in enumerate(lda_scores) if score <= threshold]
+    boundaries_below_threshold = [calculate_program_boundary(lda_scores_with_windows[i][2], lda_scores_with_windows[i][3]) for i in positions_below_threshold]
+    scores_below_threshold = [lda_scores[i] for i in positions_below_threshold]
+    indices_below_threshold = [indices[i] for i in positions_below_threshold]
 
     # Create a figure and axis for the plot
     fig, ax = plt.subplots(figsize=(10, 6))
 
     # Plot all the LDA scores
-    ax.plot(range(len(lda_scores)), lda_scores, marker='o', linestyle='-', color='b', label='LDA Score')
+    ax.plot(indices, lda_scores, marker='o', linestyle='-', color='b', label='LDA Score')
 
     # Highlight the points below the threshold
     ax.scatter(indices_below_threshold, scores_below_threshold, color='r', s=50, zorder=5, label=f'Scores ≤ {threshold}')
@@ -99,27 +127,33 @@ def plot_low_lda_scores(lda_scores_with_windows, threshold):
     plt.show()
 
 
-def plot_high_lda_scores(lda_scores_with_windows, threshold):
+def plot_high_lda_scores(lda_scores_with_windows, threshold, start_indices=None):
     """
     Plots the LDA scores that are above the specified threshold, highlighting these points on the graph.
 
     Parameters:
     - lda_scores_with_windows: A list of tuples containing information about LDA scores and the corresponding frame groups.
     - threshold: The threshold above which LDA scores will be plotted.
+    - start_indices: Window index of every score, for the output of "compute_lda_coarse_to_fine" (default 0, 1, 2, ...).
     """
+    import matplotlib.pyplot as plt
+
+    indices = list(range(len(lda_scores_with_windows)) if start_indices is None else start_indices)
+
     # Extract LDA scores
     lda_scores = [score for _, score, _, _ in lda_scores_with_windows]
 
     # Find the indices and program boundaries of scores above the threshold
-    indices_above_threshold = [i for i, score in enumerate(lda_scores) if score > threshold]
-    scores_above_threshold = [lda_scores[i] for i in indices_above_threshold]
-    program_boundaries = [calculate_program_boundary(lda_scores_with_windows[i][2], lda_scores_with_windows[i][3]) for i in indices_above_threshold]
+    positions_above_threshold = [i for i, score in enumerate(lda_scores) if score > threshold]
+    scores_above_threshold = [lda_scores[i] for i in positions_above_threshold]
+    program_boundaries = [calculate_program_boundary(lda_scores_with_windows[i][2], lda_scores_with_windows[i][3]) for i in positions_above_threshold]
+    indices_above_threshold = [indices[i] for i in positions_above_threshold]
 
     # Create a figure and axis for the plot
     fig, ax = plt.subplots(figsize=(10, 6))
 
     # Plot all the LDA scores
-    ax.plot(range(len(lda_scores)), lda_scores, marker='o', linestyle='-', color='b', label='LDA Score')
+    ax.plot(indices, lda_scores, marker='o', linestyle='-', color='b', label='LDA Score')
     
     # Highlight the points above the threshold
     ax.scatter(indices_above_threshold, scores_above_threshold, color='r', s=50, zorder=5, label=f'Scores > {threshold}')
@@ -172,26 +206,32 @@ def print_high_lda_scores(lda_scores_with_windows, threshold):
                 print(f"Error processing frame range: {start_frame}-{end_frame}, with score: {score}")
                 print(str(e))
 
-lda_scores_with_windows = compute_sliding_lda_scores_with_windows(histograms_sorted, keys_sorted, window_size=40)
+def main():
+    # Folder containing the i-frame images for a video.
+    video = "DS782_722374D-DGS00Z03UDY"
+    folder = f"../../data/4_i_frames/{video}"
+    keys_sorted, histograms_sorted = color_hists.sort_histograms(color_hists.compute_histograms(folder))
 
-for start_frame, score, window_keys_group1, window_keys_group2 in lda_scores_with_windows[300:320]:
-    print(80*'-')
-    print(f"Comparison starting at frame {start_frame}: LDA score = {score}")
-    print(f"\nGroup 1 contains: {', '.join(window_keys_group1)}")
-    print(f"\nGroup 2 contains: {', '.join(window_keys_group2)}")
-    
-    # Calculate and print the program boundary
-    program_boundary = calculate_program_boundary(window_keys_group1, window_keys_group2)
-    print(f"\nProgram Boundary: {program_boundary}")
-    print(80*'-')
+    lda_scores_with_windows = compute_sliding_lda_scores_with_windows(histograms_sorted, keys_sorted, window_size=40)
 
-plot_low_lda_scores(lda_scores_with_windows, threshold =0.89)
-print_low_lda_scores(lda_scores_with_windows,threshold =0.89)
+    for start_frame, score, window_keys_group1, window_keys_group2 in lda_scores_with_windows[300:320]:
+        print(80*'-')
+        print(f"Comparison starting at frame {start_frame}: LDA score = {score}")
+        print(f"\nGroup 1 contains: {', '.join(window_keys_group1)}")
+        print(f"\nGroup 2 contains: {', '.join(window_keys_group2)}")
 
-plot_high_lda_scores(lda_scores_with_windows, threshold =0.98)
-print_high_lda_scores(lda_scores_with_windows,threshold =0.98)
+        # Calculate and print the program boundary
+        program_boundary = calculate_program_boundary(window_keys_group1, window_keys_group2)
+        print(f"\nProgram Boundary: {program_boundary}")
+        print(80*'-')
 
-# plot_five_highest_lda_scores(lda_scores_with_windows)
+    plot_low_lda_scores(lda_scores_with_windows, threshold =0.89)
+    print_low_lda_scores(lda_scores_with_windows,threshold =0.89)
 
+    plot_high_lda_scores(lda_scores_with_windows, threshold =0.98)
+    print_high_lda_scores(lda_scores_with_windows,threshold =0.98)
 
+    # plot_five_highest_lda_scores(lda_scores_with_windows)
 
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,3 @@
-from moviepy.editor import VideoFileClip
 import os
 
 def split_video_by_frames(video_folder_path, video_name, scenes_txt, output_dir):
@@ -15,6 +14,8 @@ def split_video_by_frames(video_folder_path, video_name, scenes_txt, output_dir)
     separated by a space. This function will create a subdirectory in the output directory
     named after the video file (without its extension) where all the video segments will be saved.
     """
+    from moviepy.editor import VideoFileClip
+
     video_path = os.path.join(video_folder_path, video_name)
     video = VideoFileClip(video_path)
     
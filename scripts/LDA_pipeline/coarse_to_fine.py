@@ -0,0 +1,127 @@
+"""
+Coarse-to-fine search for program boundaries with the sliding window scorers (fisher_score.py, LDA_hist.py).
+
+Program boundaries are rare (a handful per tape), so scoring every window start index at full resolution
+is mostly wasted work. This module:
+    1. scores a strided sequence of windows (every "stride"-th start index),
+    2. finds the peaks in the coarse score curve,
+    3. rescores at full resolution only in a neighborhood of "radius" start indices around each peak.
+
+Recall settings:
+    - stride: smaller is safer. Sliding window scores change slowly at the scale of the window size,
+      so a stride of at most window_size / 4 keeps every clear boundary visible in the coarse curve.
+    - radius: defaults to the stride (or the largest gap between custom coarse indices), so every index
+      between a coarse peak and its neighboring coarse samples is rescored and the full-resolution
+      maximum cannot fall between the cracks.
+    - height: minimum coarse score of a candidate peak. The wrappers default to the peak thresholds of
+      their scripts; None keeps every local maximum.
+    - max_candidates: keep only the highest coarse peaks (default 20, a generous number of program
+      boundaries per tape). On a noisy curve about a third of the coarse samples are local maxima, so
+      without a limit the fine pass rescans most windows. None keeps all of them.
+    - coarse_indices: instead of a stride, score one window per shot (see "shot_start_indices").
+    - verbose: print how many windows were scored (coarse and refined), to tune the settings above.
+
+Input:
+    - score_windows: a scorer restricted to given start indices, returning the usual list of tuples
+      (start_frame, score, group1_keys, group2_keys). See "compute_fisher_coarse_to_fine" and
+      "compute_lda_coarse_to_fine" for the wrappers around the existing scorers.
+
+Output:
+    - (start_indices, scores): the scored start indices (sorted, not contiguous) and the list of tuples in
+      the same format as the scorers, in the same order. Pass the start indices to the print and plot
+      functions of the scorers, so peaks are reported at their window index.
+"""
+
+import re
+import numpy as np
+
+
+def refine_neighborhoods(peaks, radius, n_windows):
+    """
+    Returns the sorted, unique start indices within "radius" of any of the peaks.
+
+    Parameters:
+    - peaks (array-like): Start indices of the candidate peaks.
+    - radius (int): Number of start indices on each side of a peak to rescore.
+    - n_windows (int): Total number of windows at full resolution.
+
+    Returns:
+    - numpy.ndarray: The start indices to rescore.
+    """
+    peaks = np.asarray(peaks, dtype=int)
+    if len(peaks) == 0:
+        return np.zeros(0, dtype=int)
+    offsets = np.arange(-radius, radius + 1)
+    indices = (peaks[:, None] + offsets[None, :]).ravel()
+    return np.unique(indices[(indices >= 0) & (indices < n_windows)])
+
+
+def shot_start_indices(keys):
+    """
+    Returns the index of the first image of every shot, for a per-shot coarse pass.
+
+    Parameters:
+    - keys (list): Sorted image names (split_{start}_{end}_iframe_{n}.jpg or split_{start}_{end}_frame_{n}.jpg).
+    """
+    shots = [re.match(r'split_(\d+)_(\d+)_', key).groups() for key in keys]
+    return np.array([i for i in range(len(shots)) if i == 0 or shots[i] != shots[i - 1]], dtype=int)
+
+
+def coarse_to_fine_search(score_windows, n_windows, stride=10, radius=None, height=None, max_candidates=20,
+                          coarse_indices=None, verbose=False):
+    """
+    Scores a strided sequence of windows, then rescores at full resolution around the coarse peaks.
+
+    Parameters:
+    - score_windows (callable): Takes an array of start indices and returns a list of tuples
+                                (start_frame, score, group1_keys, group2_keys) in the same order.
+    - n_windows (int): Total number of windows at full resolution.
+    - stride (int): Distance between the start indices of the coarse pass.
+    - radius (int, optional): Neighborhood rescored around each coarse peak. Defaults to the largest
+                              distance between two coarse start indices.
+    - height (float, optional): Minimum coarse score of a candidate peak.
+    - max_candidates (int, optional): Maximum number of coarse peaks to refine, highest scores first
+                                      (None: all of them).
+    - coarse_indices (array-like, optional): Start indices of the coarse pass, for example the index of the
+                                             first frame of every shot. Overrides "stride" for the coarse pass.
+    - verbose (bool): Print the number of scored windows.
+
+    Returns:
+    - (start_indices, scores): numpy array of the scored start indices (sorted, each once) and the list of
+      coarse and refined tuples in the same order.
+    """
+    from scipy.signal import find_peaks
+
+    if n_windows <= 0:
+        return np.zeros(0, dtype=int), []
+    if coarse_indices is None:
+        coarse_indices = np.arange(0, n_windows, stride)
+    coarse_indices = np.unique(np.asarray(coarse_indices, dtype=int))
+    coarse_indices = coarse_indices[(coarse_indices >= 0) & (coarse_indices < n_windows)]
+    if len(coarse_indices) == 0 or coarse_indices[-1] != n_windows - 1:
+        coarse_indices = np.append(coarse_indices, n_windows - 1)
+    if radius is None:
+        radius = int(np.max(np.diff(coarse_indices))) if len(coarse_indices) > 1 else stride
+
+    results = dict(zip(coarse_indices.tolist(), score_windows(coarse_indices)))
+    coarse_scores = np.array([results[i][1] for i in coarse_indices], dtype=float)
+
+    # Pad with -inf so that peaks at the very start or end of the tape are found as well
+    padded = np.concatenate(([-np.inf], np.nan_to_num(coarse_scores, nan=-np.inf), [-np.inf]))
+    peaks, _ = find_peaks(padded, height=height)
+    peaks = peaks - 1
+
+    if max_candidates is not None and len(peaks) > max_candidates:
+        peaks = peaks[np.argsort(coarse_scores[peaks])[::-1][:max_candidates]]
+
+    fine_indices = refine_neighborhoods(coarse_indices[peaks], radius, n_windows)
+    fine_indices = np.array([i for i in fine_indices.tolist() if i not in results], dtype=int)
+    if len(fine_indices):
+        results.update(zip(fine_indices.tolist(), score_windows(fine_indices)))
+
+    if verbose:
+        print(f"Coarse-to-fine: scored {len(results)}/{n_windows} windows "
+              f"({len(coarse_indices)} coarse, {len(fine_indices)} refined around {len(peaks)} peaks).")
+
+    start_indices = np.array(sorted(results), dtype=int)
+    return start_indices, [results[i] for i in start_indices.tolist()]
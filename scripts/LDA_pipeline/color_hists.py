@@ -8,35 +8,46 @@ Output:
     - "histograms"
         - type: dictionary
         - keys: image names
-        - value: color histogram 
+        - value: color histogram (with "compact", only the luminance histogram for black-and-white images)
 """
 
 
 import os
+import re
+import sys
 from PIL import Image
 import numpy as np
-import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_features import compact_histogram, expand_histogram
 
 
 # Function to calculate the histogram of an image
-def calculate_histogram(image_path):
+def calculate_histogram(image_path, compact=False):
     """
     Calculate and return the color histogram of the image.
     
     Args:
     - image_path: The path to the image file.
+    - compact: Return only the luminance histogram for black-and-white images, in the smallest dtype
+               that fits (see frame_features.compact_histogram).
     
     Returns:
-    - A tuple of histograms for each color channel (red, green, blue).
+    - A tuple of histograms for each color channel (red, green, blue), or (luminance,) for a compact
+      black-and-white image.
     """
     with Image.open(image_path) as img:
         # Convert the image to RGB if it's not
         img = img.convert('RGB')
+
+        if compact:
+            return compact_histogram(np.asarray(img))
         
         # Calculate the histogram for each color channel
-        red_hist = np.array(img.histogram()[0:256])
-        green_hist = np.array(img.histogram()[256:512])
-        blue_hist = np.array(img.histogram()[512:768])
+        histogram = img.histogram()
+        red_hist = np.array(histogram[0:256])
+        green_hist = np.array(histogram[256:512])
+        blue_hist = np.array(histogram[512:768])
         
         return red_hist, green_hist, blue_hist
     
@@ -47,6 +58,8 @@ def plot_histogram(image_path):
     Args:
     - image_path: The path to the image file.
     """
+    import matplotlib.pyplot as plt
+
     with Image.open(image_path) as img:
         # Convert the image to RGB
         img = img.convert('RGB')
@@ -66,25 +79,56 @@ def plot_histogram(image_path):
         plt.ylabel('Frequency')
         plt.show()
 
-# Dictionary to hold histograms for each image
-histograms = {}
+def compute_histograms(folder, compact=False):
+    """
+    Calculates the color histograms of all .jpg images in a folder.
 
-# Folder containing the i-frame images for a video.
-video = "DS782_722374D-DGS00Z03UDY" 
-folder = f"../../data/4_i_frames/{video}"
+    Args:
+    - folder: The folder with the (i-frame) images of a video.
+    - compact: Store black-and-white images as luminance histograms (see "calculate_histogram").
 
-# Iterate through the files in the folder
-for filename in os.listdir(folder):
-    if filename.endswith(".jpg"):
-        # Construct the full path to the file
-        file_path = os.path.join(folder, filename)
-        
-        # Calculate the histogram
-        histograms[filename] = calculate_histogram(file_path)
+    Returns:
+    - A dictionary with the image names as keys and the histograms as values.
+    """
+    histograms = {}
+
+    # Iterate through the files in the folder
+    for filename in os.listdir(folder):
+        if filename.endswith(".jpg"):
+            # Construct the full path to the file
+            file_path = os.path.join(folder, filename)
+
+            # Calculate the histogram
+            histograms[filename] = calculate_histogram(file_path, compact)
+
+    return histograms
+
+def sort_histograms(histograms):
+    """
+    Sorts the histograms by start frame and concatenates the channels of each histogram (luminance
+    histograms are repeated for the three channels).
+
+    Args:
+    - histograms: The dictionary returned by "compute_histograms".
+
+    Returns:
+    - A tuple (keys_sorted, histograms_sorted): the sorted image names and the 768-bin histograms.
+    """
+    keys_sorted = sorted(list(histograms.keys()), key=lambda x: int(re.match(r'split_(\d+)_\d+_iframe_\d+\.jpg', x).group(1)))
+    histograms_sorted = [expand_histogram(histograms[key]) for key in keys_sorted]
+    return keys_sorted, histograms_sorted
+
+def main():
+    # Folder containing the i-frame images for a video.
+    video = "DS782_722374D-DGS00Z03UDY" 
+    folder = f"../../data/4_i_frames/{video}"
 
-#print(histograms['split_0_41_iframe_001.jpg'])
+    histograms = compute_histograms(folder)
 
-# At this point, `histograms` contains the color histograms for each image
-print(f"Calculated histograms for {len(histograms)} images.")
+    #print(histograms['split_0_41_iframe_001.jpg'])
 
+    # At this point, `histograms` contains the color histograms for each image
+    print(f"Calculated histograms for {len(histograms)} images.")
 
+if __name__ == '__main__':
+    main()
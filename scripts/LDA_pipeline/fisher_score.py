@@ -17,10 +17,8 @@ Output:
 import re
 import math
 import numpy as np
-from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
-import matplotlib.pyplot as plt
 import color_hists
-from scipy.signal import find_peaks
+from coarse_to_fine import coarse_to_fine_search
 
 def calculate_program_boundary(group1_keys, group2_keys):
     """
@@ -46,7 +44,7 @@ def calculate_program_boundary(group1_keys, group2_keys):
     
     return program_boundary
 
-def compute_fisher(histograms, keys, window_size=40):
+def compute_fisher(histograms, keys, window_size=40, start_indices=None):
     """
     Computes Fisher scores for each window of histograms to determine significant changes
     in image content, potentially indicating a program boundary.
@@ -55,6 +53,8 @@ def compute_fisher(histograms, keys, window_size=40):
     - histograms (list): A list of histogram arrays for sequential images.
     - keys (list): A list of image filenames corresponding to the histograms.
     - window_size (int): The number of histograms to include in each comparison window.
+    - start_indices (iterable, optional): Only score the windows starting at these indices, for example
+                                          the candidates from audio_features.py. Scores all windows if None.
 
     Returns:
     - list: A list of tuples containing the start frame, Fisher score, and the keys for
@@ -63,8 +63,11 @@ def compute_fisher(histograms, keys, window_size=40):
     
     fisher_score = []
     
+    if start_indices is None:
+        start_indices = range(len(histograms) - 2 * window_size + 1)
+    
     # Sliding window implementation
-    for start_index in range(len(histograms) - 2 * window_size + 1):
+    for start_index in start_indices:
         group1_histograms = histograms[start_index:start_index + window_size]
         group2_histograms = histograms[start_index + window_size:start_index + 2 * window_size]
         
@@ -92,6 +95,34 @@ def compute_fisher(histograms, keys, window_size=40):
         
     return fisher_score
 
+
+def compute_fisher_coarse_to_fine(histograms, keys, window_size=40, stride=10, radius=None, height=0.3,
+                                  max_candidates=20, coarse_indices=None, verbose=False):
+    """
+    Computes Fisher scores with a coarse-to-fine search: first every "stride"-th window, then all
+    windows within "radius" of the coarse peaks. See coarse_to_fine.py for the recall settings.
+
+    Parameters:
+    - histograms (list): A list of histogram arrays for sequential images.
+    - keys (list): A list of image filenames corresponding to the histograms.
+    - window_size (int): The number of histograms to include in each comparison window.
+    - stride (int): Distance between the windows of the coarse pass.
+    - radius (int, optional): Number of windows rescored on each side of a coarse peak.
+    - height (float, optional): Minimum coarse Fisher score of a peak (the threshold of "plot_fisher_score_peaks").
+    - max_candidates (int, optional): Maximum number of coarse peaks to refine.
+    - coarse_indices (array-like, optional): Start indices of the coarse pass instead of the stride, for
+                                             example coarse_to_fine.shot_start_indices(keys).
+    - verbose (bool): Print the number of scored windows.
+
+    Returns:
+    - (start_indices, fisher_score): the scored window indices (not contiguous) and the same tuples as
+      "compute_fisher" for those windows. Pass the start indices to the print and plot functions.
+    """
+    n_windows = len(histograms) - 2 * window_size + 1
+    score_windows = lambda start_indices: compute_fisher(histograms, keys, window_size, start_indices)
+    return coarse_to_fine_search(score_windows, n_windows, stride=stride, radius=radius, height=height,
+                                 max_candidates=max_candidates, coarse_indices=coarse_indices, verbose=verbose)
+
     
 def print_low_fisher_scores(fisher_score, threshold=0.05):
     """
@@ -109,14 +140,20 @@ def print_low_fisher_scores(fisher_score, threshold=0.05):
         if score <= threshold:
             print(f"Start frame: {start_frame}, LDA score: {score}")
             
-def print_fisher_score_peaks(fisher_score):
+def print_fisher_score_peaks(fisher_score, start_indices=None):
     """
     Identifies and prints the peaks in LDA scores along with the calculated program boundaries for these peaks.
 
     Parameters:
     - fisher_score (list): A list of tuples containing information about LDA scores and the
                            corresponding frame groups.
+    - start_indices (array-like, optional): Window index of every score, for the sparse output of
+                                            "compute_fisher_coarse_to_fine". Defaults to 0, 1, 2, ...
     """
+    from scipy.signal import find_peaks
+
+    if start_indices is None:
+        start_indices = range(len(fisher_score))
     
     lda_scores = [score for _, score, _, _ in fisher_score]
 
@@ -129,10 +166,10 @@ def print_fisher_score_peaks(fisher_score):
 
     print("Peaks in LDA scores:")
     for i, peak in enumerate(peaks):
-        print(f"Peak at index {peak} (Program Boundary: {program_boundaries[i]}), LDA score: {peak_scores[i]}")
+        print(f"Peak at index {start_indices[peak]} (Program Boundary: {program_boundaries[i]}), LDA score: {peak_scores[i]}")
 
 
-def plot_fisher_score_peaks(fisher_score):
+def plot_fisher_score_peaks(fisher_score, start_indices=None):
     """
     Plots the Fisher (LDA) scores over a sequence of images and highlights the peaks, which
     may indicate significant content changes or transitions.
@@ -140,17 +177,22 @@ def plot_fisher_score_peaks(fisher_score):
     Parameters:
     - fisher_score (list): A list of tuples containing information about LDA scores and the
                            corresponding frame groups.
+    - start_indices (array-like, optional): Window index of every score (see "print_fisher_score_peaks").
     """
     
+    import matplotlib.pyplot as plt
+    from scipy.signal import find_peaks
+
     lda_scores = [score for _, score, _, _ in fisher_score]
-    indices = range(len(lda_scores))
+    indices = list(range(len(lda_scores)) if start_indices is None else start_indices)
 
     # Find peaks in the LDA scores
-    peaks, _ = find_peaks(lda_scores, height=0.3)
-    peak_scores = [lda_scores[i] for i in peaks]
+    peak_positions, _ = find_peaks(lda_scores, height=0.3)
+    peak_scores = [lda_scores[i] for i in peak_positions]
+    peaks = [indices[i] for i in peak_positions]
 
     # Calculate program boundaries for the peaks
-    program_boundaries = [calculate_program_boundary(fisher_score[i][2], fisher_score[i][3]) for i in peaks]
+    program_boundaries = [calculate_program_boundary(fisher_score[i][2], fisher_score[i][3]) for i in peak_positions]
 
     # Create a figure and axis for the plot
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -176,7 +218,7 @@ def plot_fisher_score_peaks(fisher_score):
     plt.tight_layout()
     plt.show()
 
-def plot_threshold_fisher_scores(fisher_score, threshold, score_type='high'):
+def plot_threshold_fisher_scores(fisher_score, threshold, score_type='high', start_indices=None):
     """
     Plots LDA scores, highlighting scores above or below a certain threshold.
     
@@ -185,7 +227,12 @@ def plot_threshold_fisher_scores(fisher_score, threshold, score_type='high'):
     - threshold (float): The threshold above or below which to highlight LDA scores.
     - score_type (str): Determines whether to highlight scores above ('high') or below ('low')
                         the threshold.
+    - start_indices (array-like, optional): Window index of every score (see "print_fisher_score_peaks").
     """
+    import matplotlib.pyplot as plt
+
+    indices = list(range(len(fisher_score)) if start_indices is None else start_indices)
+
     # Extract LDA scores
     lda_scores = [score for _, score, _, _ in fisher_score]
 
@@ -201,18 +248,19 @@ def plot_threshold_fisher_scores(fisher_score, threshold, score_type='high'):
 
     threshold_scores = [lda_scores[i] for i in indices_of_threshold_scores]
     program_boundaries = [calculate_program_boundary(fisher_score[i][2], fisher_score[i][3]) for i in indices_of_threshold_scores]
+    threshold_indices = [indices[i] for i in indices_of_threshold_scores]
 
     # Create a figure and axis for the plot
     fig, ax = plt.subplots(figsize=(10, 6))
 
     # Plot all the LDA scores
-    ax.plot(range(len(lda_scores)), lda_scores, marker='o', linestyle='-', color='b', label='LDA Score')
+    ax.plot(indices, lda_scores, marker='o', linestyle='-', color='b', label='LDA Score')
     
     # Highlight the scores based on the threshold
-    ax.scatter(indices_of_threshold_scores, threshold_scores, color='r', s=50, zorder=5, label=f'Scores {extreme_label} Threshold')
+    ax.scatter(threshold_indices, threshold_scores, color='r', s=50, zorder=5, label=f'Scores {extreme_label} Threshold')
 
     # Setting the x-axis ticks to the program boundaries of the scores based on the threshold
-    ax.set_xticks(indices_of_threshold_scores)
+    ax.set_xticks(threshold_indices)
     ax.set_xticklabels(program_boundaries, rotation=45, ha='right')
 
     # Adding labels and title
@@ -227,34 +275,37 @@ def plot_threshold_fisher_scores(fisher_score, threshold, score_type='high'):
     plt.tight_layout()
     plt.show()
 
-#main
-# Loading histograms and preparing data
-histogram_dict = color_hists.histograms
-keys_sorted = sorted(list(histogram_dict.keys()), key=lambda x: int(re.match(r'split_(\d+)_\d+_iframe_\d+\.jpg', x).group(1)))
-histograms_sorted = [np.concatenate((histogram_dict[key][0], histogram_dict[key][1], histogram_dict[key][2])) for key in keys_sorted]
-
-
-#Print score in range
-# for start_frame, score, window_keys_group1, window_keys_group2 in fisher_score[300:320]:
-#     print(80*'-')
-#     print(f"Comparison starting at frame {start_frame}: LDA score = {score}")
-#     print(f"\nGroup 1 contains: {', '.join(window_keys_group1)}")
-#     print(f"\nGroup 2 contains: {', '.join(window_keys_group2)}")
-    
-#     # Calculate and print the program boundary
-#     program_boundary = calculate_program_boundary(window_keys_group1, window_keys_group2)
-#     print(f"\nProgram Boundary: {program_boundary}")
-#     print(80*'-')
-
+def main():
+    # Loading histograms and preparing data
+    # Folder containing the i-frame images for a video.
+    video = "DS782_722374D-DGS00Z03UDY"
+    folder = f"../../data/4_i_frames/{video}"
+    keys_sorted, histograms_sorted = color_hists.sort_histograms(color_hists.compute_histograms(folder))
 
-#Example usage and plotting
-threshold = 0.4
-fisher_score = compute_fisher(histograms_sorted, keys_sorted)
-print_low_fisher_scores(fisher_score, threshold = threshold)
-plot_threshold_fisher_scores(fisher_score, threshold = threshold, score_type='high') #adjust "score_type" if you want to plot the lowest points instead of the highest.
-print_fisher_score_peaks(fisher_score)
-# plot_fisher_score_peaks(fisher_score)
 
+    #Print score in range
+    # for start_frame, score, window_keys_group1, window_keys_group2 in fisher_score[300:320]:
+    #     print(80*'-')
+    #     print(f"Comparison starting at frame {start_frame}: LDA score = {score}")
+    #     print(f"\nGroup 1 contains: {', '.join(window_keys_group1)}")
+    #     print(f"\nGroup 2 contains: {', '.join(window_keys_group2)}")
+        
+    #     # Calculate and print the program boundary
+    #     program_boundary = calculate_program_boundary(window_keys_group1, window_keys_group2)
+    #     print(f"\nProgram Boundary: {program_boundary}")
+    #     print(80*'-')
+
+
+    #Example usage and plotting
+    threshold = 0.4
+    fisher_score = compute_fisher(histograms_sorted, keys_sorted)
+    print_low_fisher_scores(fisher_score, threshold = threshold)
+    plot_threshold_fisher_scores(fisher_score, threshold = threshold, score_type='high') #adjust "score_type" if you want to plot the lowest points instead of the highest.
+    print_fisher_score_peaks(fisher_score)
+    # plot_fisher_score_peaks(fisher_score)
+
+if __name__ == '__main__':
+    main()
 
 
 
@@ -11,11 +11,32 @@ Output:
 
 Note:
     - there can be multiple images for one shot video. 
+    - "process_videos_async" runs several FFmpeg processes at once (each with a fixed number of threads),
+      retries failed or hung jobs and reports the throughput while it runs. Use it for folders with
+      thousands of shot videos.
     
 """
 
 import os
+import time
+import asyncio
 import subprocess
+from collections import deque
+
+
+def iframe_command(video_path, output_path_pattern, threads=None):
+    # FFmpeg command that extracts the I-frames of a video (only errors on stderr, no progress stats)
+    cmd = ["ffmpeg", "-nostats", "-loglevel", "error"]
+    if threads is not None:
+        cmd += ["-threads", str(threads)]
+    cmd += [
+        "-i", video_path,
+        "-vf", "select='eq(pict_type,PICT_TYPE_I)'",
+        "-vsync", "vfr",
+    ]
+    if threads is not None:
+        cmd += ["-threads", str(threads)]
+    return cmd + [output_path_pattern]
 
 
 def process_videos(input_folder, output_folder):
@@ -30,13 +51,7 @@ def process_videos(input_folder, output_folder):
             output_path_pattern = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}_iframe_%03d.jpg")
     
             # Use FFmpeg to extract I-frames
-            cmd = [
-                "ffmpeg",
-                "-i", video_path,
-                "-vf", "select='eq(pict_type,PICT_TYPE_I)'",
-                "-vsync", "vfr",
-                output_path_pattern
-            ]
+            cmd = iframe_command(video_path, output_path_pattern)
     
             process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     
@@ -47,6 +62,116 @@ def process_videos(input_folder, output_folder):
                 print(f"I-frames extracted for {filename}.")
     
     print("I-frame extraction completed.")
+
+
+async def run_ffmpeg(cmd, timeout):
+    """
+    Runs one FFmpeg process. Stderr is read in fixed-size chunks (a progress line without a newline
+    can be longer than the stream reader limit) and only the last lines are kept for the error message.
+    The process is killed when it takes longer than "timeout" seconds.
+
+    Returns:
+    - (returncode, stderr_tail)
+    """
+    process = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.DEVNULL,
+                                                   stdout=asyncio.subprocess.DEVNULL,
+                                                   stderr=asyncio.subprocess.PIPE)
+    stderr_tail = deque(maxlen=20)
+
+    async def read_stderr():
+        pending = b""
+        while True:
+            chunk = await process.stderr.read(65536)
+            if not chunk:
+                break
+            *lines, pending = (pending + chunk).split(b"\n")
+            stderr_tail.extend(line.decode(errors="replace").rstrip() for line in lines)
+            pending = pending[-4096:]
+        if pending:
+            stderr_tail.append(pending.decode(errors="replace").rstrip())
+
+    try:
+        await asyncio.wait_for(asyncio.gather(read_stderr(), process.wait()), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        stderr_tail.append(f"Timed out after {timeout} seconds.")
+        return None, "\n".join(stderr_tail)
+    return process.returncode, "\n".join(stderr_tail)
+
+
+async def process_videos_async(input_folder, output_folder, max_jobs=None, threads_per_job=2, timeout=600,
+                               retries=2, report_every=5.0):
+    """
+    Extracts the I-frames of all shot videos in a folder with a bounded pool of FFmpeg processes.
+
+    Parameters:
+    - input_folder: Folder with the shot videos (.mp4).
+    - output_folder: Folder for the I-frame images.
+    - max_jobs: Maximum number of FFmpeg processes at the same time (default: cores // threads_per_job).
+    - threads_per_job: Value of FFmpeg's "-threads" for each process.
+    - timeout: Seconds after which a hung FFmpeg process is killed.
+    - retries: Number of times a failed or timed out job is retried.
+    - report_every: Seconds between two throughput reports.
+
+    Returns:
+    - list: The file names for which the extraction failed.
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    if max_jobs is None:
+        max_jobs = max(1, (os.cpu_count() or 1) // threads_per_job)
+
+    filenames = sorted(f for f in os.listdir(input_folder) if f.endswith(".mp4"))
+    # The queue is bounded, so the producer waits when all workers are busy
+    queue = asyncio.Queue(maxsize=2 * max_jobs)
+    failed = []
+    done = 0
+    start_time = time.monotonic()
+
+    async def worker():
+        nonlocal done
+        while True:
+            filename = await queue.get()
+            if filename is None:
+                queue.task_done()
+                return
+            video_path = os.path.join(input_folder, filename)
+            output_path_pattern = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}_iframe_%03d.jpg")
+            # "-y": a retry overwrites the images of a failed attempt instead of waiting for a prompt
+            cmd = iframe_command(video_path, output_path_pattern, threads_per_job)
+            cmd.insert(1, "-y")
+
+            for attempt in range(retries + 1):
+                returncode, stderr = await run_ffmpeg(cmd, timeout)
+                if returncode == 0:
+                    break
+            else:
+                failed.append(filename)
+                print(f"Error extracting I-frames for {filename}: {stderr}")
+            done += 1
+            queue.task_done()
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(report_every)
+            elapsed = time.monotonic() - start_time
+            rate = done / elapsed if elapsed else 0.0
+            remaining = (len(filenames) - done) / rate if rate else float("inf")
+            print(f"{done}/{len(filenames)} shot videos, {rate:.1f} videos/s, ~{remaining:.0f}s remaining.")
+
+    workers = [asyncio.create_task(worker()) for _ in range(max_jobs)]
+    report_task = asyncio.create_task(reporter())
+    for filename in filenames:
+        await queue.put(filename)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    report_task.cancel()
+
+    elapsed = time.monotonic() - start_time
+    print(f"I-frame extraction completed: {done - len(failed)}/{len(filenames)} videos in {elapsed:.1f}s.")
+    return failed
     
     
 def main():
@@ -56,7 +181,7 @@ def main():
     input_folder = f"../../data/3_MoviePy_segmentation/{video}"
     output_folder = f"../../data/4_i_frames/{video}"
     
-    process_videos(input_folder, output_folder)
+    asyncio.run(process_videos_async(input_folder, output_folder, threads_per_job=2))
     
 if __name__== '__main__':
     main()
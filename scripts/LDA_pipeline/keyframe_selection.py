@@ -0,0 +1,194 @@
+"""
+Selects informative keyframes from the I-frames of keyframe_FFMPEG.py, using perceptual hashes.
+
+Instead of keeping only "_iframe_001" of every shot (remove_img_!=001.py), every candidate gets a fast
+perceptual hash (dHash or pHash on a downscaled grayscale frame). Near-duplicates, within a shot and
+compared to the keyframes of the previous shot, are dropped by Hamming distance. Long shots keep their
+internal variation, static shots collapse to a single keyframe.
+
+Policies:
+    - "unique": keep every candidate that is not a near-duplicate of an already kept keyframe.
+    - "diverse": keep at most "n_per_shot" keyframes per shot, picked greedily to be as different as possible.
+    - "first": keep only the first I-frame of each shot (the old behaviour).
+
+Input:
+    - folder with I-frame images, named "split_{start}_{end}_iframe_{n}.jpg"
+
+Output:
+    - list of the selected image names, optionally copied to an output folder
+"""
+
+import os
+import re
+import shutil
+import numpy as np
+from PIL import Image
+from scipy.fft import dctn
+
+
+def dhash(image, hash_size=8):
+    """
+    Calculates the difference hash of an image: compares neighbouring pixels of a
+    (hash_size + 1) x hash_size grayscale thumbnail.
+
+    Args:
+    - image: PIL image.
+    - hash_size: The hash has hash_size * hash_size bits.
+
+    Returns:
+    - int: The hash as an integer.
+    """
+    pixels = np.asarray(image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def phash(image, hash_size=8, highfreq_factor=4):
+    """
+    Calculates the perceptual hash of an image: the signs of the low-frequency DCT coefficients of a
+    small grayscale thumbnail, compared to their median.
+
+    Args:
+    - image: PIL image.
+    - hash_size: The hash has hash_size * hash_size bits.
+    - highfreq_factor: The thumbnail is hash_size * highfreq_factor pixels wide and high.
+
+    Returns:
+    - int: The hash as an integer.
+    """
+    size = hash_size * highfreq_factor
+    pixels = np.asarray(image.convert('L').resize((size, size), Image.BILINEAR), dtype=np.float32)
+    low_frequencies = dctn(pixels, norm='ortho')[:hash_size, :hash_size]
+    bits = (low_frequencies > np.median(low_frequencies)).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+HASH_FUNCTIONS = {"dhash": dhash, "phash": phash}
+
+
+def hamming_distance(hash1, hash2):
+    """
+    Returns the number of bits in which two hashes differ.
+    """
+    return bin(hash1 ^ hash2).count('1')
+
+
+def compute_hashes(folder, method="dhash"):
+    """
+    Calculates the perceptual hash of every .jpg image in a folder.
+
+    Args:
+    - folder: The folder with the I-frame images.
+    - method: "dhash" or "phash".
+
+    Returns:
+    - A dictionary with the image names as keys and the hashes as values.
+    """
+    hash_function = HASH_FUNCTIONS[method]
+    hashes = {}
+    for filename in os.listdir(folder):
+        if filename.endswith(".jpg"):
+            with Image.open(os.path.join(folder, filename)) as img:
+                hashes[filename] = hash_function(img)
+    return hashes
+
+
+def group_by_shot(filenames):
+    """
+    Groups I-frame names by shot, in the order of the shots in the video.
+
+    Returns:
+    - A list of lists of image names, one list per shot, sorted by I-frame number.
+    """
+    shots = {}
+    for filename in filenames:
+        match = re.match(r'split_(\d+)_(\d+)_iframe_(\d+)\.jpg', filename)
+        shots.setdefault((int(match.group(1)), int(match.group(2))), []).append((int(match.group(3)), filename))
+    return [[filename for _, filename in sorted(shots[shot])] for shot in sorted(shots)]
+
+
+def _most_diverse(candidates, hashes, n, threshold):
+    """
+    Greedily picks up to n candidates, each time the one farthest from the already picked ones.
+    Stops early when the farthest candidate is a near-duplicate (distance <= threshold).
+    """
+    selected = [candidates[0]]
+    while len(selected) < n:
+        distances = [min(hamming_distance(hashes[c], hashes[s]) for s in selected) for c in candidates]
+        best = int(np.argmax(distances))
+        if distances[best] <= threshold:
+            break
+        selected.append(candidates[best])
+    return sorted(selected, key=candidates.index)
+
+
+def select_keyframes(hashes, policy="unique", threshold=10, n_per_shot=3, min_per_shot=1):
+    """
+    Selects keyframes by dropping near-duplicates within a shot and compared to the previous shot.
+
+    Args:
+    - hashes: A dictionary with image names as keys and perceptual hashes as values.
+    - policy: "unique", "diverse" or "first" (see module docstring).
+    - threshold: Images within this Hamming distance of a kept image are near-duplicates.
+    - n_per_shot: Maximum number of keyframes per shot for the "diverse" policy.
+    - min_per_shot: Keep at least this many keyframes per shot (0 lets a static shot that repeats the
+                    previous shot disappear completely).
+
+    Returns:
+    - A list of the selected image names, in video order.
+    """
+    selected = []
+    previous_kept = []
+
+    for shot in group_by_shot(hashes.keys()):
+        if policy == "first":
+            selected.append(shot[0])
+            continue
+
+        # Drop candidates that repeat a keyframe of the previous shot
+        candidates = [c for c in shot
+                      if all(hamming_distance(hashes[c], hashes[p]) > threshold for p in previous_kept)]
+        if not candidates:
+            candidates = shot[:min_per_shot]
+
+        if policy == "unique":
+            kept = []
+            for candidate in candidates:
+                if all(hamming_distance(hashes[candidate], hashes[k]) > threshold for k in kept):
+                    kept.append(candidate)
+        elif policy == "diverse":
+            kept = _most_diverse(candidates, hashes, n_per_shot, threshold) if candidates else []
+        else:
+            raise ValueError("policy must be 'unique', 'diverse' or 'first'")
+
+        selected.extend(kept)
+        previous_kept = kept or previous_kept
+
+    return selected
+
+
+def copy_keyframes(input_folder, output_folder, selected):
+    """
+    Copies the selected keyframes to the output folder.
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    for filename in selected:
+        shutil.copy2(os.path.join(input_folder, filename), os.path.join(output_folder, filename))
+
+
+def main():
+    # Input and output folder; adjust as needed.
+    video = "DS782_722374D-DGS00Z03UDY"
+    input_folder = f"../../data/4_i_frames/{video}"
+    output_folder = f"../../data/4_i_frames_selected/{video}"
+
+    hashes = compute_hashes(input_folder, method="dhash")
+    selected = select_keyframes(hashes, policy="diverse", threshold=10, n_per_shot=3)
+    copy_keyframes(input_folder, output_folder, selected)
+
+    print(f"Selected {len(selected)} of {len(hashes)} I-frames.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Optimal multiple change-point segmentation of histogram sequences with PELT.
+
+Instead of thresholding a sliding-window score (which depends on a fixed window size), PELT (Pruned Exact
+Linear Time, Killick et al. 2012) finds the set of boundaries that minimizes
+
+    sum of segment costs + penalty * number of boundaries
+
+exactly. The segment cost is the Gaussian mean-shift cost: the sum of squared deviations from the segment
+mean, computed in O(n_bins) from cumulative sums of the features and of their squares. Pruning drops
+candidate last-boundaries that can never become optimal, which gives near-linear expected time when the
+number of boundaries grows with the length of the sequence (a few long segments over a long tape keep many
+candidates alive).
+
+Penalty path: "penalty_path" finds all distinct optimal segmentations for penalties in a range with the
+CROPS algorithm (Haynes et al. 2017). It reuses the cumulative sums and every PELT run it has done, and
+needs only a few runs per distinct segmentation.
+
+Input:
+    - features: numpy array (n_frames, n_bins), for example the color histograms of color_hists.py /
+      color_hists_full_videos.py
+
+Output:
+    - list of boundary indices (index of the first row of each new segment)
+"""
+
+import numpy as np
+
+
+class MeanShiftCost:
+    """
+    Gaussian mean-shift segment cost from cumulative sums: cost(a, b) is the sum of squared deviations
+    of rows a..b-1 from their mean.
+    """
+
+    def __init__(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim == 1:
+            features = features[:, None]
+        zeros = np.zeros((1, features.shape[1]))
+        self.n = len(features)
+        self.sums = np.concatenate((zeros, np.cumsum(features, axis=0)))
+        self.squares = np.concatenate(([0.0], np.cumsum((features ** 2).sum(axis=1))))
+        # |sums[b] - sums[a]|^2 = norms[b] - 2 sums[a].sums[b] + norms[a]: one matrix-vector product per call
+        self.norms = (self.sums ** 2).sum(axis=1)
+
+    def cost(self, starts, end):
+        """
+        Costs of the segments starts[i]..end-1, for an array of start indices at once.
+        """
+        starts = np.asarray(starts)
+        lengths = end - starts
+        segment_norms = self.norms[end] - 2 * (self.sums[starts] @ self.sums[end]) + self.norms[starts]
+        return self.squares[end] - self.squares[starts] - segment_norms / lengths
+
+
+def pelt(features, penalty, min_size=2, cost=None):
+    """
+    Finds the optimal boundaries under a penalty with PELT.
+
+    Parameters:
+    - features (array-like): Array (n_frames, n_bins). Scale the features (for example normalize the
+                             histograms) so the penalty is meaningful.
+    - penalty (float): Cost of adding one boundary. Higher means fewer boundaries.
+    - min_size (int): Minimum number of rows of a segment.
+    - cost (MeanShiftCost, optional): Precomputed cost, to reuse the cumulative sums across runs.
+
+    Returns:
+    - (boundaries, total_cost): the sorted boundary indices, and the unpenalized cost of the segmentation.
+    """
+    cost = cost or MeanShiftCost(features)
+    n = cost.n
+
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    last_boundary = np.zeros(n + 1, dtype=int)
+    candidates = np.array([0])
+    # End at which each candidate was found to be dominated (n + 1: not yet)
+    pruned_at = np.array([n + 1])
+
+    for end in range(min_size, n + 1):
+        # Only start points that leave a segment of at least min_size rows
+        usable = end - candidates >= min_size
+        if usable.any():
+            costs = best[candidates[usable]] + cost.cost(candidates[usable], end)
+            totals = costs + penalty
+            best_index = int(np.argmin(totals))
+            best[end] = totals[best_index]
+            last_boundary[end] = candidates[usable][best_index]
+
+            # Pruning: a start point whose cost is already worse than the optimum (without the penalty)
+            # can never be part of an optimal segmentation that ends at end + min_size or later. Before
+            # that, "end" itself is not a usable start point yet, so the dominated one stays a candidate.
+            dominated = np.zeros(len(candidates), dtype=bool)
+            dominated[usable] = costs > best[end]
+            pruned_at[dominated & (pruned_at > end)] = end
+
+        alive = pruned_at + min_size > end + 1
+        candidates, pruned_at = candidates[alive], pruned_at[alive]
+        if end + 1 - min_size >= min_size:
+            candidates = np.append(candidates, end + 1 - min_size)
+            pruned_at = np.append(pruned_at, n + 1)
+
+    boundaries = []
+    end = n
+    while end > 0:
+        end = last_boundary[end]
+        if end > 0:
+            boundaries.append(int(end))
+    boundaries.reverse()
+
+    total_cost = best[n] - penalty * len(boundaries)
+    return boundaries, float(total_cost)
+
+
+def penalty_path(features, min_penalty, max_penalty, min_size=2):
+    """
+    Finds all distinct optimal segmentations for penalties between min_penalty and max_penalty (CROPS).
+
+    Returns:
+    - list: Tuples (penalty, boundaries, cost), one per distinct segmentation, from many to few boundaries.
+    """
+    cost = MeanShiftCost(features)
+    runs = {}
+
+    def run(penalty):
+        if penalty not in runs:
+            runs[penalty] = pelt(None, penalty, min_size=min_size, cost=cost)
+        return runs[penalty]
+
+    intervals = [(min_penalty, max_penalty)]
+    while intervals:
+        low, high = intervals.pop()
+        boundaries_low, cost_low = run(low)
+        boundaries_high, cost_high = run(high)
+        if len(boundaries_low) <= len(boundaries_high) + 1:
+            continue
+
+        # Penalty at which both segmentations have the same penalized cost
+        middle = (cost_high - cost_low) / (len(boundaries_low) - len(boundaries_high))
+        boundaries_middle, _ = run(middle)
+        if len(boundaries_middle) != len(boundaries_high) and len(boundaries_middle) != len(boundaries_low):
+            intervals += [(low, middle), (middle, high)]
+
+    path = {}
+    for penalty in sorted(runs):
+        boundaries, segmentation_cost = runs[penalty]
+        path.setdefault(tuple(boundaries), (penalty, boundaries, segmentation_cost))
+    return sorted(path.values(), key=lambda entry: -len(entry[1]))
+
+
+def normalize_histograms(histograms):
+    """
+    Scales every histogram to sum to 1, so segment costs do not depend on the frame size.
+    """
+    histograms = np.asarray(histograms, dtype=np.float64)
+    totals = histograms.sum(axis=1, keepdims=True)
+    return histograms / np.where(totals > 0, totals, 1)
+
+
+def main():
+    # Histograms of color_hists_full_videos.py; adjust as needed.
+    from window_scorers import load_histogram_features
+
+    histograms_filepath = "../../data/3_MoviePy_segmentation/DS782_722374D-DGS00Z03UDY/color_histograms.npy"
+    keys, histograms = load_histogram_features(histograms_filepath)
+    features = normalize_histograms(histograms)
+
+    boundaries, _ = pelt(features, penalty=0.05, min_size=25)
+    print(f"{len(boundaries)} boundaries:")
+    for boundary in boundaries:
+        print(f"Boundary before {keys[boundary]}")
+
+    for penalty, path_boundaries, segmentation_cost in penalty_path(features, 0.01, 1.0, min_size=25):
+        print(f"penalty {penalty:.4f}: {len(path_boundaries)} boundaries, cost {segmentation_cost:.4f}")
+
+
+if __name__ == '__main__':
+    main()
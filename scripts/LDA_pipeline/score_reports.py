@@ -0,0 +1,213 @@
+"""
+Non-interactive report generation for long score curves.
+
+Full-frame score curves have 100k+ points, which makes plotting every point with markers and a blocking
+plt.show() slow and unusable on a headless machine. This script:
+    1. downsamples each curve for display with LTTB (Largest-Triangle-Three-Buckets), which keeps the
+       peaks and the visual shape of the curve,
+    2. renders it with the non-interactive Agg backend, with the predicted peaks and the ELAN ground truth
+       (program boundaries) overlaid,
+    3. writes one PNG and one HTML page per video, for many videos in parallel.
+
+Input:
+    - score curves: {video}.scores.npy, an array (n, 2) with the frame number and score per row
+      (see "save_score_curve")
+    - ELAN annotation files (optional)
+
+Output:
+    - {video}.png and {video}.html per video, and an index.html linking all reports
+"""
+
+import os
+import sys
+import html
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from scipy.signal import find_peaks
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from read_elan_file_shots import read_eaf
+from media_index import DEFAULT_FRAME_RATE, get_frame_rate, get_eaf_frame_rate
+
+
+def save_score_curve(filepath, frames, scores):
+    """
+    Saves a score curve as an array (n, 2): frame number and score per row.
+    """
+    np.save(filepath, np.column_stack((np.asarray(frames, dtype=np.float64), np.asarray(scores, dtype=np.float64))))
+
+
+def load_score_curve(filepath):
+    curve = np.load(filepath)
+    return curve[:, 0], curve[:, 1]
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Keeps the first and last point and, for every bucket in
+    between, the point that forms the largest triangle with the previously kept point and the mean of the
+    next bucket. Peaks survive because they form large triangles.
+
+    Parameters:
+    - x, y: the curve (x sorted).
+    - n_out: number of points to keep.
+
+    Returns:
+    - numpy.ndarray: indices of the kept points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.zeros(n_out, dtype=int)
+    selected[-1] = n - 1
+    previous = 0
+
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = edges[bucket + 1], (edges[bucket + 2] if bucket + 2 < len(edges) else n)
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area for every candidate in the bucket
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def predicted_peaks(frames, scores, min_distance=250, max_peaks=20):
+    """
+    Returns the indices of the most prominent peaks, at least "min_distance" frames apart.
+    """
+    spacing = np.median(np.diff(frames)) if len(frames) > 1 else 1
+    peaks, properties = find_peaks(np.nan_to_num(scores), distance=max(1, int(min_distance / spacing)),
+                                   prominence=0)
+    order = np.argsort(properties["prominences"])[::-1][:max_peaks]
+    return np.sort(peaks[order])
+
+
+def program_boundaries(segmentation_vector):
+    """
+    Returns the start and end frames of the program segments (label 1) of read_eaf's segmentation vector.
+    """
+    return sorted({frame for start, end, label in segmentation_vector if label == 1 for frame in (start, end)})
+
+
+def report_frame_rate(video, eaf_path=None):
+    """
+    Looks up the frame rate of a video in the media index: by the video name, else by the media file linked
+    in its ELAN file. Falls back to DEFAULT_FRAME_RATE if neither is indexed.
+    """
+    frame_rate = get_frame_rate(video, default=None)
+    if frame_rate is None and eaf_path:
+        frame_rate = get_eaf_frame_rate(ET.parse(eaf_path).getroot(), eaf_path)
+    return frame_rate or DEFAULT_FRAME_RATE
+
+
+def timecode(frame, frame_rate=DEFAULT_FRAME_RATE):
+    seconds = int(frame / frame_rate)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def render_report(video, scores_path, output_folder, eaf_path=None, max_points=2000, frame_rate=None):
+    """
+    Renders the PNG and HTML report of one video. The frame rate (for the ELAN boundaries and the time codes)
+    defaults to the one in the media index, see "report_frame_rate".
+
+    Returns:
+    - str: path of the HTML report.
+    """
+    if frame_rate is None:
+        frame_rate = report_frame_rate(video, eaf_path)
+    frames, scores = load_score_curve(scores_path)
+    peaks = predicted_peaks(frames, scores)
+    boundaries = program_boundaries(read_eaf(eaf_path, frame_rate)) if eaf_path else []
+
+    keep = lttb(frames, np.nan_to_num(scores), max_points)
+
+    fig, ax = plt.subplots(figsize=(16, 5))
+    ax.plot(frames[keep], scores[keep], linestyle='-', linewidth=0.8, color='b', label='Score')
+    ax.scatter(frames[peaks], scores[peaks], color='r', s=30, zorder=5, label='Predicted peaks')
+    if boundaries:
+        ax.vlines(boundaries, 0, 1, transform=ax.get_xaxis_transform(), colors='g', linestyles='--',
+                  linewidth=0.8, label='Program boundaries (ELAN)')
+    ax.set_title(f'Scores of {video}')
+    ax.set_xlabel('Frame number')
+    ax.set_ylabel('Score')
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+
+    png_path = os.path.join(output_folder, f"{video}.png")
+    fig.savefig(png_path, dpi=100)
+    plt.close(fig)
+
+    rows = []
+    for peak in peaks:
+        frame = int(frames[peak])
+        distance = min((abs(frame - b) for b in boundaries), default=None)
+        rows.append(f"<tr><td>{frame}</td><td>{timecode(frame, frame_rate)}</td><td>{scores[peak]:.4f}</td>"
+                    f"<td>{'' if distance is None else distance}</td></tr>")
+
+    html_path = os.path.join(output_folder, f"{video}.html")
+    with open(html_path, "w") as file:
+        file.write(
+            f"<html><head><meta charset='utf-8'><title>{html.escape(video)}</title></head><body>"
+            f"<h1>{html.escape(video)}</h1><img src='{html.escape(os.path.basename(png_path))}' width='100%'>"
+            f"<h2>Predicted peaks</h2><table border='1'>"
+            f"<tr><th>Frame</th><th>Time</th><th>Score</th><th>Frames to nearest ELAN boundary</th></tr>"
+            f"{''.join(rows)}</table>"
+            f"<p>{len(boundaries)} ELAN program boundaries, {len(frames)} scored frames.</p></body></html>"
+        )
+    return html_path
+
+
+def generate_reports(jobs, output_folder, max_workers=None):
+    """
+    Renders the reports of several videos in parallel and writes an index page.
+
+    Parameters:
+    - jobs: list of (video, scores_path, eaf_path or None).
+    - output_folder: folder for the PNG and HTML files.
+    - max_workers: number of worker processes (default: number of cores).
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(render_report, video, scores_path, output_folder, eaf_path)
+                   for video, scores_path, eaf_path in jobs]
+        reports = [future.result() for future in futures]
+
+    with open(os.path.join(output_folder, "index.html"), "w") as file:
+        links = "".join(f"<li><a href='{html.escape(os.path.basename(r))}'>{html.escape(os.path.basename(r)[:-5])}</a></li>"
+                        for r in reports)
+        file.write(f"<html><head><meta charset='utf-8'><title>Score reports</title></head><body>"
+                   f"<h1>Score reports</h1><ul>{links}</ul></body></html>")
+    print(f"Wrote {len(reports)} reports to {output_folder}.")
+
+
+def main():
+    # Adjust these paths as needed.
+    scores_folder = "../../data/6_scores"
+    annotation_folder = "../../data/2_annotation_files/caspian"
+    output_folder = "../../data/7_reports"
+
+    jobs = []
+    for file in sorted(os.listdir(scores_folder)):
+        if file.endswith(".scores.npy"):
+            video = file[:-len(".scores.npy")]
+            eaf_path = os.path.join(annotation_folder, video, f"{video}.eaf")
+            jobs.append((video, os.path.join(scores_folder, file), eaf_path if os.path.exists(eaf_path) else None))
+
+    generate_reports(jobs, output_folder)
+
+
+if __name__ == '__main__':
+    main()
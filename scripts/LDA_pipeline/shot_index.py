@@ -0,0 +1,225 @@
+"""
+Archive-wide index of recurring shots (station idents, jingles, announcer shots, commercials).
+
+Every shot gets two 64-bit fingerprints from its first keyframe:
+    - the perceptual hash (dHash) of keyframe_selection.py
+    - a SimHash of its color histogram (signs of 64 fixed random projections)
+
+The dHash is stored with locality-sensitive hashing (banding): the 64 bits are cut into "bands" pieces
+(default 4 x 16 bits) and each piece is a bucket key in a SQLite table. A query looks up its own bucket
+keys and every key within "probe_radius" bits of them (multi-probe), and only compares against the shots
+in those buckets instead of the whole archive; the histogram SimHash is then used to verify the
+candidates. With 16-bit keys a bucket holds about 1/65536 of the archive, so a query reads a small and
+nearly constant number of rows (a (1 + 16) * 4 probe query reads about 0.1% of the shots of a uniformly
+spread archive). Near-uniform frames (black, color bars) all get the same dHash, so they share one
+bucket and are matched with each other.
+
+Recall: by the pigeonhole principle, two dHashes that differ in fewer than bands * (probe_radius + 1) bits
+differ in at most probe_radius bits in at least one band, so one of the probes finds it. With the
+defaults (4 bands, probe radius 1) every match with a dHash distance of at most 7 is found, which covers
+the default max_dhash_distance of 6.
+
+New tapes can be added at any time; videos that are already indexed are skipped.
+
+Input:
+    - folders with keyframe images per video, named "split_{start}_{end}_iframe_{n}.jpg"
+
+Output:
+    - shot_index.sqlite
+    - for a shot: list of (video, start_frame, end_frame) where a similar shot occurs
+"""
+
+import os
+import sqlite3
+from itertools import combinations
+import numpy as np
+from PIL import Image
+from keyframe_selection import dhash, hamming_distance, group_by_shot
+
+HASH_BITS = 64
+
+# Fixed random projections for the histogram SimHash (the same for every run, so the index stays valid)
+_projections = np.random.default_rng(20240310).standard_normal((HASH_BITS, 768))
+
+
+def histogram_simhash(histogram):
+    """
+    Calculates a 64-bit SimHash of a color histogram: the signs of fixed random projections of the
+    square-rooted, normalized histogram (so similar histograms under the Hellinger distance get similar bits).
+    """
+    histogram = np.sqrt(np.asarray(histogram, dtype=np.float64) / max(np.sum(histogram), 1))
+    bits = (_projections @ (histogram - np.sqrt(1 / len(histogram)))) > 0
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def shot_fingerprint(image_path):
+    """
+    Returns the (dhash, histogram SimHash) fingerprint of a keyframe.
+    """
+    with Image.open(image_path) as img:
+        img = img.convert('RGB')
+        return dhash(img), histogram_simhash(img.histogram())
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class ShotIndex:
+    """
+    SQLite-backed LSH index of shot fingerprints.
+    """
+
+    def __init__(self, index_path="shot_index.sqlite", bands=4, probe_radius=1):
+        self.index_path = index_path
+        self.bands = bands
+        self.band_bits = HASH_BITS // bands
+        self.probe_radius = probe_radius
+        self.connection = sqlite3.connect(index_path)
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS settings (bands INTEGER);"
+            "CREATE TABLE IF NOT EXISTS shots (shot_id INTEGER PRIMARY KEY, video TEXT, start_frame INTEGER, "
+            "end_frame INTEGER, dhash INTEGER, hist_hash INTEGER);"
+            "CREATE INDEX IF NOT EXISTS shots_video ON shots (video);"
+            "CREATE TABLE IF NOT EXISTS buckets (band INTEGER, key INTEGER, shot_id INTEGER);"
+            "CREATE INDEX IF NOT EXISTS buckets_key ON buckets (band, key);"
+        )
+        # The bucket keys depend on the number of bands, so an index only works with the one it was built with
+        row = self.connection.execute("SELECT bands FROM settings").fetchone()
+        if row is None:
+            # Indexes from before the settings table were built with 8 bands
+            if self.connection.execute("SELECT 1 FROM shots LIMIT 1").fetchone() is not None:
+                row = (8,)
+            self.connection.execute("INSERT INTO settings (bands) VALUES (?)", (row or (bands,)))
+            self.connection.commit()
+        if row is not None and row[0] != bands:
+            self.connection.close()
+            raise ValueError(f"{index_path} was built with {row[0]} bands, not {bands}; "
+                             f"rebuild it or pass bands={row[0]}.")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _bucket_keys(self, dhash_value):
+        """
+        Returns the (band, key) buckets of a dHash.
+        """
+        mask = (1 << self.band_bits) - 1
+        return [(band, (dhash_value >> (band * self.band_bits)) & mask) for band in range(self.bands)]
+
+    def _probe_keys(self, dhash_value):
+        """
+        Returns the buckets of a dHash and all keys within "probe_radius" bits of them, per band.
+        """
+        probes = []
+        for band, key in self._bucket_keys(dhash_value):
+            for radius in range(self.probe_radius + 1):
+                for bits in combinations(range(self.band_bits), radius):
+                    probes.append((band, key ^ sum(1 << bit for bit in bits)))
+        return probes
+
+    def contains_video(self, video):
+        return self.connection.execute("SELECT 1 FROM shots WHERE video = ? LIMIT 1", (video,)).fetchone() is not None
+
+    def add_shot(self, video, start_frame, end_frame, dhash_value, hist_hash):
+        cursor = self.connection.execute(
+            "INSERT INTO shots (video, start_frame, end_frame, dhash, hist_hash) VALUES (?, ?, ?, ?, ?)",
+            (video, start_frame, end_frame, _to_signed(dhash_value), _to_signed(hist_hash))
+        )
+        self.connection.executemany(
+            "INSERT INTO buckets (band, key, shot_id) VALUES (?, ?, ?)",
+            [(band, key, cursor.lastrowid) for band, key in self._bucket_keys(dhash_value)]
+        )
+
+    def add_video(self, video, keyframe_folder):
+        """
+        Adds all shots of a video, using the first keyframe of each shot. Skips indexed videos.
+
+        Returns:
+        - int: The number of shots added.
+        """
+        if self.contains_video(video):
+            return 0
+
+        filenames = [f for f in os.listdir(keyframe_folder) if f.endswith(".jpg")]
+        shots = group_by_shot(filenames)
+        for shot in shots:
+            start_frame, end_frame = map(int, shot[0].split('_')[1:3])
+            self.add_shot(video, start_frame, end_frame, *shot_fingerprint(os.path.join(keyframe_folder, shot[0])))
+        self.connection.commit()
+        return len(shots)
+
+    def query(self, dhash_value, hist_hash, max_dhash_distance=6, max_hist_distance=6, exclude_video=None):
+        """
+        Finds the indexed shots that are similar to a fingerprint in both the dHash and the histogram SimHash.
+        Recall is guaranteed for max_dhash_distance < bands * (probe_radius + 1).
+
+        Returns:
+        - list: Tuples (video, start_frame, end_frame, dhash_distance, hist_distance).
+        """
+        keys = self._probe_keys(dhash_value)
+        values = ", ".join(["(?, ?)"] * len(keys))
+        rows = self.connection.execute(
+            f"WITH query (band, key) AS (VALUES {values}) "
+            f"SELECT DISTINCT s.video, s.start_frame, s.end_frame, s.dhash, s.hist_hash "
+            f"FROM query q JOIN buckets b ON b.band = q.band AND b.key = q.key JOIN shots s ON s.shot_id = b.shot_id",
+            [value for key in keys for value in key]
+        ).fetchall()
+
+        matches = []
+        for video, start_frame, end_frame, other_dhash, other_hist in rows:
+            if video == exclude_video:
+                continue
+            dhash_distance = hamming_distance(dhash_value, _to_unsigned(other_dhash))
+            hist_distance = hamming_distance(hist_hash, _to_unsigned(other_hist))
+            if dhash_distance <= max_dhash_distance and hist_distance <= max_hist_distance:
+                matches.append((video, start_frame, end_frame, dhash_distance, hist_distance))
+        return matches
+
+    def find_recurring(self, video, **query_args):
+        """
+        For every shot of an indexed video, finds where else in the archive (in other videos) it occurs.
+
+        Returns:
+        - list: Tuples (start_frame, end_frame, matches), one per shot, in video order.
+        """
+        shots = self.connection.execute(
+            "SELECT start_frame, end_frame, dhash, hist_hash FROM shots WHERE video = ? ORDER BY start_frame",
+            (video,)
+        ).fetchall()
+        return [(start_frame, end_frame,
+                 self.query(_to_unsigned(d), _to_unsigned(h), exclude_video=video, **query_args))
+                for start_frame, end_frame, d, h in shots]
+
+
+def main():
+    # Folder with one keyframe folder per video; adjust as needed.
+    keyframes_root = "../../data/4_i_frames"
+    index_path = "../../data/shot_index.sqlite"
+
+    with ShotIndex(index_path) as index:
+        for video in sorted(os.listdir(keyframes_root)):
+            folder = os.path.join(keyframes_root, video)
+            if os.path.isdir(folder):
+                print(f"Indexed {index.add_video(video, folder)} new shots of {video}.")
+
+        for video in sorted(os.listdir(keyframes_root)):
+            for start_frame, end_frame, matches in index.find_recurring(video):
+                if matches:
+                    print(f"{video} shot {start_frame}-{end_frame} also occurs in: "
+                          f"{', '.join(f'{v} ({s}-{e})' for v, s, e, _, _ in matches)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Shot-rhythm features computed directly from the TransNetV2 output files, without decoding any video.
+
+The cutting rate and shot lengths change sharply between programs, commercials and announcements. This
+script turns the .scenes.txt (shots) and .predictions.txt (per-frame transition probabilities) files into
+per-frame features over several window sizes, using rolling sums (cumulative sums), so a whole tape takes
+milliseconds:
+    - cut_density_{w}: number of cuts per frame in a centered window of w frames
+    - shot_length_mean_{w} / shot_length_var_{w}: mean and variance of the length of the shot each frame
+      belongs to, over the window
+    - transition_mean_{w} / transition_std_{w} / transition_max_{w}: statistics of the transition
+      probability (only if a .predictions.txt file exists)
+
+The features can be fed to the window scorers of window_scorers.py like the color histograms.
+
+Input:
+    - folder with TransNet files: {video}.{ext}.scenes.txt and (optionally) {video}.{ext}.predictions.txt
+
+Output:
+    - features: numpy array (n_frames, n_features) and the list of feature names
+"""
+
+import os
+import numpy as np
+from scipy.ndimage import maximum_filter1d
+from window_scorers import get_scorer
+
+DEFAULT_WINDOW_SIZES = (25, 125, 750)
+
+
+def find_transnet_files(transnet_folder, video):
+    """
+    Returns the paths of the scenes and predictions file of a video (predictions is None if missing).
+    """
+    scenes_path = predictions_path = None
+    for file in os.listdir(transnet_folder):
+        if file.startswith(video + ".") and file.endswith(".scenes.txt"):
+            scenes_path = os.path.join(transnet_folder, file)
+            candidate = scenes_path[:-len(".scenes.txt")] + ".predictions.txt"
+            predictions_path = candidate if os.path.exists(candidate) else None
+    if scenes_path is None:
+        raise FileNotFoundError(f"No scenes file for {video} in {transnet_folder}")
+    return scenes_path, predictions_path
+
+
+def rolling_mean(values, window_size):
+    """
+    Centered rolling mean of a 1D array (the window shrinks at the start and end of the array).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    index = np.arange(len(values))
+    low = np.maximum(index - window_size // 2, 0)
+    high = np.minimum(index + (window_size + 1) // 2, len(values))
+    return (cumulative[high] - cumulative[low]) / (high - low)
+
+
+def compute_rhythm_features(scenes_path, predictions_path=None, window_sizes=DEFAULT_WINDOW_SIZES):
+    """
+    Computes the shot-rhythm features of one video.
+
+    Parameters:
+    - scenes_path: path of the .scenes.txt file (start and end frame of each shot per row).
+    - predictions_path: path of the .predictions.txt file, or None.
+    - window_sizes: the window sizes (in frames) of the rolling statistics.
+
+    Returns:
+    - (features, names): array (n_frames, n_features) float32 and the feature names.
+    """
+    shots = np.loadtxt(scenes_path, dtype=np.int64, ndmin=2)
+    predictions = np.loadtxt(predictions_path, dtype=np.float64, ndmin=2) if predictions_path else None
+
+    n_frames = int(shots[-1, 1]) + 1
+    if predictions is not None:
+        n_frames = max(n_frames, len(predictions))
+
+    # Per frame: 1 at the first frame of every shot (except the first), and the length of its shot
+    cuts = np.zeros(n_frames)
+    cuts[shots[1:, 0]] = 1
+    lengths = shots[:, 1] - shots[:, 0] + 1
+    frames = np.arange(n_frames)
+    shot_index = np.maximum(np.searchsorted(shots[:, 0], frames, side='right') - 1, 0)
+    inside = (frames >= shots[shot_index, 0]) & (frames <= shots[shot_index, 1])
+    shot_lengths = np.where(inside, lengths[shot_index], 0).astype(np.float64)
+
+    columns, names = [], []
+    for window_size in window_sizes:
+        length_mean = rolling_mean(shot_lengths, window_size)
+        length_var = np.maximum(rolling_mean(shot_lengths ** 2, window_size) - length_mean ** 2, 0)
+        columns += [rolling_mean(cuts, window_size), length_mean, length_var]
+        names += [f"cut_density_{window_size}", f"shot_length_mean_{window_size}", f"shot_length_var_{window_size}"]
+
+        if predictions is not None:
+            probabilities = np.zeros(n_frames)
+            probabilities[:len(predictions)] = predictions[:, 0]
+            transition_mean = rolling_mean(probabilities, window_size)
+            transition_std = np.sqrt(np.maximum(rolling_mean(probabilities ** 2, window_size) - transition_mean ** 2, 0))
+            columns += [transition_mean, transition_std,
+                        maximum_filter1d(probabilities, size=window_size, mode='nearest')]
+            names += [f"transition_mean_{window_size}", f"transition_std_{window_size}",
+                      f"transition_max_{window_size}"]
+
+    return np.stack(columns, axis=1).astype(np.float32), names
+
+
+def shot_level_features(features, scenes_path):
+    """
+    Samples the per-frame features at the middle frame of every shot, to line up with per-shot
+    (keyframe) histograms.
+    """
+    shots = np.loadtxt(scenes_path, dtype=np.int64, ndmin=2)
+    middle = np.minimum((shots[:, 0] + shots[:, 1]) // 2, len(features) - 1)
+    return features[middle]
+
+
+def score_rhythm(features, window_size=750, scorer="fisher", **scorer_args):
+    """
+    Scores the rhythm features with one of the window scorers of window_scorers.py.
+    The features are standardized first, so all of them weigh in equally. The rolling features are
+    smooth, so the Fisher scorer gets a variance floor by default.
+    """
+    std = features.std(axis=0)
+    standardized = (features - features.mean(axis=0)) / np.where(std > 0, std, 1)
+    if scorer == "fisher":
+        scorer_args.setdefault("variance_floor", 0.01)
+    return get_scorer(scorer, **scorer_args).score(standardized, window_size)
+
+
+def main():
+    # Folder with the TransNet files; adjust as needed.
+    transnet_folder = "../../data/1_TransNet_files"
+    window_size = 750
+
+    videos = sorted({file.split(".")[0] for file in os.listdir(transnet_folder) if file.endswith(".scenes.txt")})
+    for video in videos:
+        scenes_path, predictions_path = find_transnet_files(transnet_folder, video)
+        features, names = compute_rhythm_features(scenes_path, predictions_path)
+        scores = score_rhythm(features, window_size)
+        if len(scores) == 0:
+            continue
+        peak = int(np.argmax(scores))
+        print(f"{video}: {features.shape[0]} frames, {len(names)} features, "
+              f"highest Fisher score {scores[peak]:.3f} at frame {peak + window_size}")
+
+
+if __name__ == '__main__':
+    main()
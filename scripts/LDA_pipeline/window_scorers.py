@@ -0,0 +1,265 @@
+"""
+Vectorized sliding window scorers for histogram sequences.
+
+Every scorer compares each window of "window_size" histograms with the window directly after it, like
+"compute_fisher" in fisher_score.py, but for all windows at once: the window statistics are taken from
+cumulative sums, so the whole sequence is scored in a single pass instead of recomputing every window.
+Sequences are processed in blocks of start indices to bound the memory use on full-frame sequences.
+
+Available scorers (see SCORERS):
+    - "fisher": mean per-bin Fisher ratio (m2 - m1)^2 / (s1^2 + s2^2), as in fisher_score.py
+    - "chi_square": chi-square distance between the mean (normalized) histograms of the windows
+    - "bhattacharyya": Bhattacharyya distance between the mean histograms
+    - "jensen_shannon": Jensen-Shannon divergence between the mean histograms
+    - "mmd": maximum mean discrepancy with an RBF kernel, approximated with random Fourier features
+
+Input:
+    - features: numpy array (n_frames, n_bins), for example the concatenated R, G and B histograms
+
+Output:
+    - numpy array of n_frames - 2 * window_size + 1 scores; score[i] compares
+      features[i:i + window_size] with features[i + window_size:i + 2 * window_size]
+"""
+
+import os
+import re
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_features import expand_histogram
+
+
+class WindowScorer:
+    """
+    Base class of the scorers. Subclasses set "uses_variance" when they need the per-bin variance of
+    the windows, may override "transform" to map each row to another feature space first, and implement
+    "compare" for a block of window pairs.
+    """
+    name = None
+    uses_variance = False
+
+    def transform(self, features):
+        return np.asarray(features, dtype=np.float64)
+
+    def compare(self, mean1, mean2, var1, var2):
+        raise NotImplementedError
+
+    def score(self, features, window_size, block_size=4096):
+        """
+        Scores all adjacent window pairs of a sequence.
+
+        Parameters:
+        - features (array-like): Array of shape (n_frames, n_bins).
+        - window_size (int): The number of rows in each window.
+        - block_size (int): Number of window start indices processed at once.
+
+        Returns:
+        - numpy.ndarray: One score per window start index.
+        """
+        features = self.transform(features)
+        n_windows = len(features) - 2 * window_size + 1
+        scores = np.empty(max(n_windows, 0))
+
+        for block_start in range(0, max(n_windows, 0), block_size):
+            block_end = min(block_start + block_size, n_windows)
+            rows = features[block_start:block_end - 1 + 2 * window_size]
+
+            # Window sums from the cumulative sums: sums[i] = rows[i:i + window_size].sum(axis=0)
+            cumulative = np.concatenate((np.zeros((1, rows.shape[1])), np.cumsum(rows, axis=0)))
+            sums = cumulative[window_size:] - cumulative[:-window_size]
+            n = block_end - block_start
+            mean1 = sums[:n] / window_size
+            mean2 = sums[window_size:window_size + n] / window_size
+
+            var1 = var2 = None
+            if self.uses_variance:
+                cumulative = np.concatenate((np.zeros((1, rows.shape[1])), np.cumsum(rows ** 2, axis=0)))
+                squares = cumulative[window_size:] - cumulative[:-window_size]
+                # Sample variance (ddof=1), clipped at 0 against rounding errors
+                var = np.maximum(squares - sums ** 2 / window_size, 0) / (window_size - 1)
+                var1, var2 = var[:n], var[window_size:window_size + n]
+
+            scores[block_start:block_end] = self.compare(mean1, mean2, var1, var2)
+
+        return scores
+
+
+class _DistributionScorer(WindowScorer):
+    """
+    Normalizes every histogram to sum to 1, so the window means are probability distributions.
+    """
+
+    def transform(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        totals = features.sum(axis=1, keepdims=True)
+        return features / np.where(totals > 0, totals, 1)
+
+
+class FisherScorer(WindowScorer):
+    """
+    "variance_floor" is added to the denominator; use it for smooth features whose windows can have
+    (almost) no variance, which would otherwise blow up the ratio.
+    """
+    name = "fisher"
+    uses_variance = True
+
+    def __init__(self, variance_floor=0.0):
+        self.variance_floor = variance_floor
+
+    def compare(self, mean1, mean2, var1, var2):
+        # Bins without variance in both windows contribute 0 instead of nan/inf
+        denominator = var1 + var2 + self.variance_floor
+        ratio = np.divide((mean2 - mean1) ** 2, denominator, out=np.zeros_like(denominator),
+                          where=denominator > 0)
+        return ratio.mean(axis=1)
+
+
+class ChiSquareScorer(_DistributionScorer):
+    name = "chi_square"
+
+    def compare(self, mean1, mean2, var1, var2):
+        total = mean1 + mean2
+        terms = np.divide((mean1 - mean2) ** 2, total, out=np.zeros_like(total), where=total > 0)
+        return 0.5 * terms.sum(axis=1)
+
+
+class BhattacharyyaScorer(_DistributionScorer):
+    name = "bhattacharyya"
+
+    def compare(self, mean1, mean2, var1, var2):
+        coefficient = np.sqrt(mean1 * mean2).sum(axis=1)
+        return -np.log(np.clip(coefficient, 1e-12, 1.0))
+
+
+class JensenShannonScorer(_DistributionScorer):
+    name = "jensen_shannon"
+
+    def compare(self, mean1, mean2, var1, var2):
+        middle = 0.5 * (mean1 + mean2)
+
+        def kl(p, q):
+            terms = np.zeros_like(p)
+            np.multiply(p, np.log(np.divide(p, q, out=np.ones_like(p), where=p > 0)), out=terms, where=p > 0)
+            return terms.sum(axis=1)
+
+        return 0.5 * kl(mean1, middle) + 0.5 * kl(mean2, middle)
+
+
+class MMDScorer(_DistributionScorer):
+    """
+    Squared MMD with an RBF kernel exp(-||x - y||^2 / (2 * bandwidth^2)), approximated with random
+    Fourier features z(x) = sqrt(2 / D) * cos(W x + b). The MMD between two windows is then the distance
+    between their mean feature vectors, so it can be computed from cumulative sums like the other scorers.
+    If no bandwidth is given, the median distance between a sample of rows is used.
+    """
+    name = "mmd"
+
+    def __init__(self, n_features=256, bandwidth=None, seed=0):
+        self.n_features = n_features
+        self.bandwidth = bandwidth
+        self.seed = seed
+
+    def transform(self, features):
+        features = super().transform(features)
+        rng = np.random.default_rng(self.seed)
+
+        bandwidth = self.bandwidth
+        if bandwidth is None:
+            sample = features[rng.choice(len(features), size=min(len(features), 500), replace=False)]
+            norms = (sample ** 2).sum(axis=1)
+            distances = np.sqrt(np.maximum(norms[:, None] + norms[None, :] - 2 * sample @ sample.T, 0))
+            bandwidth = np.median(distances[distances > 0]) if np.any(distances > 0) else 1.0
+
+        weights = rng.standard_normal((features.shape[1], self.n_features)) / bandwidth
+        offsets = rng.uniform(0, 2 * np.pi, self.n_features)
+        return np.sqrt(2.0 / self.n_features) * np.cos(features @ weights + offsets)
+
+    def compare(self, mean1, mean2, var1, var2):
+        return ((mean1 - mean2) ** 2).sum(axis=1)
+
+
+SCORERS = {scorer.name: scorer for scorer in
+           (FisherScorer, ChiSquareScorer, BhattacharyyaScorer, JensenShannonScorer, MMDScorer)}
+
+
+def get_scorer(name, **kwargs):
+    """
+    Returns a scorer instance by name, see SCORERS.
+    """
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer '{name}', choose from: {', '.join(SCORERS)}")
+    return SCORERS[name](**kwargs)
+
+
+def scores_to_windows(scores, keys, window_size):
+    """
+    Converts a score array to the list of tuples (start_frame, score, group1_keys, group2_keys) used by
+    fisher_score.py and LDA_hist.py, so their print and plot functions can be reused.
+    """
+    windows = []
+    for start_index, score in enumerate(scores):
+        match = re.match(r'split_(\d+)_(\d+)_', keys[start_index])
+        start_frame = match.group(1) if match else 'Unknown'
+        windows.append((start_frame, score, keys[start_index:start_index + window_size],
+                        keys[start_index + window_size:start_index + 2 * window_size]))
+    return windows
+
+
+def benchmark_scorers(features, window_size, names=None):
+    """
+    Runs several scorers on the same features and reports their run time.
+
+    Returns:
+    - dict: Scorer name -> score array.
+    """
+    results = {}
+    for name in names or SCORERS:
+        start_time = time.perf_counter()
+        results[name] = get_scorer(name).score(features, window_size)
+        print(f"{name}: {time.perf_counter() - start_time:.3f}s for {len(results[name])} windows")
+    return results
+
+
+def load_histogram_features(filepath, luma_if_grayscale=False):
+    """
+    Loads the color_histograms.npy of color_hists_full_videos.py. Luminance histograms of black-and-white
+    frames (compact files) are repeated for the three channels.
+
+    Parameters:
+    - luma_if_grayscale: If all frames are black-and-white, return their 256-bin luminance histograms
+                         instead. Fisher, chi-square, Bhattacharyya and Jensen-Shannon scores are the same
+                         on both layouts, so this scores a black-and-white tape at a third of the cost.
+
+    Returns:
+    - (keys, features): the image names in video order and an array (n_frames, 768) (or (n_frames, 256)).
+    """
+    histograms = dict(np.load(filepath, allow_pickle=True))
+
+    def frame_order(key):
+        match = re.match(r'split_(\d+)_\d+_(?:i?frame)_(\d+)', key)
+        return int(match.group(1)), int(match.group(2))
+
+    keys = sorted(histograms, key=frame_order)
+    if luma_if_grayscale and all(len(histograms[key]) == 1 for key in keys):
+        features = np.array([histograms[key][0] for key in keys], dtype=np.float64)
+    else:
+        features = np.array([expand_histogram(histograms[key]) for key in keys], dtype=np.float64)
+    return keys, features
+
+
+def main():
+    # Histograms of color_hists_full_videos.py; adjust as needed.
+    histograms_filepath = "../../data/3_MoviePy_segmentation/DS782_722374D-DGS00Z03UDY/color_histograms.npy"
+    window_size = 40
+
+    keys, features = load_histogram_features(histograms_filepath)
+    results = benchmark_scorers(features, window_size)
+    for name, scores in results.items():
+        peak = int(np.argmax(scores))
+        print(f"{name}: highest score {scores[peak]:.4f} at {keys[peak + window_size]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -25,33 +25,59 @@ Output:
 """
 
 import os
+import sys
 import subprocess
 
-# Directory where your video files are stored
-video_directory = "../data/0_videos/21_08_2023/mxf"
+# Path to the TransNetV2 inference script, relative to the scripts folder
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TransNet_model", "inference", "transnetv2.py")
 
-# Path to the Python script you want to run on each video
-script_path = "../TransNet_model/inference/transnetv2.py"
 
-# List all files in the video directory that end with .mxf or .mp4
-video_files = [f for f in os.listdir(video_directory) if f.endswith('.mxf') or f.endswith('.mp4')]
+def run_transnet(video_path, script_path=SCRIPT_PATH):
+    """
+    Runs the TransNetV2 script on one video. It writes {video_path}.scenes.txt and
+    {video_path}.predictions.txt next to the video.
 
-# Iterate over each video file and run the script
-for video_file in video_files:
-    movie_name = os.path.splitext(video_file)[0]  # Extract the movie name without its extension
-    
-    # Check if {movie_name}.mxf.scenes.txt already exists
-    scenes_file_path = os.path.join(video_directory, f"{movie_name}.mxf.scenes.txt")
-    if os.path.exists(scenes_file_path):
-        print(f"Skipping {video_file} as {scenes_file_path} already exists.")
-        continue  # Skip this file and move to the next one in the loop
-
-    # If the scenes file doesn't exist, proceed with processing
-    video_path = os.path.join(video_directory, video_file)
-    # Construct the command to run the script on the video
-    command = f"python {script_path} {video_path}"
-    # Execute the command
-    subprocess.run(command, shell=True)
-    print(f"Processed {video_file}")
-
-print("All videos have been processed.")
+    Returns:
+    - subprocess.CompletedProcess of the TransNetV2 run.
+    """
+    # Run with the current interpreter, without a shell, so paths with spaces work
+    return subprocess.run([sys.executable, script_path, video_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def process_folder(video_directory, script_path=SCRIPT_PATH):
+    # List all files in the video directory that end with .mxf or .mp4
+    video_files = [f for f in os.listdir(video_directory) if f.endswith('.mxf') or f.endswith('.mp4')]
+
+    # Iterate over each video file and run the script
+    for video_file in video_files:
+        movie_name = os.path.splitext(video_file)[0]  # Extract the movie name without its extension
+        
+        # Check if {movie_name}.mxf.scenes.txt already exists
+        scenes_file_path = os.path.join(video_directory, f"{movie_name}.mxf.scenes.txt")
+        if os.path.exists(scenes_file_path):
+            print(f"Skipping {video_file} as {scenes_file_path} already exists.")
+            continue  # Skip this file and move to the next one in the loop
+
+        # If the scenes file doesn't exist, proceed with processing
+        video_path = os.path.join(video_directory, video_file)
+        process = run_transnet(video_path, script_path)
+        if process.returncode != 0:
+            print(f"Error processing {video_file}: {process.stderr.decode(errors='replace')}")
+            continue
+        print(f"Processed {video_file}")
+
+    print("All videos have been processed.")
+
+
+def main():
+    # Directory where your video files are stored
+    video_directory = "../data/0_videos/21_08_2023/mxf"
+
+    # Path to the Python script you want to run on each video
+    script_path = "../TransNet_model/inference/transnetv2.py"
+
+    process_folder(video_directory, script_path)
+
+
+if __name__ == "__main__":
+    main()
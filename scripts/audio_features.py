@@ -0,0 +1,251 @@
+"""
+Calculates cheap audio features for a video and uses them to propose candidate program boundary regions.
+Program boundaries in broadcast TV are usually marked by silence or a change of music, so the audio
+track can be used to narrow down where the (much more expensive) visual Fisher/LDA scoring has to run.
+
+The audio is decoded by FFmpeg into mono 16-bit PCM and piped into NumPy in blocks, so a full tape is
+never held in memory. All features are computed at video frame resolution (one value per frame).
+
+Input:
+    - video file (.mxf or .mp4)
+
+Output:
+    - features (dictionary of numpy arrays, one value per video frame):
+        - "rms": RMS energy of the frame
+        - "rms_db": RMS energy in dB relative to full scale
+        - "silent": True if the frame is below the silence threshold
+        - "flux": spectral flux between the frame and the previous frame
+    - candidate regions: list of tuples (start_frame, end_frame)
+
+Usage with the visual scorers:
+    - Use "frame_numbers_from_keys" and "candidate_start_indices" to convert the candidate regions into
+      the window start indices for "compute_fisher" (fisher_score.py) or
+      "compute_sliding_lda_scores_with_windows" (LDA_hist.py), via their "start_indices" parameter.
+"""
+
+import re
+import subprocess
+import numpy as np
+from scipy.signal import find_peaks
+from media_index import get_frame_rate
+
+
+def iter_pcm_blocks(video_path, sample_rate=16000, block_size=2 ** 20):
+    """
+    Decodes the audio track of a video with FFmpeg and yields it in blocks.
+
+    Parameters:
+    - video_path (str): Path to the video file.
+    - sample_rate (int): Sample rate the audio is resampled to.
+    - block_size (int): Number of samples per yielded block.
+
+    Yields:
+    - numpy.ndarray: float32 mono samples in the range [-1, 1].
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel", "error",
+        "-i", video_path,
+        "-vn",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-f", "s16le",
+        "-"
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    remainder = b""
+    try:
+        while True:
+            raw = process.stdout.read(block_size * 2)
+            if not raw:
+                break
+            # A trailing odd byte is half a sample; keep it for the next read
+            raw = remainder + raw
+            usable = len(raw) - len(raw) % 2
+            remainder = raw[usable:]
+            if usable:
+                yield np.frombuffer(raw[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0:
+            print(f"Error decoding audio of {video_path}: {stderr.decode(errors='replace')}")
+
+
+def compute_audio_features(video_path, frame_rate=None, sample_rate=16000, frames_per_block=1500,
+                           silence_db=-45.0):
+    """
+    Computes per-frame RMS energy, silence flags and spectral flux for the audio track of a video.
+
+    Parameters:
+    - video_path (str): Path to the video file.
+    - frame_rate (int or float, optional): Frame rate of the video, features are computed per video frame.
+                                           Defaults to the frame rate in the media index (media_index.py).
+    - sample_rate (int): Sample rate the audio is resampled to.
+    - frames_per_block (int): Number of video frames that are processed per block.
+    - silence_db (float): Frames with an RMS energy below this value (dBFS) are marked as silent.
+
+    Returns:
+    - dict: Arrays "rms", "rms_db", "silent" and "flux", each with one value per video frame.
+    """
+    if frame_rate is None:
+        frame_rate = get_frame_rate(video_path)
+    samples_per_frame = int(round(sample_rate / frame_rate))
+    block_size = samples_per_frame * frames_per_block
+    window = np.hanning(samples_per_frame).astype(np.float32)
+
+    rms_blocks, flux_blocks = [], []
+    previous_spectrum = None
+    leftover = np.zeros(0, dtype=np.float32)
+
+    for block in iter_pcm_blocks(video_path, sample_rate=sample_rate, block_size=block_size):
+        samples = np.concatenate((leftover, block))
+        n_frames = len(samples) // samples_per_frame
+        leftover = samples[n_frames * samples_per_frame:]
+        if n_frames == 0:
+            continue
+
+        frames = samples[:n_frames * samples_per_frame].reshape(n_frames, samples_per_frame)
+        rms_blocks.append(np.sqrt(np.mean(frames ** 2, axis=1)))
+
+        # Normalized magnitude spectrum per frame, so flux measures a change of timbre rather than loudness
+        spectrum = np.abs(np.fft.rfft(frames * window, axis=1))
+        spectrum /= np.linalg.norm(spectrum, axis=1, keepdims=True) + 1e-12
+
+        if previous_spectrum is None:
+            previous_spectrum = spectrum[:1]
+        stacked = np.concatenate((previous_spectrum, spectrum))
+        flux_blocks.append(np.sum(np.maximum(np.diff(stacked, axis=0), 0), axis=1))
+        previous_spectrum = spectrum[-1:]
+
+    rms = np.concatenate(rms_blocks) if rms_blocks else np.zeros(0, dtype=np.float32)
+    flux = np.concatenate(flux_blocks) if flux_blocks else np.zeros(0, dtype=np.float32)
+    rms_db = 20 * np.log10(rms + 1e-10)
+
+    return {"rms": rms, "rms_db": rms_db, "silent": rms_db < silence_db, "flux": flux}
+
+
+def find_silence_runs(silent, min_length=5):
+    """
+    Finds runs of consecutive silent frames.
+
+    Parameters:
+    - silent (numpy.ndarray): Boolean array, True for silent frames.
+    - min_length (int): Minimum number of frames of a run.
+
+    Returns:
+    - list: A list of tuples (start_frame, end_frame) for each silence run (end frame inclusive).
+    """
+    padded = np.concatenate(([False], np.asarray(silent, dtype=bool), [False]))
+    changes = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    starts, ends = changes[0::2], changes[1::2]
+    keep = ends - starts >= min_length
+    return [(int(start), int(end) - 1) for start, end in zip(starts[keep], ends[keep])]
+
+
+def find_candidate_regions(features, min_silence_frames=5, flux_threshold=6.0, min_peak_distance=125,
+                           margin=50):
+    """
+    Turns the audio features into candidate program boundary regions.
+
+    A candidate is either a run of silence or a peak in the spectral flux (a music change) that
+    stands out from the rest of the tape. Each candidate is widened by "margin" frames on both sides
+    and overlapping regions are merged.
+
+    Parameters:
+    - features (dict): Output of "compute_audio_features".
+    - min_silence_frames (int): Minimum length of a silence run to be a candidate.
+    - flux_threshold (float): Number of median absolute deviations a flux peak has to be above the median.
+    - min_peak_distance (int): Minimum number of frames between two flux peaks.
+    - margin (int): Number of frames added on both sides of each candidate.
+
+    Returns:
+    - list: A sorted list of non-overlapping tuples (start_frame, end_frame).
+    """
+    n_frames = len(features["flux"])
+    candidates = find_silence_runs(features["silent"], min_length=min_silence_frames)
+
+    flux = features["flux"]
+    if n_frames:
+        median = np.median(flux)
+        mad = np.median(np.abs(flux - median)) + 1e-12
+        peaks, _ = find_peaks(flux, height=median + flux_threshold * mad, distance=min_peak_distance)
+        candidates += [(int(peak), int(peak)) for peak in peaks]
+
+    regions = []
+    for start, end in sorted((max(0, start - margin), min(n_frames - 1, end + margin)) for start, end in candidates):
+        if regions and start <= regions[-1][1] + 1:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def frame_numbers_from_keys(keys):
+    """
+    Extracts the video frame number of each histogram from its image name.
+
+    Supports the I-frame names of color_hists.py ("split_{start}_{end}_iframe_{n}.jpg", the shot start
+    frame is used) and the full-frame names of color_hists_full_videos.py ("split_{start}_{end}_frame_{n}.jpg").
+
+    Parameters:
+    - keys (list): Image names in the same order as the histograms.
+
+    Returns:
+    - numpy.ndarray: The frame number for each key.
+    """
+    frame_numbers = []
+    for key in keys:
+        match = re.match(r'split_(\d+)_\d+_(iframe|frame)_(\d+)', key)
+        start_frame = int(match.group(1))
+        frame_numbers.append(start_frame + int(match.group(3)) if match.group(2) == 'frame' else start_frame)
+    return np.array(frame_numbers)
+
+
+def candidate_start_indices(frame_numbers, regions, window_size):
+    """
+    Selects the sliding window start indices whose boundary (between the "before" and "after" group)
+    falls inside one of the candidate regions.
+
+    Parameters:
+    - frame_numbers (numpy.ndarray): Frame number of each histogram, sorted.
+    - regions (list): Sorted, non-overlapping tuples (start_frame, end_frame).
+    - window_size (int): The window size used by the scorer.
+
+    Returns:
+    - numpy.ndarray: Window start indices to pass as "start_indices" to the scorers.
+    """
+    frame_numbers = np.asarray(frame_numbers)
+    n_windows = len(frame_numbers) - 2 * window_size + 1
+    if n_windows <= 0 or not regions:
+        return np.zeros(0, dtype=int)
+
+    # First frame of the "after" group of each window
+    boundary_frames = frame_numbers[window_size:window_size + n_windows]
+    region_starts = np.array([start for start, _ in regions])
+    region_ends = np.array([end for _, end in regions])
+
+    region_index = np.searchsorted(region_starts, boundary_frames, side='right') - 1
+    inside = (region_index >= 0) & (boundary_frames <= region_ends[np.maximum(region_index, 0)])
+    return np.flatnonzero(inside)
+
+
+def main():
+    # Adjust these paths as needed
+    video_path = "../data/0_videos/21_08_2023/mxf/DS574_708549D-DGS00Z03UM8.mxf"
+
+    # The frame rate comes from the media index
+    features = compute_audio_features(video_path)
+    regions = find_candidate_regions(features)
+
+    n_frames = len(features["flux"])
+    covered = sum(end - start + 1 for start, end in regions)
+    print(f"Found {len(regions)} candidate regions covering {covered}/{n_frames} frames.")
+    for start, end in regions:
+        print(f"Candidate region: {start} - {end}")
+
+
+if __name__ == "__main__":
+    main()
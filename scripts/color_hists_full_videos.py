@@ -8,20 +8,30 @@ Input:
     
 Output:
     - Color histograms saved in numpy array file (color_histograms.npy)
+      With "compact", black-and-white frames only get a luminance histogram and all histograms are stored in
+      the smallest dtype that fits (see frame_features.py); window_scorers.load_histogram_features expands them.
+      With "n_workers", decoding and histograms run in parallel processes (see shm_pipeline.py).
 
 """
 
 
 import os
-import cv2
+import re
 import numpy as np
-import json
-import matplotlib.pyplot as plt
+from frame_features import FeatureExtractor, FrameBatch, compact_histogram, compact_dtype
+from frame_features import luma_histograms, rgb_histogram
+from shm_pipeline import extract_features_pipelined
 
 # Function to calculate the histogram of an image
-def calculate_histogram(image):
+def calculate_histogram(image, compact=False):
+    import cv2
+
     # Convert the image to RGB
     image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    # (luminance,) for black-and-white frames, (red, green, blue) otherwise
+    if compact:
+        return compact_histogram(image)
     
     # Calculate the histogram for each color channel
     red_hist = np.histogram(image[:, :, 0], bins=256, range=(0, 256))[0]
@@ -31,10 +41,13 @@ def calculate_histogram(image):
     return red_hist.tolist(), green_hist.tolist(), blue_hist.tolist()
 
 # Function to extract frames from video, calculate histograms, and save them
-def process_video(video_path, histograms, video_name):
+def process_video(video_path, histograms, video_name, compact=False):
+    import cv2
+
     cap = cv2.VideoCapture(video_path)
-    frame_num = 0
+    # Only used for the progress messages, so the container header is good enough
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_num = 0
     
     while True:
         ret, frame = cap.read()
@@ -42,7 +55,7 @@ def process_video(video_path, histograms, video_name):
             break  # No more frames to read
             
         # Calculate the histogram for the frame
-        histograms[f"{video_name}_frame_{frame_num}.jpg"] = calculate_histogram(frame)
+        histograms[f"{video_name}_frame_{frame_num}.jpg"] = calculate_histogram(frame, compact)
         frame_num += 1
         print(f"Processed frame {frame_num}/{total_frames} of {video_name}")
         
@@ -56,26 +69,96 @@ def save_histograms_np(histograms, filepath):
     np.save(filepath, histograms_array)
 
 
-# Folder containing the videos
-folder = "../data/3_MoviePy_segmentation/DS782_722374D-DGS00Z03UDY"
+# Fixed-size histograms for the pipeline in compact mode: grayscale frames only get a luminance histogram,
+# in the first 256 bins
+def _rgb_or_luma_histogram(batch):
+    mask = batch.grayscale
+    histograms = np.zeros((len(batch.rgb), 768), dtype=np.int32)
+    histograms[~mask] = rgb_histogram(FrameBatch(batch.rgb[~mask]))
+    histograms[mask, :256] = luma_histograms(batch.rgb[mask])
+    return histograms
 
-# Dictionary to hold histograms for each frame in each video
-histograms = {}
 
-# Iterate through the files in the folder
-for filename in os.listdir(folder):
-    if filename.endswith(".mp4"):  # Assuming the videos are in mp4 format
-        # Construct the full path to the file
-        video_path = os.path.join(folder, filename)
-        print(f'Processing video: {filename}')
-        
-        # Process the video
-        process_video(video_path, histograms, os.path.splitext(filename)[0])
+# Not registered in frame_features.py, the other feature scripts have no use for it
+_RGB_OR_LUMA_HISTOGRAM = FeatureExtractor("rgb_or_luma_histogram", (768,), np.dtype(np.int32), _rgb_or_luma_histogram)
+
+
+# Expected number of frames of a shot video of MoviePy_segmentation.py (split_{start}_{end}.mp4), or None
+def shot_frame_count(filename):
+    match = re.match(r'split_(\d+)_(\d+)\.mp4$', filename)
+    return int(match.group(2)) - int(match.group(1)) + 1 if match else None
+
+
+# Same histograms as "compute_histograms", with the decoding and the histograms in separate processes
+def compute_histograms_pipelined(folder, compact=False, n_workers=4):
+    filenames = sorted(filename for filename in os.listdir(folder) if filename.endswith(".mp4"))
+    video_paths = [os.path.join(folder, filename) for filename in filenames]
+    extractors = [_RGB_OR_LUMA_HISTOGRAM, "grayscale"] if compact else ["rgb_histogram"]
+    name = _RGB_OR_LUMA_HISTOGRAM.name if compact else "rgb_histogram"
+
+    # The shot names give the frame counts, so the shot videos do not have to be probed (or indexed)
+    frame_counts = [shot_frame_count(filename) for filename in filenames]
+    frame_counts = None if None in frame_counts else frame_counts
+    features, frame_counts = extract_features_pipelined(video_paths, extractors, n_workers,
+                                                        frame_counts=frame_counts)
+
+    # The first 256 bins (red or luminance) sum to the number of pixels of the frame
+    pixels = int(features[name][:, :256].sum(axis=1).max()) if len(features[name]) else 0
+    dtype = compact_dtype(pixels)
+    histograms = {}
+    index = 0
+    for filename, frame_count in zip(filenames, frame_counts):
+        for frame_num in range(frame_count):
+            row = features[name][index]
+            if not compact:
+                histogram = row[:256].tolist(), row[256:512].tolist(), row[512:].tolist()
+            elif features["grayscale"][index]:
+                histogram = (row[:256].astype(dtype),)
+            else:
+                histogram = row[:256].astype(dtype), row[256:512].astype(dtype), row[512:].astype(dtype)
+            histograms[f"{os.path.splitext(filename)[0]}_frame_{frame_num}.jpg"] = histogram
+            index += 1
+    return histograms
+
+
+# Function to calculate the histograms of all frames of all shot videos in a folder
+def compute_histograms(folder, compact=False, n_workers=0):
+    if n_workers:
+        return compute_histograms_pipelined(folder, compact, n_workers)
+
+    # Dictionary to hold histograms for each frame in each video
+    histograms = {}
+
+    # Iterate through the files in the folder
+    for filename in os.listdir(folder):
+        if filename.endswith(".mp4"):  # Assuming the videos are in mp4 format
+            # Construct the full path to the file
+            video_path = os.path.join(folder, filename)
+            print(f'Processing video: {filename}')
+            
+            # Process the video
+            process_video(video_path, histograms, os.path.splitext(filename)[0], compact)
+
+    return histograms
+
+
+def main():
+    # Folder containing the videos
+    folder = "../data/3_MoviePy_segmentation/DS782_722374D-DGS00Z03UDY"
+    # Store black-and-white frames as luminance histograms (about 3x smaller and faster to score)
+    compact = False
+    # Decode in one process and compute the histograms in this many other processes (0: one loop)
+    n_workers = 0
+
+    histograms = compute_histograms(folder, compact, n_workers)
+
+    # Save the histograms to a file
+    histograms_filepath = os.path.join(folder, "color_histograms.npy") #Change this path!
+    save_histograms_np(histograms, histograms_filepath)
 
-# Save the histograms to a file
-histograms_filepath = os.path.join(folder, "color_histograms.npy") #Change this path!
-save_histograms_np(histograms, histograms_filepath)
+    print(f"Calculated histograms for {len(histograms)} frames.")
+    print(f"Histograms saved to {histograms_filepath}.")
 
-print(f"Calculated histograms for {len(histograms)} frames.")
-print(f"Histograms saved to {histograms_filepath}.")
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Registry of per-frame feature extractors that all run in a single decode loop.
+
+Each extractor declares the shape and dtype of its output per frame. "extract_features" decodes the frames
+once (or reads them from the thumbnail cache, see thumbnail_cache.py), hands every batch of frames to all
+selected extractors and writes their results into preallocated arrays. Adding a feature therefore costs
+its own arithmetic, but no extra decode of the tape. Intermediate images that several features need
+(luminance, HSV) are computed once per batch.
+
+Registered features:
+    - "rgb_histogram": 256-bin R, G and B histograms (768 values), like color_hists_full_videos.py
+    - "hsv_histogram": 32-bin hue, 16-bin saturation and 16-bin value histograms, normalized
+    - "luminance": mean and standard deviation of the luminance
+    - "edge_density": fraction of pixels with a strong luminance gradient
+    - "frame_difference": mean absolute luminance difference with the previous frame
+    - "grayscale": whether the frame is (effectively) black-and-white, see "grayscale_mask"
+
+Black-and-white material has (almost) identical R, G and B histograms, so 768 bins carry about 256 bins of
+information. "compact_histograms" stores those frames as a single 256-bin luminance histogram and all
+histograms in the smallest integer dtype that fits the pixel count; "CompactHistograms.expand" gives the
+full 768-bin layout back (the luminance histogram repeated for R, G and B).
+
+Input:
+    - video file, or a ThumbnailCache
+
+Output:
+    - dictionary with one numpy array per feature, shape (n_frames, *feature_shape)
+    - saved as {video_name}_features.npz
+
+Adding a feature:
+    @register_feature("my_feature", shape=(4,), dtype=np.float32)
+    def my_feature(batch):
+        return ...  # array of shape (len(batch.rgb), 4), computed from batch.rgb / batch.luma / batch.hsv
+"""
+
+import os
+from functools import cached_property
+from collections import namedtuple
+import numpy as np
+
+FeatureExtractor = namedtuple("FeatureExtractor", ["name", "shape", "dtype", "function"])
+
+FEATURE_EXTRACTORS = {}
+
+
+def register_feature(name, shape, dtype):
+    """
+    Decorator that registers a feature extractor. The function gets a FrameBatch and returns an array
+    of shape (n_frames_in_batch, *shape).
+    """
+    def decorator(function):
+        FEATURE_EXTRACTORS[name] = FeatureExtractor(name, tuple(shape), np.dtype(dtype), function)
+        return function
+    return decorator
+
+
+class FrameBatch:
+    """
+    A batch of consecutive RGB frames (n, height, width, 3) with lazily computed, shared intermediates.
+    """
+
+    def __init__(self, rgb, previous_rgb=None):
+        self.rgb = rgb
+        self.previous_rgb = previous_rgb
+
+    @staticmethod
+    def _luma(rgb):
+        rgb = rgb.astype(np.float32)
+        return 0.299 * rgb[..., 0] + 0.587 * rgb[..., 1] + 0.114 * rgb[..., 2]
+
+    @cached_property
+    def luma(self):
+        return self._luma(self.rgb)
+
+    @cached_property
+    def previous_luma(self):
+        # Luminance of the frame before the batch (None for the first batch of a video)
+        return None if self.previous_rgb is None else self._luma(self.previous_rgb)
+
+    @cached_property
+    def grayscale(self):
+        return grayscale_mask(self.rgb)
+
+    @cached_property
+    def hsv(self):
+        # Hue in [0, 1), saturation and value in [0, 1]
+        rgb = self.rgb.astype(np.float32) / 255.0
+        maximum = rgb.max(axis=-1)
+        minimum = rgb.min(axis=-1)
+        delta = maximum - minimum
+        safe_delta = np.where(delta > 0, delta, 1)
+
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        hue = np.where(maximum == r, ((g - b) / safe_delta) % 6,
+                       np.where(maximum == g, (b - r) / safe_delta + 2, (r - g) / safe_delta + 4)) / 6.0
+        hue = np.where(delta > 0, hue, 0)
+        saturation = np.where(maximum > 0, delta / np.where(maximum > 0, maximum, 1), 0)
+        return np.stack((hue, saturation, maximum), axis=-1)
+
+
+def batch_histogram(values, bins):
+    """
+    Histograms of integer values in [0, bins) for every frame of a batch at once, with a single bincount.
+
+    Parameters:
+    - values: integer array of shape (n, ...).
+    - bins: number of bins.
+
+    Returns:
+    - numpy.ndarray: (n, bins) counts.
+    """
+    n = len(values)
+    offsets = (np.arange(n) * bins).reshape((n,) + (1,) * (values.ndim - 1))
+    return np.bincount((values + offsets).ravel(), minlength=n * bins).reshape(n, bins)
+
+
+def grayscale_mask(rgb, tolerance=16, max_colored_fraction=0.01, sample_size=24):
+    """
+    Detects black-and-white frames from the channel differences of a downsampled copy of the frames.
+
+    A pixel is colored if its largest and smallest channel differ by more than "tolerance" (the chroma
+    noise of VHS material stays below that). A frame is grayscale if at most "max_colored_fraction" of its
+    pixels are colored.
+
+    Parameters:
+    - rgb: uint8 array of shape (n, height, width, 3).
+    - sample_size: about this many pixels along the shortest side are checked.
+
+    Returns:
+    - numpy.ndarray: (n,) boolean mask of the grayscale frames.
+    """
+    step = max(1, min(rgb.shape[1], rgb.shape[2]) // sample_size)
+    sample = rgb[:, ::step, ::step]
+    r, g, b = sample[..., 0], sample[..., 1], sample[..., 2]
+    colored = (np.maximum(np.maximum(r, g), b) - np.minimum(np.minimum(r, g), b)) > tolerance
+    return colored.reshape(len(colored), -1).mean(axis=1) <= max_colored_fraction
+
+
+def luma_histograms(rgb):
+    """
+    256-bin histograms of the integer luminance (0.299 R + 0.587 G + 0.114 B) of a batch of frames.
+    """
+    # Fixed point in uint16: 77 + 150 + 29 = 256, so 255 * 256 + 128 does not overflow
+    luma = rgb[..., 0].astype(np.uint16) * 77
+    luma += rgb[..., 1].astype(np.uint16) * 150
+    luma += rgb[..., 2].astype(np.uint16) * 29
+    luma += 128
+    luma >>= 8
+    return batch_histogram(luma, 256)
+
+
+def compact_dtype(max_count):
+    """
+    Smallest unsigned integer dtype that holds "max_count" (the number of pixels per frame).
+    """
+    return np.min_scalar_type(max_count)
+
+
+def expand_histogram(channels):
+    """
+    Concatenates the channel histograms of one frame (R, G, B, or only the luminance of a grayscale frame,
+    which is repeated for the three channels) into the 768-bin layout.
+    """
+    return np.tile(channels[0], 3) if len(channels) == 1 else np.concatenate(channels)
+
+
+def compact_histogram(rgb):
+    """
+    Histograms of a single RGB image (height, width, 3) in the smallest dtype that fits: (luminance,) for a
+    grayscale image, (red, green, blue) otherwise. Use "expand_histogram" to get the 768-bin layout.
+    """
+    dtype = compact_dtype(rgb.shape[0] * rgb.shape[1])
+    if grayscale_mask(rgb[None])[0]:
+        return (luma_histograms(rgb[None])[0].astype(dtype),)
+    return tuple(batch_histogram(rgb[None, ..., channel], 256)[0].astype(dtype) for channel in range(3))
+
+
+@register_feature("rgb_histogram", shape=(768,), dtype=np.int32)
+def rgb_histogram(batch):
+    return np.concatenate([batch_histogram(batch.rgb[..., channel], 256) for channel in range(3)], axis=1)
+
+
+@register_feature("hsv_histogram", shape=(64,), dtype=np.float32)
+def hsv_histogram(batch):
+    hsv = batch.hsv
+    pixels = hsv.shape[1] * hsv.shape[2]
+    histograms = [batch_histogram(np.minimum((hsv[..., channel] * bins).astype(np.int64), bins - 1), bins)
+                  for channel, bins in ((0, 32), (1, 16), (2, 16))]
+    return np.concatenate(histograms, axis=1) / pixels
+
+
+@register_feature("luminance", shape=(2,), dtype=np.float32)
+def luminance(batch):
+    luma = batch.luma.reshape(len(batch.luma), -1)
+    return np.stack((luma.mean(axis=1), luma.std(axis=1)), axis=1)
+
+
+@register_feature("edge_density", shape=(1,), dtype=np.float32)
+def edge_density(batch, threshold=32.0):
+    luma = batch.luma
+    gradient_x = np.abs(np.diff(luma, axis=2))[:, :-1, :]
+    gradient_y = np.abs(np.diff(luma, axis=1))[:, :, :-1]
+    edges = (gradient_x + gradient_y) > threshold
+    return edges.reshape(len(edges), -1).mean(axis=1, keepdims=True)
+
+
+@register_feature("frame_difference", shape=(1,), dtype=np.float32)
+def frame_difference(batch):
+    luma = batch.luma
+    previous = np.concatenate((luma[:1] if batch.previous_luma is None else batch.previous_luma[None], luma[:-1]))
+    return np.abs(luma - previous).reshape(len(luma), -1).mean(axis=1, keepdims=True)
+
+
+@register_feature("grayscale", shape=(), dtype=bool)
+def grayscale(batch):
+    return batch.grayscale
+
+
+class CompactHistograms:
+    """
+    Color histograms of a sequence of frames, with the grayscale frames stored as luminance histograms.
+
+    Attributes:
+    - grayscale: (n,) boolean mask of the grayscale frames.
+    - color: (number of color frames, 768) R, G and B histograms of the other frames.
+    - luma: (number of grayscale frames, 256) luminance histograms of the grayscale frames.
+    """
+
+    def __init__(self, grayscale, color, luma):
+        self.grayscale = np.asarray(grayscale, dtype=bool)
+        self.color = color
+        self.luma = luma
+
+    def __len__(self):
+        return len(self.grayscale)
+
+    @property
+    def nbytes(self):
+        return self.grayscale.nbytes + self.color.nbytes + self.luma.nbytes
+
+    def expand(self):
+        """
+        Returns the (n, 768) histograms of all frames, the luminance histograms repeated for R, G and B.
+        """
+        expanded = np.empty((len(self), 768), dtype=np.result_type(self.color, self.luma))
+        expanded[~self.grayscale] = self.color
+        expanded[self.grayscale] = np.tile(self.luma, 3)
+        return expanded
+
+    def features(self):
+        """
+        Histograms for the window scorers: the 256-bin luminance histograms if all frames are grayscale
+        (the scorers of window_scorers.py give the same scores as on the repeated 768-bin layout, at a third
+        of the cost), the expanded 768-bin histograms otherwise.
+        """
+        return self.luma if self.grayscale.all() else self.expand()
+
+    def save(self, filepath):
+        np.savez(filepath, grayscale=self.grayscale, color=self.color, luma=self.luma)
+
+    @classmethod
+    def load(cls, filepath):
+        with np.load(filepath) as data:
+            return cls(data["grayscale"], data["color"], data["luma"])
+
+
+def compact_histograms(batches):
+    """
+    Calculates the histograms of all frames in one pass. Only the luminance is histogrammed for grayscale
+    frames, so black-and-white material costs a third of the full RGB histograms.
+
+    Parameters:
+    - batches: iterable of (start_frame, rgb_frames), for example ThumbnailCache.iter_batches() or
+               iter_video_batches().
+
+    Returns:
+    - CompactHistograms: in the smallest dtype that holds the pixel count of a frame.
+    """
+    masks, color, luma = [], [], []
+    dtype = np.uint8
+    for _, frames in batches:
+        batch = FrameBatch(np.asarray(frames))
+        mask = batch.grayscale
+        dtype = compact_dtype(batch.rgb.shape[1] * batch.rgb.shape[2])
+        masks.append(mask)
+        color.append(rgb_histogram(FrameBatch(batch.rgb[~mask])).astype(dtype))
+        luma.append(luma_histograms(batch.rgb[mask]).astype(dtype))
+
+    if not masks:
+        return CompactHistograms(np.zeros(0, dtype=bool), np.zeros((0, 768), dtype), np.zeros((0, 256), dtype))
+    return CompactHistograms(np.concatenate(masks), np.concatenate(color), np.concatenate(luma))
+
+
+def iter_video_batches(video_path, batch_size=256):
+    """
+    Decodes a video with OpenCV and yields (start_frame, rgb_frames) batches.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    start, frames = 0, []
+    while True:
+        ret, frame = cap.read()
+        if ret:
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if frames and (not ret or len(frames) == batch_size):
+            yield start, np.stack(frames)
+            start += len(frames)
+            frames = []
+        if not ret:
+            break
+    cap.release()
+
+
+def extract_features(batches, n_frames, names=None):
+    """
+    Runs the selected feature extractors over all frames in one pass.
+
+    Parameters:
+    - batches: iterable of (start_frame, rgb_frames), for example ThumbnailCache.iter_batches() or
+               iter_video_batches().
+    - n_frames: expected number of frames, used to preallocate the output arrays (they grow if the
+                source turns out to have more frames and are trimmed if it has fewer).
+    - names: list of feature names (default: all registered features).
+
+    Returns:
+    - dict: feature name -> array of shape (n_frames, *shape).
+    """
+    extractors = [FEATURE_EXTRACTORS[name] for name in (names or FEATURE_EXTRACTORS)]
+    outputs = {e.name: np.zeros((n_frames,) + e.shape, dtype=e.dtype) for e in extractors}
+
+    previous_rgb = None
+    end = 0
+    for start, frames in batches:
+        end = start + len(frames)
+        if end > len(next(iter(outputs.values()))):
+            for e in extractors:
+                grown = np.zeros((max(end, 2 * len(outputs[e.name])),) + e.shape, dtype=e.dtype)
+                grown[:len(outputs[e.name])] = outputs[e.name]
+                outputs[e.name] = grown
+
+        batch = FrameBatch(np.asarray(frames), previous_rgb)
+        for e in extractors:
+            outputs[e.name][start:end] = e.function(batch)
+        previous_rgb = batch.rgb[-1]
+
+    return {name: array[:end] for name, array in outputs.items()}
+
+
+def main():
+    # Video to process; adjust as needed.
+    from thumbnail_cache import get_thumbnails
+
+    video_path = "../data/0_videos/21_08_2023/mxf/DS574_708549D-DGS00Z03UM8.mxf"
+    output_path = os.path.splitext(os.path.basename(video_path))[0] + "_features.npz"
+
+    thumbnails = get_thumbnails(video_path)
+    features = extract_features(thumbnails.iter_batches(1024), len(thumbnails))
+    np.savez(output_path, **features)
+
+    for name, array in features.items():
+        print(f"{name}: {array.shape} {array.dtype}")
+    print(f"Features saved to {output_path}.")
+
+
+if __name__ == "__main__":
+    main()
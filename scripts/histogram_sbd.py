@@ -0,0 +1,272 @@
+"""
+Classical shot boundary detection from color histogram differences, as a CPU-only alternative to TransNetV2.
+
+Every frame of the low-resolution thumbnail cache (see thumbnail_cache.py) is quantized to a 512-bin joint
+RGB histogram (8 levels per channel), computed for a whole batch of frames with a single bincount. The
+difference between consecutive frames is half the L1 distance of their normalized histograms (0 = same
+colors, 1 = no colors in common). Boundaries are then detected with adaptive thresholds:
+    - cuts: the difference is above the rolling median + k * MAD (median absolute deviation) of the
+      surrounding frames, above an absolute minimum, and "cut_ratio" times larger than every other difference
+      within "cut_radius" frames (during a dissolve every frame changes, so no single frame stands out),
+    - dissolves/fades (twin comparison): a run of frames that are all above a lower threshold, whose
+      accumulated difference (above the usual difference) is as large as a cut. The usual difference is a
+      rolling median over a window longer than twice the longest transition, so the transition itself
+      does not raise it.
+
+The results are written in the TransNet formats, so everything downstream (shots_to_annotations.py,
+read_elan_file_shots.py, shot_rhythm.py) works with them unchanged.
+
+Input:
+    - video file (.mxf or .mp4), or any iterable of (start_frame, rgb_frames) batches
+
+Output:
+    - {video_file}.scenes.txt: start and end frame of every shot per row
+    - {video_file}.predictions.txt: per frame a cut score and a transition score in [0, 1], like the
+      TransNet predictions (0.5 corresponds to the detection threshold)
+    - agreement report: precision, recall and F1 of the boundaries against the TransNet files
+"""
+
+import os
+import time
+import numpy as np
+from scipy.ndimage import maximum_filter, median_filter
+from frame_features import batch_histogram
+
+HISTOGRAM_BINS = 512
+
+
+def joint_rgb_histograms(rgb):
+    """
+    Normalized 512-bin joint RGB histograms (3 bits per channel) of a batch of frames (n, height, width, 3).
+    """
+    quantized = (rgb >> 5).astype(np.int64)
+    values = (quantized[..., 0] << 6) | (quantized[..., 1] << 3) | quantized[..., 2]
+    pixels = values.shape[1] * values.shape[2]
+    return batch_histogram(values, HISTOGRAM_BINS).astype(np.float32) / pixels
+
+
+def histogram_differences(batches):
+    """
+    Calculates the histogram difference of every frame with the previous frame.
+
+    Parameters:
+    - batches: iterable of (start_frame, rgb_frames), for example ThumbnailCache.iter_batches().
+
+    Returns:
+    - numpy.ndarray: float32 differences in [0, 1], one per frame (0 for the first frame).
+    """
+    differences = []
+    previous = None
+    for _, frames in batches:
+        histograms = joint_rgb_histograms(np.asarray(frames))
+        if previous is None:
+            previous = histograms[:1]
+        shifted = np.concatenate((previous, histograms[:-1]))
+        differences.append(0.5 * np.abs(histograms - shifted).sum(axis=1))
+        previous = histograms[-1:]
+    return np.concatenate(differences) if differences else np.zeros(0, dtype=np.float32)
+
+
+def rolling_median_mad(differences, window_size=51):
+    """
+    Rolling median and rolling MAD (median absolute deviation, scaled to a standard deviation) of the
+    differences. Static scenes get low values and busy scenes (camera motion, flashes) high ones.
+    """
+    median = median_filter(differences, size=window_size, mode="nearest")
+    mad = 1.4826 * median_filter(np.abs(differences - median), size=window_size, mode="nearest")
+    return median, mad
+
+
+def detect_transitions(differences, window_size=51, k=5.0, cut_minimum=0.15, cut_ratio=2.0, cut_radius=5,
+                       gradual_k=2.0, gradual_minimum=0.03, min_gradual_length=5, max_gradual_length=75,
+                       min_shot_length=5):
+    """
+    Detects cuts and gradual transitions (dissolves, fades) in the histogram differences.
+
+    Parameters:
+    - differences: output of "histogram_differences".
+    - window_size, k, cut_minimum: rolling window, MAD factor and absolute minimum of the cut threshold.
+    - cut_ratio, cut_radius: a cut must be "cut_ratio" times the largest other difference within
+      "cut_radius" frames.
+    - gradual_k, gradual_minimum: MAD factor and absolute minimum of the lower (twin comparison) threshold.
+    - min_gradual_length, max_gradual_length: length range (in frames) of a gradual transition.
+    - min_shot_length: cuts closer than this to the previous boundary are ignored (flashes).
+
+    Returns:
+    - (transitions, cut_threshold): list of (first_frame, last_frame) of every transition, where a cut
+      at frame i is (i, i) (i is the first frame of the new shot), and the per-frame cut threshold.
+    """
+    median, mad = rolling_median_mad(differences, window_size)
+    cut_threshold = np.maximum(median + k * mad, cut_minimum)
+    gradual_median, gradual_mad = rolling_median_mad(differences, max(window_size, 2 * max_gradual_length + 1))
+    low_threshold = np.maximum(gradual_median + gradual_k * gradual_mad, gradual_minimum)
+
+    # Cuts: above the threshold and well above every other difference in their neighbourhood
+    footprint = np.ones(2 * cut_radius + 1, dtype=bool)
+    footprint[cut_radius] = False
+    neighbours = maximum_filter(differences, footprint=footprint, mode="constant", cval=0.0)
+    is_cut = (differences > cut_threshold) & (differences >= cut_ratio * neighbours)
+    transitions = [(int(frame), int(frame)) for frame in np.flatnonzero(is_cut)]
+
+    # Gradual transitions: runs above the low threshold, without a cut, whose accumulated difference
+    # above the usual (long median) difference reaches the cut threshold
+    above = np.concatenate(([False], (differences > low_threshold) & ~is_cut, [False]))
+    edges = np.flatnonzero(np.diff(above.astype(np.int8)))
+    cumulative = np.concatenate(([0.0], np.cumsum(differences - gradual_median, dtype=np.float64)))
+    for start, end in zip(edges[::2], edges[1::2]):
+        length = end - start
+        if min_gradual_length <= length <= max_gradual_length \
+                and cumulative[end] - cumulative[start] >= cut_threshold[start:end].max():
+            transitions.append((int(start), int(end - 1)))
+
+    transitions.sort()
+    kept = []
+    for transition in transitions:
+        if not kept or transition[0] - kept[-1][1] >= min_shot_length:
+            kept.append(transition)
+    return kept, cut_threshold
+
+
+def transitions_to_scenes(transitions, n_frames):
+    """
+    Converts transitions into shots (start_frame, end_frame), in the TransNet scenes format. A cut (i, i)
+    ends the previous shot at i - 1 and starts the next one at i. The frames of a gradual transition do not
+    belong to any shot.
+    """
+    scenes = []
+    start = 0
+    for first, last in transitions:
+        if first > start:
+            scenes.append((start, first - 1))
+        start = first if first == last else last + 1
+    if start < n_frames:
+        scenes.append((start, n_frames - 1))
+    return np.array(scenes, dtype=np.int64).reshape(-1, 2)
+
+
+def transition_predictions(differences, cut_threshold, transitions):
+    """
+    Per-frame scores in the TransNet predictions format: a cut score (0.5 at the threshold) and a
+    transition score that is 1 on all frames of detected gradual transitions.
+    """
+    cut_scores = np.clip(0.5 * differences / cut_threshold, 0, 1)
+    transition_scores = cut_scores.copy()
+    for first, last in transitions:
+        if last > first:
+            transition_scores[first:last + 1] = 1
+    return np.column_stack((cut_scores, transition_scores))
+
+
+def detect_shots(batches, **detection_args):
+    """
+    Runs the whole detector over the frames of one video.
+
+    Returns:
+    - (scenes, predictions, transitions): arrays in the TransNet formats and the list of transitions.
+    """
+    differences = histogram_differences(batches)
+    transitions, cut_threshold = detect_transitions(differences, **detection_args)
+    scenes = transitions_to_scenes(transitions, len(differences))
+    return scenes, transition_predictions(differences, cut_threshold, transitions), transitions
+
+
+def write_transnet_files(output_prefix, scenes, predictions):
+    """
+    Writes {output_prefix}.scenes.txt and {output_prefix}.predictions.txt.
+    """
+    np.savetxt(output_prefix + ".scenes.txt", scenes, fmt="%d")
+    np.savetxt(output_prefix + ".predictions.txt", predictions, fmt="%.6f")
+
+
+def scene_boundaries(scenes):
+    """
+    Returns the boundary positions between consecutive shots (middle of the gap between them).
+    """
+    scenes = np.asarray(scenes).reshape(-1, 2)
+    return (scenes[:-1, 1] + scenes[1:, 0]) / 2
+
+
+def match_boundaries(predicted, reference, tolerance=2):
+    """
+    Matches predicted to reference boundaries one-to-one (in order) if they are at most "tolerance"
+    frames apart.
+
+    Returns:
+    - int: number of matched boundaries.
+    """
+    predicted, reference = np.sort(predicted), np.sort(reference)
+    i = j = matched = 0
+    while i < len(predicted) and j < len(reference):
+        if abs(predicted[i] - reference[j]) <= tolerance:
+            matched += 1
+            i += 1
+            j += 1
+        elif predicted[i] < reference[j]:
+            i += 1
+        else:
+            j += 1
+    return matched
+
+
+def agreement(predicted_scenes, reference_scenes, tolerance=2):
+    """
+    Precision, recall and F1 of the predicted shot boundaries against reference (TransNet) shots.
+    """
+    predicted = scene_boundaries(predicted_scenes)
+    reference = scene_boundaries(reference_scenes)
+    matched = match_boundaries(predicted, reference, tolerance)
+    precision = matched / len(predicted) if len(predicted) else 0.0
+    recall = matched / len(reference) if len(reference) else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"predicted": len(predicted), "reference": len(reference), "matched": matched,
+            "precision": precision, "recall": recall, "f1": f1}
+
+
+def process_folder(video_folder, output_folder, transnet_folder=None, tolerance=2):
+    """
+    Detects the shots of all videos in a folder, writes the TransNet-format files and, if a TransNet folder
+    is given, prints the agreement with the TransNet shots per video and in total.
+    """
+    from thumbnail_cache import get_thumbnails
+
+    os.makedirs(output_folder, exist_ok=True)
+    totals = {"predicted": 0, "reference": 0, "matched": 0}
+
+    for file in sorted(os.listdir(video_folder)):
+        if not file.endswith((".mxf", ".mp4")):
+            continue
+        start_time = time.time()
+        thumbnails = get_thumbnails(os.path.join(video_folder, file))
+        scenes, predictions, _ = detect_shots(thumbnails.iter_batches(4096))
+        write_transnet_files(os.path.join(output_folder, file), scenes, predictions)
+        elapsed = time.time() - start_time
+        speed = len(thumbnails) / thumbnails.fps / elapsed if elapsed > 0 else float("inf")
+        print(f"{file}: {len(scenes)} shots in {elapsed:.1f} s ({speed:.0f}x real time)")
+
+        reference_path = os.path.join(transnet_folder, file + ".scenes.txt") if transnet_folder else None
+        if reference_path and os.path.exists(reference_path):
+            result = agreement(scenes, np.loadtxt(reference_path, dtype=np.int64, ndmin=2), tolerance)
+            for key in totals:
+                totals[key] += result[key]
+            print(f"    vs TransNet: precision {result['precision']:.3f}, recall {result['recall']:.3f}, "
+                  f"F1 {result['f1']:.3f} ({result['matched']}/{result['reference']} boundaries)")
+
+    if totals["reference"]:
+        precision = totals["matched"] / max(totals["predicted"], 1)
+        recall = totals["matched"] / totals["reference"]
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        print(f"Total vs TransNet (tolerance {tolerance} frames): precision {precision:.3f}, "
+              f"recall {recall:.3f}, F1 {f1:.3f}")
+
+
+def main():
+    # Adjust these paths as needed.
+    video_folder = "../data/0_videos/21_08_2023/mxf"
+    output_folder = "../data/1_histogram_SBD_files"
+    transnet_folder = "../data/1_TransNet_files"
+
+    process_folder(video_folder, output_folder, transnet_folder)
+
+
+if __name__ == "__main__":
+    main()
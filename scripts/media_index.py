@@ -0,0 +1,241 @@
+"""
+Persistent metadata index for the videos of the archive, stored in a small SQLite table.
+
+Each video is probed once (with ffprobe, see media_probe.py) and its fps, frame count, duration,
+codecs and a content fingerprint are stored. After that, scripts look up the metadata in a dictionary
+instead of opening the video (MoviePy/OpenCV) just to read its frame rate. The index is the
+authoritative fps source for frame <-> millisecond conversions.
+
+An entry is re-probed automatically when the size or modification time of the video changes.
+
+Input:
+    - video files (.mxf or .mp4)
+
+Output:
+    - media_index.sqlite in the data folder
+    - per video: dictionary with "path", "name", "size", "mtime", "fps", "frame_count", "duration",
+      "video_codec", "audio_codec", "width", "height" and "fingerprint"
+
+Usage:
+    fps = get_frame_rate("../data/0_videos/21_08_2023/mxf/DS574_708549D-DGS00Z03UM8.mxf")
+    fps = get_frame_rate("DS574_708549D-DGS00Z03UM8")  # by name, only for videos already in the index
+"""
+
+import os
+import sqlite3
+import hashlib
+from media_probe import probe_media
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "media_index.sqlite")
+DEFAULT_FRAME_RATE = 25
+VIDEO_EXTENSIONS = (".mxf", ".mp4")
+
+COLUMNS = ["path", "name", "size", "mtime", "fps", "frame_count", "duration", "video_codec",
+           "audio_codec", "width", "height", "fingerprint"]
+
+
+def video_name(video_path):
+    """
+    Returns the name of a video: its file name without directory and extension.
+    """
+    return os.path.splitext(os.path.basename(video_path))[0]
+
+
+def content_fingerprint(video_path, chunk_size=2 ** 20):
+    """
+    Calculates a content fingerprint from the file size and the first and last "chunk_size" bytes.
+    Cheap to compute on multi-GB tapes, but still changes when the content is replaced.
+    """
+    size = os.path.getsize(video_path)
+    sha1 = hashlib.sha1(str(size).encode())
+    with open(video_path, "rb") as file:
+        sha1.update(file.read(chunk_size))
+        if size > chunk_size:
+            file.seek(max(chunk_size, size - chunk_size))
+            sha1.update(file.read(chunk_size))
+    return sha1.hexdigest()
+
+
+class MediaIndex:
+    """
+    SQLite-backed metadata index. All entries are loaded into memory when the index is opened, so
+    lookups are dictionary lookups; only new or changed videos hit ffprobe and the database.
+
+    Entries are keyed by absolute path. "by_name" maps a video name to all entries with that name, because
+    shot videos of different tapes share names (split_0_41, ...); lookups by an ambiguous name fail.
+    The database file is only created when the first video is added.
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        self.index_path = index_path
+        self.connection = None
+        self.entries = {}
+        self.by_name = {}
+        if os.path.exists(index_path):
+            rows = self._connect().execute(f"SELECT {', '.join(COLUMNS)} FROM media").fetchall()
+            for row in rows:
+                self._store(dict(zip(COLUMNS, row)))
+
+    def _connect(self):
+        if self.connection is None:
+            # Several processes can add videos at the same time; wait up to a minute for the write lock
+            self.connection = sqlite3.connect(self.index_path, timeout=60)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS media ("
+                "path TEXT PRIMARY KEY, name TEXT, size INTEGER, mtime REAL, fps REAL, frame_count INTEGER, "
+                "duration REAL, video_codec TEXT, audio_codec TEXT, width INTEGER, height INTEGER, fingerprint TEXT)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS media_name ON media (name)")
+            self.connection.commit()
+        return self.connection
+
+    def _store(self, entry):
+        self.entries[entry["path"]] = entry
+        same_name = [e for e in self.by_name.get(entry["name"], []) if e["path"] != entry["path"]]
+        self.by_name[entry["name"]] = same_name + [entry]
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _is_current(self, entry, video_path):
+        stat = os.stat(video_path)
+        return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+
+    def add(self, video_path):
+        """
+        Probes a video and stores (or replaces) its entry.
+        """
+        path = os.path.abspath(video_path)
+        stat = os.stat(path)
+        info = probe_media(path, count_frames=True)
+        entry = {"path": path, "name": video_name(path), "size": stat.st_size, "mtime": stat.st_mtime,
+                 "fingerprint": content_fingerprint(path)}
+        entry.update({key: info[key] for key in COLUMNS if key in info})
+
+        connection = self._connect()
+        connection.execute(
+            f"INSERT OR REPLACE INTO media ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            [entry[key] for key in COLUMNS]
+        )
+        connection.commit()
+        self._store(entry)
+        return entry
+
+    def find(self, name):
+        """
+        Returns the entry of the only indexed video with this name.
+        Raises KeyError if there is no such video or if several videos have this name.
+        """
+        entries = self.by_name.get(name, [])
+        if len(entries) != 1:
+            problem = "not in the media index" if not entries else f"ambiguous ({len(entries)} videos in the media index)"
+            raise KeyError(f"Video name {name} is {problem}.")
+        return entries[0]
+
+    def get(self, video_path):
+        """
+        Returns the metadata of a video. If "video_path" is an existing file, it is probed when it
+        is not in the index yet or has changed. Otherwise it is looked up by video name.
+        """
+        if os.path.isfile(video_path):
+            entry = self.entries.get(os.path.abspath(video_path))
+            if entry is None or not self._is_current(entry, video_path):
+                entry = self.add(video_path)
+            return entry
+
+        return self.find(video_name(video_path))
+
+    def fps(self, video_path, default=DEFAULT_FRAME_RATE):
+        """
+        Returns the frame rate of a video, or "default" if it is unknown.
+        """
+        try:
+            return self.get(video_path)["fps"] or default
+        except KeyError:
+            return default
+
+    def add_folder(self, folder):
+        """
+        Adds (or refreshes) all videos in a folder.
+        """
+        for file in sorted(os.listdir(folder)):
+            if file.endswith(VIDEO_EXTENSIONS):
+                entry = self.get(os.path.join(folder, file))
+                print(f"{entry['name']}: {entry['fps']} fps, {entry['frame_count']} frames, {entry['video_codec']}")
+
+
+_default_index = None
+
+
+def get_media_index():
+    """
+    Returns the shared index at DEFAULT_INDEX_PATH, opened on first use.
+    """
+    global _default_index
+    if _default_index is None:
+        _default_index = MediaIndex()
+    return _default_index
+
+
+def get_metadata(video_path):
+    return get_media_index().get(video_path)
+
+
+def get_frame_rate(video_path, default=DEFAULT_FRAME_RATE):
+    return get_media_index().fps(video_path, default)
+
+
+def get_eaf_frame_rate(eaf_root, eaf_file_path, default=DEFAULT_FRAME_RATE):
+    """
+    Looks up the frame rate of the video an ELAN file belongs to. The video is identified by the
+    linked media file (MEDIA_DESCRIPTOR), or else by the annotation folder / file name.
+
+    Parameters:
+    - eaf_root: Root element of the parsed EAF file.
+    - eaf_file_path (str): Path to the EAF file.
+    - default: Frame rate returned when the video is not in the index.
+    """
+    candidates = [descriptor.attrib.get("MEDIA_URL", "") for descriptor in eaf_root.findall(".//MEDIA_DESCRIPTOR")]
+    candidates += [os.path.dirname(os.path.abspath(eaf_file_path)), eaf_file_path.replace("annotations_", "")]
+
+    index = get_media_index()
+    for candidate in candidates:
+        candidate = candidate.replace("\\", "/")
+        if candidate.startswith("file://"):
+            candidate = candidate[len("file://"):]
+        # An exact path first; a name only if it identifies a single video
+        entry = index.entries.get(os.path.abspath(candidate)) if candidate else None
+        if entry is None and len(index.by_name.get(video_name(candidate), [])) == 1:
+            entry = index.by_name[video_name(candidate)][0]
+        if entry is not None:
+            return entry["fps"] or default
+    return default
+
+
+def frame_to_ms(frame, frame_rate):
+    return int(frame / frame_rate * 1000)
+
+
+def ms_to_frame(ms, frame_rate):
+    return int((ms / 1000) * frame_rate)
+
+
+def main():
+    # Folder containing the videos; adjust as needed.
+    video_folder = "../data/0_videos/21_08_2023/mxf"
+
+    with MediaIndex() as index:
+        index.add_folder(video_folder)
+        print(f"{len(index.entries)} videos in {index.index_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Reads the metadata of a video file with ffprobe, without decoding it.
+
+Input:
+    - video file (.mxf or .mp4)
+
+Output:
+    - dictionary with:
+        - "fps": frame rate of the first video stream
+        - "frame_count": number of frames of the first video stream
+        - "duration": duration in seconds
+        - "video_codec" / "audio_codec": codec names (None if there is no such stream)
+        - "width" / "height": frame size
+        - "format": container format name
+"""
+
+import json
+import subprocess
+from fractions import Fraction
+
+
+def _parse_rate(rate):
+    """
+    Converts an ffprobe rate such as "25/1" or "30000/1001" to a float (0.0 if unknown).
+    """
+    try:
+        return float(Fraction(rate))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_media(video_path, count_frames=False):
+    """
+    Probes a video file with ffprobe.
+
+    Parameters:
+    - video_path (str): Path to the video file.
+    - count_frames (bool): Count the packets of the video stream instead of trusting the container
+                           header. Slower (the file is demuxed, not decoded) but exact.
+
+    Returns:
+    - dict: The metadata of the video, see the module docstring.
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+    ]
+    if count_frames:
+        cmd += ["-count_packets"]
+    cmd += [video_path]
+
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {video_path}: {process.stderr.decode(errors='replace')}")
+    info = json.loads(process.stdout)
+
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    container = info.get("format", {})
+
+    fps = _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate"))
+    duration = float(video.get("duration") or container.get("duration") or 0.0)
+
+    if count_frames and video.get("nb_read_packets"):
+        frame_count = int(video["nb_read_packets"])
+    elif video.get("nb_frames"):
+        frame_count = int(video["nb_frames"])
+    else:
+        frame_count = int(round(duration * fps))
+
+    return {
+        "fps": fps,
+        "frame_count": frame_count,
+        "duration": duration,
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "format": container.get("format_name"),
+    }
+
+
+if __name__ == "__main__":
+    print(probe_media("../data/0_videos/21_08_2023/mxf/DS574_708549D-DGS00Z03UM8.mxf"))
@@ -0,0 +1,349 @@
+"""
+Indexed queries over the shots, ELAN annotations and boundary scores of all tapes.
+
+Answering "which shots, annotations and scores fall in 01:23:00-01:25:00 of tape X" used to mean parsing
+the scenes.txt and EAF files again and recomputing scores. This script loads them once per tape into
+sorted interval indexes:
+    - the intervals are split into lanes of non-overlapping intervals (the tiers of an EAF file overlap
+      each other), so within a lane both the start and the end times are sorted,
+    - a range query is then two binary searches per lane plus the matching intervals: O(log n + k).
+Score curves ({video}.scores.npy, see LDA_pipeline/score_reports.py) are sorted by frame and sliced the
+same way. Tapes are loaded on first use and kept in memory, so later queries take milliseconds.
+
+Input:
+    - folder with TransNet files: {video}.{ext}.scenes.txt
+    - annotation folders (SBD and caspian): {annotation_folder}/{video}/*.eaf
+    - folder with score curves: {video}.scores.npy (optional)
+
+Output:
+    - per query: dictionary with the shots, annotations and scores in the range (JSON serializable)
+    - optional local HTTP endpoint:
+        GET  /videos
+        GET  /query?video=DS574_708549D-DGS00Z03UM8&start=01:23:00&end=01:25:00
+             (start and end as timecode, or frame numbers with &unit=frame, or milliseconds with &unit=ms)
+        POST /batch with a JSON list of {"video", "start", "end", "unit"} objects
+"""
+
+import os
+import json
+import heapq
+import threading
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from media_index import get_eaf_frame_rate, DEFAULT_FRAME_RATE
+
+
+class IntervalIndex:
+    """
+    Static index of closed intervals [start, end] with a payload each, split into lanes of
+    non-overlapping intervals.
+    """
+
+    def __init__(self, intervals):
+        """
+        Parameters:
+        - intervals: iterable of (start, end, payload).
+        """
+        # Greedy lane assignment: every interval goes to the lane that became free first
+        lanes = []
+        free_lanes = []  # heap of (end of the last interval, lane number)
+        for start, end, payload in sorted(intervals, key=lambda interval: (interval[0], interval[1])):
+            if free_lanes and free_lanes[0][0] <= start:
+                _, lane = heapq.heappop(free_lanes)
+            else:
+                lane = len(lanes)
+                lanes.append([])
+            lanes[lane].append((start, end, payload))
+            heapq.heappush(free_lanes, (end, lane))
+
+        self.lanes = [(np.array([i[0] for i in lane]), np.array([i[1] for i in lane]), [i[2] for i in lane])
+                      for lane in lanes]
+        self.size = sum(len(lane) for lane in lanes)
+
+    def __len__(self):
+        return self.size
+
+    def query(self, start, end):
+        """
+        Returns the (start, end, payload) of all intervals that overlap [start, end], sorted by start.
+        """
+        results = []
+        for starts, ends, payloads in self.lanes:
+            # First interval that ends at or after "start", and first interval that starts after "end"
+            first = int(np.searchsorted(ends, start, side="left"))
+            last = int(np.searchsorted(starts, end, side="right"))
+            results += [(starts[i].item(), ends[i].item(), payloads[i]) for i in range(first, last)]
+        results.sort(key=lambda interval: (interval[0], interval[1]))
+        return results
+
+
+def parse_timecode(timecode):
+    """
+    Converts "HH:MM:SS", "MM:SS" or "HH:MM:SS.mmm" into milliseconds.
+    """
+    seconds = 0.0
+    for part in str(timecode).split(":"):
+        seconds = seconds * 60 + float(part)
+    return int(round(seconds * 1000))
+
+
+def format_timecode(ms):
+    seconds, ms = divmod(int(ms), 1000)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}.{ms:03d}"
+
+
+def read_eaf_intervals(eaf_path):
+    """
+    Reads all time-aligned annotations of an EAF file.
+
+    Returns:
+    - (intervals, frame_rate): list of (start_ms, end_ms, tier, value) and the frame rate of the video.
+    """
+    root = ET.parse(eaf_path).getroot()
+    time_slots = {slot.attrib.get("TIME_SLOT_ID"): slot.attrib.get("TIME_VALUE")
+                  for slot in root.findall(".//TIME_ORDER/TIME_SLOT")}
+
+    intervals = []
+    for tier in root.findall(".//TIER"):
+        tier_id = tier.attrib.get("TIER_ID")
+        for annotation in tier.findall(".//ALIGNABLE_ANNOTATION"):
+            start = time_slots.get(annotation.attrib.get("TIME_SLOT_REF1"))
+            end = time_slots.get(annotation.attrib.get("TIME_SLOT_REF2"))
+            if start is None or end is None:
+                continue
+            value = annotation.find(".//ANNOTATION_VALUE").text or ""
+            intervals.append((int(start), int(end), tier_id, value))
+    return intervals, get_eaf_frame_rate(root, eaf_path)
+
+
+class TapeIndex:
+    """
+    Shots (in frames), annotations (in milliseconds) and score curve (in frames) of one tape.
+    """
+
+    def __init__(self, video, scenes_path=None, eaf_paths=(), scores_path=None):
+        self.video = video
+        self.frame_rate = None
+
+        shots = np.loadtxt(scenes_path, dtype=np.int64, ndmin=2) if scenes_path else np.zeros((0, 2), dtype=np.int64)
+        self.shots = IntervalIndex((int(s), int(e), number) for number, (s, e) in enumerate(shots))
+
+        annotations = []
+        for source, eaf_path in eaf_paths:
+            intervals, frame_rate = read_eaf_intervals(eaf_path)
+            self.frame_rate = self.frame_rate or frame_rate
+            annotations += [(start, end, {"source": source, "tier": tier, "value": value})
+                            for start, end, tier, value in intervals]
+        self.annotations = IntervalIndex(annotations)
+        self.frame_rate = self.frame_rate or DEFAULT_FRAME_RATE
+
+        # Score curve: array (n, 2) with the frame number and score per row
+        if scores_path:
+            curve = np.load(scores_path)
+            curve = curve[np.argsort(curve[:, 0], kind="stable")]
+            self.score_frames, self.scores = curve[:, 0], curve[:, 1]
+        else:
+            self.score_frames, self.scores = np.zeros(0), np.zeros(0)
+
+    def ms_to_frame(self, ms):
+        return int(ms / 1000 * self.frame_rate)
+
+    def frame_to_ms(self, frame):
+        return int(frame / self.frame_rate * 1000)
+
+    def query(self, start, end, unit="timecode"):
+        """
+        Returns the shots, annotations and scores that overlap a range of the tape.
+
+        Parameters:
+        - start, end: range, as timecodes ("01:23:00"), frame numbers or milliseconds.
+        - unit: "timecode", "frame" or "ms".
+        """
+        if unit == "timecode":
+            start_ms, end_ms = parse_timecode(start), parse_timecode(end)
+            start_frame, end_frame = self.ms_to_frame(start_ms), self.ms_to_frame(end_ms)
+        elif unit == "ms":
+            start_ms, end_ms = int(start), int(end)
+            start_frame, end_frame = self.ms_to_frame(start_ms), self.ms_to_frame(end_ms)
+        elif unit == "frame":
+            start_frame, end_frame = int(start), int(end)
+            start_ms, end_ms = self.frame_to_ms(start_frame), self.frame_to_ms(end_frame)
+        else:
+            raise ValueError(f"Unknown unit: {unit}")
+
+        first = int(np.searchsorted(self.score_frames, start_frame, side="left"))
+        last = int(np.searchsorted(self.score_frames, end_frame, side="right"))
+        scores = self.scores[first:last]
+        peak = int(np.nanargmax(scores)) if len(scores) and not np.all(np.isnan(scores)) else None
+
+        return {
+            "video": self.video,
+            "frame_rate": self.frame_rate,
+            "start": {"frame": start_frame, "ms": start_ms, "timecode": format_timecode(start_ms)},
+            "end": {"frame": end_frame, "ms": end_ms, "timecode": format_timecode(end_ms)},
+            "shots": [{"shot": number, "start_frame": s, "end_frame": e,
+                       "start": format_timecode(self.frame_to_ms(s)), "end": format_timecode(self.frame_to_ms(e))}
+                      for s, e, number in self.shots.query(start_frame, end_frame)],
+            "annotations": [dict(payload, start_ms=s, end_ms=e, start=format_timecode(s), end=format_timecode(e))
+                            for s, e, payload in self.annotations.query(start_ms, end_ms)],
+            "scores": {
+                "frames": self.score_frames[first:last].astype(int).tolist(),
+                "scores": [None if np.isnan(score) else float(score) for score in scores],
+                "max_frame": None if peak is None else int(self.score_frames[first + peak]),
+                "max_score": None if peak is None else float(scores[peak]),
+            },
+        }
+
+
+class QueryService:
+    """
+    Finds the files of every tape in the data folders and loads the tapes into TapeIndex objects on
+    first use. Safe to use from several threads.
+    """
+
+    def __init__(self, transnet_folder, annotation_folders=(), scores_folder=None):
+        self.files = {}
+        for file in sorted(os.listdir(transnet_folder)):
+            if file.endswith(".scenes.txt"):
+                self._files(file.split(".")[0])["scenes_path"] = os.path.join(transnet_folder, file)
+
+        for annotation_folder in annotation_folders:
+            source = os.path.basename(os.path.normpath(annotation_folder))
+            for video in sorted(os.listdir(annotation_folder)):
+                video_folder = os.path.join(annotation_folder, video)
+                if os.path.isdir(video_folder):
+                    self._files(video)["eaf_paths"] += [(source, os.path.join(video_folder, file))
+                                                        for file in sorted(os.listdir(video_folder))
+                                                        if file.endswith(".eaf")]
+
+        if scores_folder and os.path.isdir(scores_folder):
+            for file in sorted(os.listdir(scores_folder)):
+                if file.endswith(".scores.npy"):
+                    self._files(file[:-len(".scores.npy")])["scores_path"] = os.path.join(scores_folder, file)
+
+        self.tapes = {}
+        self.lock = threading.Lock()
+
+    def _files(self, video):
+        return self.files.setdefault(video, {"scenes_path": None, "eaf_paths": [], "scores_path": None})
+
+    def videos(self):
+        return sorted(self.files)
+
+    def tape(self, video):
+        """
+        Returns the TapeIndex of a video, loading it on first use.
+        """
+        with self.lock:
+            if video not in self.tapes:
+                if video not in self.files:
+                    raise KeyError(f"Unknown video: {video}")
+                self.tapes[video] = TapeIndex(video, **self.files[video])
+            return self.tapes[video]
+
+    def query(self, video, start, end, unit="timecode"):
+        return self.tape(video).query(start, end, unit)
+
+    def batch_query(self, requests):
+        """
+        Runs several queries, possibly across tapes. Each request is a dict with "video", "start", "end"
+        and optionally "unit". Failed requests get an "error" entry instead of a result.
+        Raises ValueError if "requests" is not a list of dicts.
+        """
+        if not isinstance(requests, list) or not all(isinstance(request, dict) for request in requests):
+            raise ValueError('Expected a JSON list of {"video", "start", "end", "unit"} objects.')
+
+        results = []
+        for request in requests:
+            try:
+                results.append(self.query(request["video"], request["start"], request["end"],
+                                          request.get("unit", "timecode")))
+            except (KeyError, ValueError, TypeError) as e:
+                results.append({"video": request.get("video"), "error": str(e.args[0]) if e.args else repr(e)})
+        return results
+
+
+def make_handler(service):
+    """
+    Returns a request handler class for ThreadingHTTPServer that answers queries from "service".
+    """
+    class QueryHandler(BaseHTTPRequestHandler):
+        def _send_json(self, data, status=200):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parameters = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if url.path == "/videos":
+                self._send_json(service.videos())
+            elif url.path == "/query":
+                try:
+                    self._send_json(service.query(parameters["video"], parameters["start"], parameters["end"],
+                                                  parameters.get("unit", "timecode")))
+                except KeyError as e:
+                    self._send_json({"error": f"Missing parameter or unknown video: {e}"}, 404)
+                except ValueError as e:
+                    self._send_json({"error": str(e)}, 400)
+            else:
+                self._send_json({"error": "Not found"}, 404)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/batch":
+                self._send_json({"error": "Not found"}, 404)
+                return
+            try:
+                requests = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except ValueError as e:
+                self._send_json({"error": f"Invalid JSON: {e}"}, 400)
+                return
+            try:
+                results = service.batch_query(requests)
+            except ValueError as e:
+                self._send_json({"error": str(e)}, 400)
+                return
+            self._send_json(results)
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryHandler
+
+
+def serve(service, host="127.0.0.1", port=8765):
+    """
+    Serves the queries over HTTP until interrupted. Binds to localhost by default.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving {len(service.videos())} videos on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    # Adjust these paths as needed.
+    transnet_folder = "../data/1_TransNet_files"
+    annotation_folders = ["../data/2_annotation_files/SBD", "../data/2_annotation_files/caspian"]
+    scores_folder = "../data/6_scores"
+
+    service = QueryService(transnet_folder, annotation_folders, scores_folder)
+    result = service.query("DS574_708549D-DGS00Z03UM8", "00:10:00", "00:11:00")
+    print(f"{len(result['shots'])} shots and {len(result['annotations'])} annotations in "
+          f"{result['start']['timecode']} - {result['end']['timecode']}")
+
+    serve(service)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,11 +17,16 @@ Based on the annotation file, calculates a segmentation vector.
 """
 
 import xml.etree.ElementTree as ET
+from media_index import get_eaf_frame_rate
 
-def read_eaf(file_path, frame_rate=25):
+def read_eaf(file_path, frame_rate=None):
     tree = ET.parse(file_path)
     root = tree.getroot()
 
+    # Use the frame rate of the linked video from the media index (25 if it is not indexed)
+    if frame_rate is None:
+        frame_rate = get_eaf_frame_rate(root, file_path)
+
     # Create a dictionary for time slot references
     time_slots = {}
     for time_slot in root.findall(".//TIME_ORDER/TIME_SLOT"):
@@ -46,7 +51,7 @@ def read_eaf(file_path, frame_rate=25):
             start_frame = int((int(time_slots[start_time_ref]) / 1000) * frame_rate)
             end_frame = int((int(time_slots[end_time_ref]) / 1000) * frame_rate)
 
-            annotation_value = annotation.find(".//ANNOTATION_VALUE").text
+            annotation_value = annotation.find(".//ANNOTATION_VALUE").text or ""
 
             # Check if the annotation value is a program
             segment_value = 1 if annotation_value.startswith("program ") else 0
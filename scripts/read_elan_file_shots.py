@@ -17,6 +17,7 @@ based on the annotation file.
 
 import os
 import xml.etree.ElementTree as ET
+from media_index import get_eaf_frame_rate
 
 # Function to read shot file and return a list of shots
 def read_shot_file(file_path):
@@ -25,10 +26,14 @@ def read_shot_file(file_path):
     return shots
 
 # Function to read EAF file and extract segmentation information
-def read_eaf(file_path, frame_rate=25):
+def read_eaf(file_path, frame_rate=None):
     tree = ET.parse(file_path)
     root = tree.getroot()
 
+    # Use the frame rate of the linked video from the media index (25 if it is not indexed)
+    if frame_rate is None:
+        frame_rate = get_eaf_frame_rate(root, file_path)
+
     # Extract time slot information
     time_slots = {time_slot.attrib.get("TIME_SLOT_ID"): time_slot.attrib.get("TIME_VALUE") for time_slot in root.findall(".//TIME_ORDER/TIME_SLOT")}
     
@@ -41,7 +46,7 @@ def read_eaf(file_path, frame_rate=25):
             end_time_ref = annotation.attrib.get("TIME_SLOT_REF2")
             start_frame = int((int(time_slots[start_time_ref]) / 1000) * frame_rate)
             end_frame = int((int(time_slots[end_time_ref]) / 1000) * frame_rate)
-            annotation_value = annotation.find(".//ANNOTATION_VALUE").text
+            annotation_value = annotation.find(".//ANNOTATION_VALUE").text or ""
             segment_value = 1 if annotation_value.startswith("program ") else 0
             segmentation_vector.append((start_frame, end_frame, segment_value))
 
@@ -61,7 +66,7 @@ def divide_into_shots(segmentation_vector, shots):
     return shot_vector
 
 # Function to get shot vector from EAF and shot file
-def get_shot_vector(eaf_file_path, shot_file_path, frame_rate=25):
+def get_shot_vector(eaf_file_path, shot_file_path, frame_rate=None):
     segmentation_vector = read_eaf(eaf_file_path, frame_rate)
     shots = read_shot_file(shot_file_path)
     shot_vector = divide_into_shots(segmentation_vector, shots)
@@ -74,7 +79,7 @@ def main():
     
     eaf_file_path = "../data/2_annotation_files/caspian/DS782_722374D-DGS00Z03UDY/DS782_722374D-DGS00Z03UDY.eaf"
     shot_file_path = "../data/1_TransNet_files/DS782_722374D-DGS00Z03UDY.mp4.scenes.txt"
-    frame_rate = 25
+    frame_rate = None  # looked up in the media index
     # Get the shot vector
     shot_vector = get_shot_vector(eaf_file_path, shot_file_path, frame_rate)
     print(shot_vector)
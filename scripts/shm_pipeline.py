@@ -0,0 +1,272 @@
+"""
+Pipelined full-frame feature extraction: one decoder process and several feature worker processes that
+share the decoded frames through shared memory.
+
+In a plain decode loop (color_hists_full_videos.process_video, frame_features.extract_features) one core
+alternates between decoding a frame and computing its features, so the tape takes decode time plus feature
+time. Here the two overlap:
+    - the decoder process decodes the videos one after another into a ring of "multiprocessing.shared_memory"
+      slots, each holding a batch of consecutive RGB frames,
+    - a slot id goes from the "free" queue to the decoder, which fills it and puts it on the "filled" queue;
+      a worker takes it, runs the extractors of frame_features.py on a numpy view of the slot (no copy) and
+      puts the slot back on the "free" queue. When all slots are in use, the decoder waits for a free one
+      (backpressure), so memory stays bounded at "n_slots" batches,
+    - the workers write their results into shared output arrays at the frame index of the batch, so the
+      batches can be finished in any order.
+Each slot has room for one extra frame: the decoder copies the last frame of the previous batch into it,
+so features that compare with the previous frame ("frame_difference") also work at batch boundaries.
+
+The output arrays are allocated from the expected frame counts: passed by the caller (for example from the
+shot names or the scenes file of the tape, so the shot videos are not probed one by one), or else taken
+from the media index (media_index.py). The frame size is taken from the first decoded frame.
+Several videos (for example the shot videos of a tape) are decoded into one consecutive range of frame
+indexes, so the processes are only started once.
+
+Input:
+    - video files, and the names of registered features (frame_features.py) or unregistered
+      frame_features.FeatureExtractor tuples (with a module-level function, so the workers can load it)
+
+Output:
+    - dictionary with one numpy array per feature, shape (n_frames, *feature_shape), like
+      frame_features.extract_features
+    - number of decoded frames per video
+
+Usage:
+    features, frame_counts = extract_features_pipelined(video_paths, names=["rgb_histogram"], n_workers=4)
+"""
+
+import os
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from frame_features import FEATURE_EXTRACTORS, FeatureExtractor, FrameBatch
+from media_index import get_metadata
+
+
+def read_frames(video_path):
+    """
+    Decodes a video with OpenCV and yields its RGB frames.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        cap.release()
+
+
+def attach(name, shape, dtype):
+    """
+    Opens an existing shared memory block and returns (block, numpy view of it).
+    """
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def decoder_process(video_paths, slot_names, slot_shape, capacity, free, filled, n_workers, frame_counts,
+                    reader=read_frames):
+    """
+    Decodes the videos into the slots of the ring. Puts (slot, start_frame, n_frames, has_previous) on
+    "filled" for every batch and one None per worker at the end. The number of decoded frames of every
+    video is written into the shared array "frame_counts".
+    """
+    blocks, slots = zip(*(attach(name, slot_shape, np.uint8) for name in slot_names))
+    batch_frames = slot_shape[0] - 1
+    previous = np.empty(slot_shape[1:], dtype=np.uint8)
+    start = 0
+
+    try:
+        for index, video_path in enumerate(video_paths):
+            frames = reader(video_path)
+            video_start = start
+            has_previous = False
+            slot, n = None, 0
+
+            for frame in frames:
+                if start + n >= capacity:
+                    raise ValueError(f"{video_path}: more frames than expected ({capacity} in total with the "
+                                     f"slack), check the frame counts or refresh the media index.")
+                if frame.shape != slot_shape[1:]:
+                    raise ValueError(f"{video_path}: frame shape {frame.shape}, expected {slot_shape[1:]}.")
+                if slot is None:
+                    slot = free.get()
+                    if has_previous:
+                        slots[slot][0] = previous
+                slots[slot][n + 1] = frame
+                n += 1
+                if n == batch_frames:
+                    previous[:] = slots[slot][n]
+                    filled.put((slot, start, n, has_previous))
+                    start += n
+                    slot, n, has_previous = None, 0, True
+
+            if slot is not None:
+                filled.put((slot, start, n, has_previous))
+                start += n
+            frame_counts[index] = start - video_start
+    finally:
+        for _ in range(n_workers):
+            filled.put(None)
+        del slots
+        for block in blocks:
+            block.close()
+
+
+def feature_worker(extractors, slot_names, slot_shape, outputs, free, filled, done):
+    """
+    Runs the extractors on the filled slots until it gets None. "outputs" lists (feature name, shared
+    memory name, shape, dtype) of the output arrays; "done" counts the processed frames.
+    """
+    blocks, slots = zip(*(attach(name, slot_shape, np.uint8) for name in slot_names))
+    output_blocks, output_arrays = {}, {}
+    for name, block_name, shape, dtype in outputs:
+        output_blocks[name], output_arrays[name] = attach(block_name, shape, dtype)
+
+    try:
+        while True:
+            task = filled.get()
+            if task is None:
+                break
+            slot, start, n, has_previous = task
+            frames = slots[slot]
+            batch = FrameBatch(frames[1:n + 1], frames[0] if has_previous else None)
+            for e in extractors:
+                output_arrays[e.name][start:start + n] = e.function(batch)
+            del batch, frames
+            free.put(slot)
+            with done.get_lock():
+                done.value += n
+    finally:
+        del slots, output_arrays
+        for block in list(blocks) + list(output_blocks.values()):
+            block.close()
+
+
+def first_frame_shape(video_path, reader=read_frames):
+    """
+    Returns the shape (height, width, 3) of the first frame of a video.
+    """
+    frames = reader(video_path)
+    try:
+        return next(iter(frames)).shape
+    except StopIteration:
+        raise ValueError(f"{video_path}: no frames could be decoded.")
+    finally:
+        if hasattr(frames, "close"):
+            frames.close()
+
+
+def extract_features_pipelined(video_paths, names=None, n_workers=None, n_slots=None, batch_frames=8,
+                               reader=read_frames, progress_interval=10.0, frame_counts=None):
+    """
+    Extracts features from all frames of the videos with one decoder and "n_workers" feature processes.
+
+    Parameters:
+    - video_paths: list of video files (all with the same frame size), decoded in this order.
+    - names: list of feature names or FeatureExtractor tuples (default: all registered features).
+    - n_workers: number of feature processes (default: number of cores - 1, the decoder has the last one).
+    - n_slots: number of batches in the ring (default: 2 per worker).
+    - batch_frames: number of frames per slot.
+    - reader: function that yields the RGB frames of a video (default: OpenCV).
+    - progress_interval: seconds between progress messages.
+    - frame_counts: expected number of frames of every video, to size the output arrays (default: from the
+      media index, which probes every video that is not indexed yet). A video may decode a frame more than
+      expected; more than that raises.
+
+    Returns:
+    - (features, frame_counts): dict feature name -> array (n_frames, *shape), with the frames of all videos
+      in order, and the number of frames of each video.
+    """
+    if isinstance(video_paths, str):
+        video_paths = [video_paths]
+    extractors = [name if isinstance(name, FeatureExtractor) else FEATURE_EXTRACTORS[name]
+                  for name in names or FEATURE_EXTRACTORS]
+    names = [e.name for e in extractors]
+    n_workers = n_workers or max(1, (os.cpu_count() or 2) - 1)
+    n_slots = n_slots or 2 * n_workers
+
+    # Frame size from the first frame (the decoder checks all others); one frame of slack per video and one
+    # batch in total, in case OpenCV decodes a few more frames than expected
+    if frame_counts is None:
+        frame_counts = [get_metadata(video_path)["frame_count"] or 0 for video_path in video_paths]
+    expected_frames = sum(frame_counts)
+    capacity = expected_frames + len(video_paths) + batch_frames
+    slot_shape = (batch_frames + 1,) + tuple(first_frame_shape(video_paths[0], reader))
+
+    slot_blocks, output_blocks = [], []
+    processes, started = [], []
+    try:
+        for _ in range(n_slots):
+            slot_blocks.append(shared_memory.SharedMemory(create=True, size=int(np.prod(slot_shape))))
+        slot_names = [block.name for block in slot_blocks]
+        outputs = []
+        for e in extractors:
+            shape = (capacity,) + e.shape
+            output_blocks.append(shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * e.dtype.itemsize))
+            outputs.append((e.name, output_blocks[-1].name, shape, e.dtype.str))
+
+        free, filled = mp.Queue(), mp.Queue()
+        for slot in range(n_slots):
+            free.put(slot)
+        decoded_counts = mp.Array("q", len(video_paths), lock=False)
+        done = mp.Value("q", 0)
+
+        processes.append(mp.Process(target=decoder_process, args=(video_paths, slot_names, slot_shape, capacity,
+                                                                  free, filled, n_workers, decoded_counts, reader)))
+        processes += [mp.Process(target=feature_worker, args=(extractors, slot_names, slot_shape, outputs, free,
+                                                              filled, done)) for _ in range(n_workers)]
+        start_time = time.time()
+        for process in processes:
+            process.start()
+            started.append(process)
+
+        # Wait for all processes; a crashed process would leave the others waiting for slots forever
+        last_report = start_time
+        while any(process.is_alive() for process in processes):
+            next(process for process in processes if process.is_alive()).join(timeout=0.5)
+            if any(process.exitcode not in (None, 0) for process in processes):
+                raise RuntimeError("A decoder or feature process failed, see its traceback above.")
+            if time.time() - last_report >= progress_interval:
+                last_report = time.time()
+                print(f"Processed {done.value}/{expected_frames} frames "
+                      f"({done.value / (last_report - start_time):.0f} frames/s)")
+
+        n_frames = sum(decoded_counts)
+        features = {}
+        for (name, _, shape, dtype), block in zip(outputs, output_blocks):
+            features[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)[:n_frames].copy()
+        elapsed = time.time() - start_time
+        print(f"Extracted {', '.join(names)} from {n_frames} frames in {elapsed:.1f} s "
+              f"({n_frames / max(elapsed, 1e-9):.0f} frames/s, {n_workers} workers)")
+        return features, list(decoded_counts)
+    finally:
+        for process in started:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        for block in slot_blocks + output_blocks:
+            block.close()
+            block.unlink()
+
+
+def main():
+    # Shot videos of a tape; adjust as needed.
+    folder = "../data/3_MoviePy_segmentation/DS782_722374D-DGS00Z03UDY"
+    names = ["rgb_histogram"]
+    n_workers = 4
+
+    video_paths = [os.path.join(folder, file) for file in sorted(os.listdir(folder)) if file.endswith(".mp4")]
+    features, frame_counts = extract_features_pipelined(video_paths, names, n_workers)
+
+    for name, array in features.items():
+        print(f"{name}: {array.shape} {array.dtype}")
+
+
+if __name__ == "__main__":
+    main()
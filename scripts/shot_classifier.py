@@ -0,0 +1,225 @@
+"""
+Trains a program/non-program classifier on the TransNet shots of all annotated videos and labels new tapes
+with it in one batched pass.
+
+"get_shot_vector" (read_elan_file_shots.py) gives a label for every TransNet shot of an annotated video.
+This script turns every shot into a feature vector (shot-rhythm features of shot_rhythm.py at the middle of
+the shot, the shot length and the position in the tape) and trains incremental learners on them:
+    1. a StandardScaler, fitted with "partial_fit" over all batches,
+    2. a linear SGDClassifier (logistic loss), trained with "partial_fit" for a few epochs, with the
+       classes weighted by their inverse frequency.
+Only one video is in memory at a time, so the corpus can grow without the memory growing with it.
+
+Labeling a new tape is a single vectorized predict_proba over all of its shots, followed by temporal
+smoothing of the probabilities over neighbouring shots, instead of fitting a sliding window.
+
+Input:
+    - annotation folders (SBD and caspian): {annotation_folder}/{video}/*.eaf
+    - folder with TransNet files: {video}.{ext}.scenes.txt and (optionally) {video}.{ext}.predictions.txt
+
+Output:
+    - trained model, saved with joblib
+    - for a new tape: list of tuples (start_frame, end_frame, label), like get_shot_vector
+"""
+
+import os
+import sys
+import numpy as np
+from scipy.ndimage import uniform_filter1d
+from read_elan_file_shots import get_shot_vector
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "LDA_pipeline"))
+from shot_rhythm import DEFAULT_WINDOW_SIZES, compute_rhythm_features, find_transnet_files, shot_level_features
+
+CLASSES = np.array([0, 1])
+
+# Fixed feature layout, so videos with and without a .predictions.txt file can be mixed
+RHYTHM_FEATURE_NAMES = [f"{name}_{window_size}" for window_size in DEFAULT_WINDOW_SIZES
+                        for name in ("cut_density", "shot_length_mean", "shot_length_var",
+                                     "transition_mean", "transition_std", "transition_max")]
+FEATURE_NAMES = RHYTHM_FEATURE_NAMES + ["log_shot_length", "position"]
+
+
+def find_annotated_videos(annotation_folders, transnet_folder):
+    """
+    Finds the videos that have both an EAF file and TransNet files. A video that is annotated in several
+    folders is only used once, with the annotation of the first folder, so its shots are not counted twice.
+
+    Returns:
+    - list: Tuples (video, eaf_path, scenes_path, predictions_path), one per video.
+    """
+    videos = []
+    found = set()
+    for annotation_folder in annotation_folders:
+        for video in sorted(os.listdir(annotation_folder)):
+            video_folder = os.path.join(annotation_folder, video)
+            if video in found or not os.path.isdir(video_folder):
+                continue
+            eaf_files = sorted(file for file in os.listdir(video_folder) if file.endswith(".eaf"))
+            try:
+                scenes_path, predictions_path = find_transnet_files(transnet_folder, video)
+            except FileNotFoundError:
+                continue
+            if eaf_files:
+                videos.append((video, os.path.join(video_folder, eaf_files[0]), scenes_path, predictions_path))
+                found.add(video)
+    return videos
+
+
+def split_videos(videos, n_test_videos=3):
+    """
+    Holds out the last videos (by name) for evaluation.
+
+    Returns:
+    - (train_videos, test_videos)
+    """
+    test_names = set(sorted({video for video, _, _, _ in videos})[-n_test_videos:]) if n_test_videos else set()
+    return [v for v in videos if v[0] not in test_names], [v for v in videos if v[0] in test_names]
+
+
+def compute_shot_features(scenes_path, predictions_path=None):
+    """
+    Computes one feature vector per TransNet shot (see FEATURE_NAMES).
+
+    Returns:
+    - (shots, features): array (n_shots, 2) with the start and end frame of every shot, and array
+      (n_shots, n_features) float32. Transition features are 0 if there is no predictions file.
+    """
+    shots = np.loadtxt(scenes_path, dtype=np.int64, ndmin=2)
+    rhythm, names = compute_rhythm_features(scenes_path, predictions_path)
+    rhythm = shot_level_features(rhythm, scenes_path)
+
+    features = np.zeros((len(shots), len(FEATURE_NAMES)), dtype=np.float32)
+    columns = [FEATURE_NAMES.index(name) for name in names]
+    features[:, columns] = rhythm
+    features[:, -2] = np.log1p(shots[:, 1] - shots[:, 0] + 1)
+    features[:, -1] = (shots[:, 0] + shots[:, 1]) / 2 / max(int(shots[-1, 1]), 1)
+    return shots, features
+
+
+def iter_training_batches(videos, batch_size=4096, seed=None):
+    """
+    Yields (features, labels) batches of at most "batch_size" shots, one video at a time.
+    With a seed, the order of the videos and of the shots within each video is shuffled.
+    """
+    rng = np.random.default_rng(seed) if seed is not None else None
+    order = rng.permutation(len(videos)) if rng is not None else range(len(videos))
+
+    for index in order:
+        video, eaf_path, scenes_path, predictions_path = videos[index]
+        _, features = compute_shot_features(scenes_path, predictions_path)
+        labels = np.array([label for _, _, label in get_shot_vector(eaf_path, scenes_path)], dtype=np.int64)
+        if rng is not None:
+            shuffle = rng.permutation(len(labels))
+            features, labels = features[shuffle], labels[shuffle]
+        for start in range(0, len(labels), batch_size):
+            yield features[start:start + batch_size], labels[start:start + batch_size]
+
+
+def train_classifier(videos, epochs=5, batch_size=4096, alpha=1e-4, seed=0):
+    """
+    Trains the scaler and the classifier incrementally over the shots of the given videos.
+
+    Parameters:
+    - videos: list of (video, eaf_path, scenes_path, predictions_path), see "find_annotated_videos".
+    - epochs: number of passes of the classifier over all videos.
+    - batch_size: maximum number of shots per partial_fit call.
+    - alpha: L2 regularization strength of the SGDClassifier.
+    - seed: seed of the shuffling and of the classifier.
+
+    Returns:
+    - dict: the model, with keys "scaler", "classifier" and "feature_names".
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    # First pass: feature statistics and class counts
+    scaler = StandardScaler()
+    class_counts = np.zeros(len(CLASSES))
+    for features, labels in iter_training_batches(videos, batch_size):
+        scaler.partial_fit(features)
+        class_counts += np.bincount(labels, minlength=len(CLASSES))
+
+    # Program shots are the minority in most tapes, so both classes get the same total weight
+    class_weights = class_counts.sum() / (len(CLASSES) * np.maximum(class_counts, 1))
+
+    classifier = SGDClassifier(loss="log_loss", alpha=alpha, random_state=seed)
+    for epoch in range(epochs):
+        n_shots = 0
+        for features, labels in iter_training_batches(videos, batch_size, seed=seed + epoch):
+            classifier.partial_fit(scaler.transform(features), labels, classes=CLASSES,
+                                   sample_weight=class_weights[labels])
+            n_shots += len(labels)
+        print(f"Epoch {epoch + 1}/{epochs}: {n_shots} shots")
+
+    return {"scaler": scaler, "classifier": classifier, "feature_names": FEATURE_NAMES}
+
+
+def smooth_probabilities(probabilities, window_size=5):
+    """
+    Centered moving average of the program probabilities over "window_size" neighbouring shots.
+    """
+    if window_size <= 1 or len(probabilities) == 0:
+        return probabilities
+    return uniform_filter1d(probabilities, size=window_size, mode="nearest")
+
+
+def predict_program_probabilities(model, features, batch_size=65536, smoothing=5):
+    """
+    Predicts the smoothed program probability of every shot, in batches of "batch_size" shots.
+    """
+    probabilities = np.empty(len(features))
+    for start in range(0, len(features), batch_size):
+        batch = model["scaler"].transform(features[start:start + batch_size])
+        probabilities[start:start + batch_size] = model["classifier"].predict_proba(batch)[:, 1]
+    return smooth_probabilities(probabilities, smoothing)
+
+
+def label_tape(model, scenes_path, predictions_path=None, threshold=0.5, smoothing=5):
+    """
+    Labels all shots of a tape.
+
+    Returns:
+    - list: Tuples (start_frame, end_frame, label), like get_shot_vector.
+    """
+    shots, features = compute_shot_features(scenes_path, predictions_path)
+    probabilities = predict_program_probabilities(model, features, smoothing=smoothing)
+    labels = (probabilities >= threshold).astype(int)
+    return [(int(start), int(end), int(label)) for (start, end), label in zip(shots, labels)]
+
+
+def evaluate(model, videos, smoothing=5):
+    """
+    Prints the shot accuracy of the model on each of the given videos.
+    """
+    for video, eaf_path, scenes_path, predictions_path in videos:
+        truth = np.array([label for _, _, label in get_shot_vector(eaf_path, scenes_path)])
+        predicted = np.array([label for _, _, label in label_tape(model, scenes_path, predictions_path,
+                                                                    smoothing=smoothing)])
+        print(f"{video}: accuracy {np.mean(truth == predicted):.3f} over {len(truth)} shots "
+              f"({truth.mean():.1%} program)")
+
+
+def main():
+    # Adjust these paths as needed.
+    annotation_folders = ["../data/2_annotation_files/SBD", "../data/2_annotation_files/caspian"]
+    transnet_folder = "../data/1_TransNet_files"
+    model_path = "../data/shot_classifier.joblib"
+    n_test_videos = 3
+
+    videos = find_annotated_videos(annotation_folders, transnet_folder)
+    print(f"Found {len(videos)} annotated videos.")
+
+    # Hold out the last videos (by name) for evaluation
+    train_videos, test_videos = split_videos(videos, n_test_videos)
+
+    model = train_classifier(train_videos)
+    import joblib
+    joblib.dump(model, model_path)
+    print(f"Model saved to {model_path}.")
+
+    evaluate(model, test_videos)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,24 +8,35 @@ It performs the following tasks:
 
 Dependencies:
 - pympi: For handling ELAN files.
-- moviepy: For video processing.
+- media_index: For the frame rate of the video (probed once and cached, the video is not opened).
 - A custom module 'read_elan_file_shots' for extracting shot vectors from the ELAN file.
 
 Usage:
 Adjust the base directory, video date folder, and video file name as per your project requirements.
 Run the script to process the annotations and link them with the corresponding video file.
 
+Modes:
+    - "sync" (default): indexes the existing "Scene Boundaries" intervals, adds only the missing shots and
+      removes the intervals that are no longer shots (and duplicates), and links the video to the EAF file.
+      All videos are processed in parallel and files are only rewritten (atomically) when something
+      changed. Safe to rerun. Works for .mxf and .mp4 videos ({video}.{ext}.scenes.txt).
+    - "append": the original behaviour, appends an annotation for every shot.
+
 Note: 
-    - If you run it multiple times on an existing ELAN file, it will add the same annotations multiple times.
-    - After running this script, you still have to manually connect the videos to the .eaf files in ELAN.
+    - In "append" mode, running it multiple times on an existing ELAN file adds the same annotations multiple times.
+    - In "append" mode, you still have to manually connect the videos to the .eaf files in ELAN.
 
 """
 
 import os
 from os.path import exists
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pympi.Elan import Eaf
-from moviepy.editor import VideoFileClip
-from read_elan_file_shots import get_shot_vector
+from read_elan_file_shots import get_shot_vector, read_shot_file
+from media_index import get_frame_rate
+
+# MIME types of the linked videos in the EAF files
+VIDEO_MIME_TYPES = {"mxf": "video/mxf", "mp4": "video/mp4"}
 
 # Function to add shot annotations to the EAF file
 def add_annotations(eaf, shot_vector, frame_rate):
@@ -39,6 +50,90 @@ def add_annotations(eaf, shot_vector, frame_rate):
         end_time = int(end_frame / frame_rate * 1000)
         eaf.add_annotation(tier_id, start_time, end_time, value="Inter-program")
     
+# Function to synchronise the shot annotations of the EAF file with the shot vector
+def sync_annotations(eaf, shot_vector, frame_rate, tier_id="Scene Boundaries", value="Inter-program"):
+    if tier_id not in eaf.get_tier_names():
+        eaf.add_tier(tier_id)
+
+    # Index the existing intervals of the tier: (start_ms, end_ms) -> annotation ids
+    aligned_annotations = eaf.tiers[tier_id][0]
+    existing = {}
+    for annotation_id, (start_slot, end_slot, _, _) in aligned_annotations.items():
+        interval = (eaf.timeslots[start_slot], eaf.timeslots[end_slot])
+        existing.setdefault(interval, []).append(annotation_id)
+
+    wanted = {(int(start_frame / frame_rate * 1000), int(end_frame / frame_rate * 1000))
+              for start_frame, end_frame, _ in shot_vector}
+
+    # Remove intervals that are no longer shots, and duplicates of the ones that are
+    removed = 0
+    for interval, annotation_ids in existing.items():
+        obsolete = annotation_ids if interval not in wanted else annotation_ids[1:]
+        for annotation_id in obsolete:
+            del aligned_annotations[annotation_id]
+            removed += 1
+    if removed:
+        eaf.clean_time_slots()
+
+    # Add only the shots that are missing
+    missing = sorted(wanted - existing.keys())
+    for start_time, end_time in missing:
+        eaf.add_annotation(tier_id, start_time, end_time, value=value)
+
+    return len(missing), removed
+
+# Function to write an EAF file atomically (a crash never leaves a half-written file)
+def write_eaf_atomic(eaf, eaf_file_path):
+    folder, file_name = os.path.split(eaf_file_path)
+    temp_path = os.path.join(folder, f".{file_name}.{os.getpid()}.tmp.eaf")
+    eaf.to_file(temp_path)
+    os.replace(temp_path, eaf_file_path)
+
+# Function to synchronise the EAF file of a single video file
+def sync_video(base_dir, video_file_name, video_date_folder, transnet_folder, annotation_files_folder,
+               video_ext="mxf", frame_rate=None):
+    video_file_path = os.path.join(base_dir, video_date_folder, f"{video_file_name}.{video_ext}")
+    new_folder_path = os.path.join(base_dir, annotation_files_folder, video_file_name)
+    os.makedirs(new_folder_path, exist_ok=True)
+
+    eaf_file_path = os.path.join(new_folder_path, f"{video_file_name}.eaf")
+    eaf = Eaf(eaf_file_path) if os.path.exists(eaf_file_path) else Eaf()
+
+    if frame_rate is None:
+        frame_rate = get_frame_rate(video_file_path)
+    shot_vector_file_path = os.path.join(base_dir, transnet_folder, f"{video_file_name}.{video_ext}.scenes.txt")
+    shot_vector = get_shot_vector(eaf_file_path, shot_vector_file_path, frame_rate) if os.path.exists(eaf_file_path) \
+        else [(start, end, 0) for start, end in read_shot_file(shot_vector_file_path)]
+
+    added, removed = sync_annotations(eaf, shot_vector, frame_rate)
+
+    # Link the video, so ELAN opens it with the annotations
+    linked = any(descriptor.get("MEDIA_URL") == video_file_path for descriptor in eaf.media_descriptors)
+    if not linked:
+        eaf.add_linked_file(video_file_path, relpath=None, mimetype=VIDEO_MIME_TYPES.get(video_ext), time_origin=0)
+
+    if added or removed or not linked or not os.path.exists(eaf_file_path):
+        write_eaf_atomic(eaf, eaf_file_path)
+    return added, removed
+
+# Function to synchronise the EAF files of all videos in parallel
+def sync_all(base_dir, video_date_folder, transnet_folder, annotation_files_folder, video_ext="mxf",
+             max_workers=None):
+    video_file_names = [file[:-len(video_ext) - 1] for file in os.listdir(os.path.join(base_dir, video_date_folder))
+                        if file.endswith(f".{video_ext}")]
+
+    # Resolve the frame rates here, so only this process probes new videos and writes to the media index
+    frame_rates = {name: get_frame_rate(os.path.join(base_dir, video_date_folder, f"{name}.{video_ext}"))
+                   for name in video_file_names}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(sync_video, base_dir, name, video_date_folder, transnet_folder,
+                                   annotation_files_folder, video_ext, frame_rates[name]): name
+                   for name in video_file_names}
+        for future in as_completed(futures):
+            added, removed = future.result()
+            print(f"{futures[future]}: added {added}, removed {removed} annotations.")
+
 # Function to process a single video file
 def process_video(base_dir, video_file_name, video_date_folder, transnet_folder, annotation_files_folder):
     video_file_path = os.path.join(base_dir, video_date_folder, f"{video_file_name}.mxf")
@@ -60,13 +155,12 @@ def process_video(base_dir, video_file_name, video_date_folder, transnet_folder,
     else:
         eaf = Eaf(eaf_file_path)
 
-    # Load the video file and get its frame rate
-    video = VideoFileClip(video_file_path)
-    frame_rate = video.fps
+    # Look up the frame rate of the video in the media index
+    frame_rate = get_frame_rate(video_file_path)
 
     # Load or create the shot vector
     shot_vector_file_path = os.path.join(base_dir, transnet_folder, f"{video_file_name}.mxf.scenes.txt")
-    shot_vector = get_shot_vector(eaf_file_path, shot_vector_file_path)
+    shot_vector = get_shot_vector(eaf_file_path, shot_vector_file_path, frame_rate)
 
     # Add shot annotations to the EAF file
     add_annotations(eaf, shot_vector, frame_rate)
@@ -81,12 +175,16 @@ def process_video(base_dir, video_file_name, video_date_folder, transnet_folder,
     print(f'Linked video file {video_file_path} to EAF file.')
 
 # Main function
-def main(video_ext):
+def main(video_ext, mode="sync"):
     base_dir = "/Users/ivar/Desktop/studieAI/AI_TADA3/coding/data" #adjust as needed
     video_date_folder = f"0_videos/21_08_2023/{video_ext}"
     transnet_folder = "1_TransNet_files"
     annotation_files_folder = "2_annotation_files2/SBD"
 
+    if mode == "sync":
+        sync_all(base_dir, video_date_folder, transnet_folder, annotation_files_folder, video_ext)
+        return
+
     # Iterate over each file in the video date folder
     for file in os.listdir(os.path.join(base_dir, video_date_folder)):
         if file.endswith(f".{video_ext}"):
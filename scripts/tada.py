@@ -0,0 +1,402 @@
+"""
+Command-line entry point for all stages of the pipeline.
+
+Every stage is a subcommand. The modules of a stage (and their heavy dependencies: cv2, moviepy, sklearn,
+scipy, matplotlib) are only imported when that subcommand runs, so "--help" and quick commands start
+as fast as the interpreter. All paths default to the folders of the data folder and can be overridden.
+
+Usage:
+    python tada.py --help
+    python tada.py <subcommand> --help
+
+Subcommands:
+    probe, index                   media metadata (media_probe.py, media_index.py)
+    ingest                         MXF -> MP4 (xmf_to_mp4.py)
+    transnet, sbd                  shot boundaries with TransNetV2 or histogram differences
+    sync-annotations               TransNet shots -> ELAN annotations (shots_to_annotations.py)
+    segment, keyframes,            shot videos, I-frames and keyframe selection (LDA_pipeline)
+    select-keyframes
+    histograms, thumbnails,        per-frame features (color_hists_full_videos.py, thumbnail_cache.py,
+    features, audio, rhythm        frame_features.py, audio_features.py, LDA_pipeline/shot_rhythm.py)
+    fisher, score, pelt            boundary scoring (LDA_pipeline)
+    classify-train, classify       shot classifier (shot_classifier.py)
+    shot-index                     recurring shots (LDA_pipeline/shot_index.py)
+    reports, serve                 score reports and the query service
+    queue-add, queue-drain,        work queue (work_queue.py)
+    queue-status
+"""
+
+import os
+import sys
+import json
+import argparse
+
+SCRIPTS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER = os.path.join(SCRIPTS_FOLDER, "..", "data")
+
+sys.path.append(os.path.join(SCRIPTS_FOLDER, "LDA_pipeline"))
+
+
+def data_path(*parts):
+    return os.path.normpath(os.path.join(DATA_FOLDER, *parts))
+
+
+def list_videos(folder, extensions=(".mxf", ".mp4")):
+    return [os.path.join(folder, file) for file in sorted(os.listdir(folder)) if file.endswith(extensions)]
+
+
+def cmd_probe(args):
+    from media_probe import probe_media
+    print(json.dumps(probe_media(args.video, count_frames=args.count_frames), indent=2))
+
+
+def cmd_index(args):
+    from media_index import MediaIndex
+    with MediaIndex() as index:
+        index.add_folder(args.folder)
+        print(f"{len(index.entries)} videos in {index.index_path}")
+
+
+def cmd_ingest(args):
+    from xmf_to_mp4 import ingest_folder
+    ingest_folder(args.mxf_folder, args.output_folder, max_workers=args.workers, threads_per_job=args.threads)
+
+
+def cmd_transnet(args):
+    from TransNet_all_videos import process_folder, SCRIPT_PATH
+    process_folder(args.video_folder, args.script or SCRIPT_PATH)
+
+
+def cmd_sbd(args):
+    from histogram_sbd import process_folder
+    process_folder(args.video_folder, args.output_folder, args.transnet_folder, tolerance=args.tolerance)
+
+
+def cmd_sync_annotations(args):
+    from shots_to_annotations import sync_all
+    sync_all(args.base_dir, args.video_folder, args.transnet_folder, args.annotation_folder, args.ext,
+             max_workers=args.workers)
+
+
+def cmd_segment(args):
+    from MoviePy_segmentation import split_video_by_frames
+    split_video_by_frames(os.path.dirname(args.video), os.path.basename(args.video), args.scenes, args.output_dir)
+
+
+def cmd_keyframes(args):
+    import asyncio
+    from keyframe_FFMPEG import process_videos_async
+    asyncio.run(process_videos_async(args.input_folder, args.output_folder, max_jobs=args.jobs,
+                                     threads_per_job=args.threads))
+
+
+def cmd_select_keyframes(args):
+    from keyframe_selection import compute_hashes, select_keyframes, copy_keyframes
+    hashes = compute_hashes(args.input_folder, method=args.method)
+    selected = select_keyframes(hashes, policy=args.policy, threshold=args.threshold, n_per_shot=args.per_shot)
+    copy_keyframes(args.input_folder, args.output_folder, selected)
+    print(f"Selected {len(selected)} of {len(hashes)} I-frames.")
+
+
+def cmd_histograms(args):
+    from color_hists_full_videos import compute_histograms, save_histograms_np
+    histograms = compute_histograms(args.folder, args.compact, args.workers)
+    output = args.output or os.path.join(args.folder, "color_histograms.npy")
+    save_histograms_np(histograms, output)
+    print(f"Histograms of {len(histograms)} frames saved to {output}.")
+
+
+def cmd_thumbnails(args):
+    from thumbnail_cache import get_thumbnails
+    for video_path in list_videos(args.video_folder):
+        thumbnails = get_thumbnails(video_path, width=args.width, height=args.height)
+        print(f"{os.path.basename(video_path)}: {len(thumbnails)} thumbnails in {thumbnails.cache_path}")
+
+
+def cmd_features(args):
+    import numpy as np
+    from frame_features import extract_features
+    from thumbnail_cache import get_thumbnails
+    thumbnails = get_thumbnails(args.video)
+    features = extract_features(thumbnails.iter_batches(1024), len(thumbnails), names=args.names)
+    np.savez(args.output, **features)
+    for name, array in features.items():
+        print(f"{name}: {array.shape} {array.dtype}")
+
+
+def cmd_audio(args):
+    from audio_features import compute_audio_features, find_candidate_regions
+    from media_index import get_frame_rate
+    features = compute_audio_features(args.video, frame_rate=get_frame_rate(args.video))
+    for start, end in find_candidate_regions(features):
+        print(f"Candidate region: {start} - {end}")
+
+
+def cmd_rhythm(args):
+    from shot_rhythm import find_transnet_files, compute_rhythm_features, score_rhythm
+    scenes_path, predictions_path = find_transnet_files(args.transnet_folder, args.video)
+    features, names = compute_rhythm_features(scenes_path, predictions_path)
+    scores = score_rhythm(features, args.window)
+    print(f"{args.video}: {features.shape[0]} frames, features: {', '.join(names)}")
+    if len(scores):
+        print(f"Highest score {scores.max():.3f} at frame {int(scores.argmax()) + args.window}")
+
+
+def cmd_fisher(args):
+    import color_hists
+    from fisher_score import compute_fisher, print_fisher_score_peaks, plot_threshold_fisher_scores
+    keys, histograms = color_hists.sort_histograms(color_hists.compute_histograms(args.iframe_folder, args.compact))
+    fisher_score = compute_fisher(histograms, keys, window_size=args.window)
+    print_fisher_score_peaks(fisher_score)
+    if args.plot:
+        plot_threshold_fisher_scores(fisher_score, threshold=args.threshold, score_type='high')
+
+
+def cmd_score(args):
+    from window_scorers import load_histogram_features, get_scorer
+    from audio_features import frame_numbers_from_keys
+    keys, features = load_histogram_features(args.histograms, luma_if_grayscale=True)
+    scores = get_scorer(args.scorer).score(features, args.window)
+    print(f"{len(scores)} windows scored with {args.scorer}; highest score {scores.max():.4f} "
+          f"at {keys[int(scores.argmax()) + args.window]}")
+    if args.output:
+        from score_reports import save_score_curve
+        # Each score belongs to the first frame after the window boundary
+        save_score_curve(args.output, frame_numbers_from_keys(keys)[args.window:args.window + len(scores)], scores)
+        print(f"Score curve saved to {args.output}.")
+
+
+def cmd_pelt(args):
+    from window_scorers import load_histogram_features
+    from pelt import pelt, normalize_histograms
+    keys, histograms = load_histogram_features(args.histograms)
+    boundaries, _ = pelt(normalize_histograms(histograms), penalty=args.penalty, min_size=args.min_size)
+    for boundary in boundaries:
+        print(f"Boundary before {keys[boundary]}")
+
+
+def cmd_classify_train(args):
+    import joblib
+    from shot_classifier import find_annotated_videos, train_classifier
+    videos = find_annotated_videos(args.annotation_folders, args.transnet_folder)
+    model = train_classifier(videos, epochs=args.epochs)
+    joblib.dump(model, args.model)
+    print(f"Model trained on {len(videos)} annotation files saved to {args.model}.")
+
+
+def cmd_classify(args):
+    import joblib
+    from shot_rhythm import find_transnet_files
+    from shot_classifier import label_tape
+    scenes_path, predictions_path = find_transnet_files(args.transnet_folder, args.video)
+    for start, end, label in label_tape(joblib.load(args.model), scenes_path, predictions_path):
+        print(start, end, label)
+
+
+def cmd_shot_index(args):
+    from shot_index import ShotIndex
+    with ShotIndex(args.index) as index:
+        for video in sorted(os.listdir(args.keyframes_root)):
+            folder = os.path.join(args.keyframes_root, video)
+            if os.path.isdir(folder):
+                print(f"Indexed {index.add_video(video, folder)} new shots of {video}.")
+
+
+def cmd_reports(args):
+    from score_reports import generate_reports
+    jobs = []
+    for file in sorted(os.listdir(args.scores_folder)):
+        if file.endswith(".scores.npy"):
+            video = file[:-len(".scores.npy")]
+            eaf_path = os.path.join(args.annotation_folder, video, f"{video}.eaf")
+            jobs.append((video, os.path.join(args.scores_folder, file), eaf_path if os.path.exists(eaf_path) else None))
+    generate_reports(jobs, args.output_folder, max_workers=args.workers)
+
+
+def cmd_serve(args):
+    from query_service import QueryService, serve
+    serve(QueryService(args.transnet_folder, args.annotation_folders, args.scores_folder), args.host, args.port)
+
+
+def cmd_queue_add(args):
+    from work_queue import WorkQueue
+    items = []
+    for path in args.paths:
+        items += list_videos(path) if os.path.isdir(path) else [path]
+    with WorkQueue() as queue:
+        print(f"Enqueued {queue.enqueue(args.stage, [os.path.abspath(item) for item in items])} new tasks.")
+
+
+def cmd_queue_drain(args):
+    from work_queue import drain
+    drain(args.stage, args.output_folder, n_workers=args.workers, lease_seconds=args.lease)
+
+
+def cmd_queue_status(args):
+    from work_queue import WorkQueue
+    with WorkQueue() as queue:
+        print(f"{args.stage}: {queue.counts(args.stage)}")
+        for item, error in queue.failed(args.stage):
+            print(f"Failed: {item}: {error}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="tada", description="AI_TADA program segmentation pipeline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add(name, function, help):
+        subparser = subparsers.add_parser(name, help=help, description=help)
+        subparser.set_defaults(function=function)
+        return subparser
+
+    videos = data_path("0_videos", "21_08_2023", "mxf")
+    transnet = data_path("1_TransNet_files")
+    annotations = [data_path("2_annotation_files", "SBD"), data_path("2_annotation_files", "caspian")]
+    stages = ["ingest", "transnet", "keyframes", "histograms"]
+
+    p = add("probe", cmd_probe, "Print the ffprobe metadata of a video.")
+    p.add_argument("video")
+    p.add_argument("--count-frames", action="store_true", help="Count the frames by decoding (slow).")
+
+    p = add("index", cmd_index, "Add all videos of a folder to the media index.")
+    p.add_argument("folder", nargs="?", default=videos)
+
+    p = add("ingest", cmd_ingest, "Convert MXF files to validated MP4 files.")
+    p.add_argument("mxf_folder", nargs="?", default=data_path("21_08_2023"))
+    p.add_argument("output_folder", nargs="?", default=data_path("conversions"))
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--threads", type=int, default=2, help="FFmpeg threads per job.")
+
+    p = add("transnet", cmd_transnet, "Run TransNetV2 on all videos of a folder.")
+    p.add_argument("video_folder", nargs="?", default=videos)
+    p.add_argument("--script", help="Path of transnetv2.py.")
+
+    p = add("sbd", cmd_sbd, "Detect shots with histogram differences (CPU-only TransNet alternative).")
+    p.add_argument("video_folder", nargs="?", default=videos)
+    p.add_argument("output_folder", nargs="?", default=data_path("1_histogram_SBD_files"))
+    p.add_argument("--transnet-folder", default=transnet, help="TransNet files for the agreement report.")
+    p.add_argument("--tolerance", type=int, default=2, help="Boundary match tolerance in frames.")
+
+    p = add("sync-annotations", cmd_sync_annotations, "Synchronize the TransNet shots into the EAF files.")
+    p.add_argument("--base-dir", default=data_path())
+    p.add_argument("--video-folder", default="0_videos/21_08_2023/mxf", help="Relative to the base dir.")
+    p.add_argument("--transnet-folder", default="1_TransNet_files", help="Relative to the base dir.")
+    p.add_argument("--annotation-folder", default="2_annotation_files/SBD", help="Relative to the base dir.")
+    p.add_argument("--ext", default="mxf")
+    p.add_argument("--workers", type=int)
+
+    p = add("segment", cmd_segment, "Split a video into shot videos.")
+    p.add_argument("video")
+    p.add_argument("scenes", help="The .scenes.txt file of the video.")
+    p.add_argument("output_dir", nargs="?", default=data_path("3_MoviePy_segmentation"))
+
+    p = add("keyframes", cmd_keyframes, "Extract the I-frames of all shot videos of a folder.")
+    p.add_argument("input_folder")
+    p.add_argument("output_folder")
+    p.add_argument("--jobs", type=int)
+    p.add_argument("--threads", type=int, default=2, help="FFmpeg threads per job.")
+
+    p = add("select-keyframes", cmd_select_keyframes, "Drop near-duplicate I-frames.")
+    p.add_argument("input_folder")
+    p.add_argument("output_folder")
+    p.add_argument("--method", default="dhash", choices=["dhash", "phash"])
+    p.add_argument("--policy", default="diverse", choices=["unique", "diverse", "first"])
+    p.add_argument("--threshold", type=int, default=10, help="Hamming distance of near-duplicates.")
+    p.add_argument("--per-shot", type=int, default=3)
+
+    p = add("histograms", cmd_histograms, "Color histograms of all frames of the shot videos of a folder.")
+    p.add_argument("folder")
+    p.add_argument("--output", help="Output .npy file (default: color_histograms.npy in the folder).")
+    p.add_argument("--compact", action="store_true",
+                   help="Store black-and-white frames as luminance histograms, in the smallest dtype.")
+    p.add_argument("--workers", type=int, default=0,
+                   help="Decode in one process and compute the histograms in this many others (0: one loop).")
+
+    p = add("thumbnails", cmd_thumbnails, "Build the thumbnail caches of all videos of a folder.")
+    p.add_argument("video_folder", nargs="?", default=videos)
+    p.add_argument("--width", type=int, default=64)
+    p.add_argument("--height", type=int, default=48)
+
+    p = add("features", cmd_features, "Per-frame features of a video in one pass over its thumbnails.")
+    p.add_argument("video")
+    p.add_argument("output", help="Output .npz file.")
+    p.add_argument("--names", nargs="+", help="Feature names (default: all registered features).")
+
+    p = add("audio", cmd_audio, "Candidate boundary regions from silence and music changes.")
+    p.add_argument("video")
+
+    p = add("rhythm", cmd_rhythm, "Score the shot-rhythm features of a video.")
+    p.add_argument("video", help="Video name.")
+    p.add_argument("--transnet-folder", default=transnet)
+    p.add_argument("--window", type=int, default=750)
+
+    p = add("fisher", cmd_fisher, "Fisher scores of the I-frame histograms of a video.")
+    p.add_argument("iframe_folder")
+    p.add_argument("--window", type=int, default=40)
+    p.add_argument("--threshold", type=float, default=0.4)
+    p.add_argument("--plot", action="store_true", help="Show the score plot.")
+    p.add_argument("--compact", action="store_true", help="Luminance histograms for black-and-white I-frames.")
+
+    p = add("score", cmd_score, "Score a full-frame histogram file with a vectorized window scorer.")
+    p.add_argument("histograms", help="color_histograms.npy file.")
+    p.add_argument("--scorer", default="fisher",
+                   choices=["fisher", "chi_square", "bhattacharyya", "jensen_shannon", "mmd"])
+    p.add_argument("--window", type=int, default=40)
+    p.add_argument("--output", help="Save the score curve as a .scores.npy file.")
+
+    p = add("pelt", cmd_pelt, "Optimal boundaries of a full-frame histogram file with PELT.")
+    p.add_argument("histograms", help="color_histograms.npy file.")
+    p.add_argument("--penalty", type=float, default=0.05)
+    p.add_argument("--min-size", type=int, default=25)
+
+    p = add("classify-train", cmd_classify_train, "Train the shot classifier on all annotated videos.")
+    p.add_argument("--annotation-folders", nargs="+", default=annotations)
+    p.add_argument("--transnet-folder", default=transnet)
+    p.add_argument("--model", default=data_path("shot_classifier.joblib"))
+    p.add_argument("--epochs", type=int, default=5)
+
+    p = add("classify", cmd_classify, "Label the shots of a video with the shot classifier.")
+    p.add_argument("video", help="Video name.")
+    p.add_argument("--transnet-folder", default=transnet)
+    p.add_argument("--model", default=data_path("shot_classifier.joblib"))
+
+    p = add("shot-index", cmd_shot_index, "Add the keyframes of all videos to the recurring shot index.")
+    p.add_argument("keyframes_root", nargs="?", default=data_path("4_i_frames"))
+    p.add_argument("--index", default=data_path("shot_index.sqlite"))
+
+    p = add("reports", cmd_reports, "Render PNG/HTML reports of all score curves.")
+    p.add_argument("scores_folder", nargs="?", default=data_path("6_scores"))
+    p.add_argument("output_folder", nargs="?", default=data_path("7_reports"))
+    p.add_argument("--annotation-folder", default=data_path("2_annotation_files", "caspian"))
+    p.add_argument("--workers", type=int)
+
+    p = add("serve", cmd_serve, "Serve shot, annotation and score queries over HTTP.")
+    p.add_argument("--transnet-folder", default=transnet)
+    p.add_argument("--annotation-folders", nargs="+", default=annotations)
+    p.add_argument("--scores-folder", default=data_path("6_scores"))
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+
+    p = add("queue-add", cmd_queue_add, "Add files (or all videos of folders) to the work queue.")
+    p.add_argument("stage", choices=stages)
+    p.add_argument("paths", nargs="+")
+
+    p = add("queue-drain", cmd_queue_drain, "Process the queued tasks of a stage with worker processes.")
+    p.add_argument("stage", choices=stages)
+    p.add_argument("output_folder")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--lease", type=float, default=300, help="Lease duration in seconds.")
+
+    p = add("queue-status", cmd_queue_status, "Show the task counts and failures of a stage.")
+    p.add_argument("stage", choices=stages)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
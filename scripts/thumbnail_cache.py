@@ -0,0 +1,150 @@
+"""
+Decode-once thumbnail cache per video.
+
+Every visual stage used to decode the full-resolution source again (MoviePy, FFmpeg, OpenCV), while
+VHS-era content gains nothing from full-resolution analysis. This script decodes a video once with FFmpeg
+into small RGB frames (64x48 by default) and stores them in a single file: a fixed-size JSON header
+followed by the raw uint8 frames. The frames are then read through a memory map, by frame index, without
+any decoding.
+
+The cache is rebuilt automatically when the content fingerprint of the video (see media_index.py) changes.
+
+Input:
+    - video file (.mxf or .mp4)
+
+Output:
+    - {video_name}_{width}x{height}.thumbs in the cache folder
+    - ThumbnailCache: frames[i] is an array of shape (height, width, 3), dtype uint8, RGB
+
+Usage:
+    thumbnails = get_thumbnails("../data/0_videos/21_08_2023/mxf/DS574_708549D-DGS00Z03UM8.mxf")
+    frame = thumbnails[1000]
+    for start, batch in thumbnails.iter_batches(1024):
+        ...
+"""
+
+import os
+import json
+import subprocess
+import numpy as np
+from media_index import get_metadata, video_name
+
+DEFAULT_CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "thumbnail_cache")
+HEADER_SIZE = 4096
+MAGIC = "AI_TADA_THUMBNAILS"
+
+
+class ThumbnailCache:
+    """
+    Read-only view on a thumbnail cache file. Frames are memory-mapped, so opening a cache is instant
+    and only the frames that are used are read from disk.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        with open(cache_path, "rb") as file:
+            self.header = json.loads(file.read(HEADER_SIZE).rstrip(b"\0"))
+        if self.header.get("magic") != MAGIC:
+            raise ValueError(f"{cache_path} is not a thumbnail cache file.")
+
+        self.fps = self.header["fps"]
+        shape = (self.header["frame_count"], self.header["height"], self.header["width"], 3)
+        self.frames = np.memmap(cache_path, dtype=np.uint8, mode="r", offset=HEADER_SIZE, shape=shape)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def iter_batches(self, batch_size=1024):
+        """
+        Yields (start_frame, frames) with up to "batch_size" consecutive frames per batch.
+        """
+        for start in range(0, len(self.frames), batch_size):
+            yield start, self.frames[start:start + batch_size]
+
+
+def build_thumbnail_cache(video_path, cache_path, width=64, height=48, batch_frames=1024):
+    """
+    Decodes a video once with FFmpeg, scales every frame to width x height and writes the cache file.
+    The file is written under a temporary name and renamed when it is complete.
+    """
+    metadata = get_metadata(video_path)
+    frame_size = width * height * 3
+    cmd = [
+        "ffmpeg", "-nostdin",
+        "-loglevel", "error",
+        "-i", video_path,
+        "-vf", f"scale={width}:{height}:flags=area",
+        "-pix_fmt", "rgb24",
+        "-f", "rawvideo",
+        "-"
+    ]
+
+    temp_path = cache_path + ".part"
+    frame_count = 0
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with open(temp_path, "wb") as file:
+        # Reserve the header, it is written when the frame count is known
+        file.write(b"\0" * HEADER_SIZE)
+        while True:
+            data = process.stdout.read(frame_size * batch_frames)
+            if not data:
+                break
+            complete = len(data) - len(data) % frame_size
+            file.write(data[:complete])
+            frame_count += complete // frame_size
+
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            file.close()
+            os.remove(temp_path)
+            raise RuntimeError(f"FFmpeg failed for {video_path}: {stderr.decode(errors='replace')}")
+
+        header = {
+            "magic": MAGIC,
+            "version": 1,
+            "source": os.path.abspath(video_path),
+            "fingerprint": metadata["fingerprint"],
+            "fps": metadata["fps"],
+            "width": width,
+            "height": height,
+            "frame_count": frame_count,
+        }
+        file.seek(0)
+        file.write(json.dumps(header).encode().ljust(HEADER_SIZE, b"\0"))
+
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+
+def get_thumbnails(video_path, cache_folder=DEFAULT_CACHE_FOLDER, width=64, height=48):
+    """
+    Returns the thumbnail cache of a video, building it first if it does not exist or if the video changed.
+    """
+    os.makedirs(cache_folder, exist_ok=True)
+    cache_path = os.path.join(cache_folder, f"{video_name(video_path)}_{width}x{height}.thumbs")
+
+    if os.path.exists(cache_path):
+        cache = ThumbnailCache(cache_path)
+        if cache.header["fingerprint"] == get_metadata(video_path)["fingerprint"]:
+            return cache
+        del cache
+
+    build_thumbnail_cache(video_path, cache_path, width, height)
+    return ThumbnailCache(cache_path)
+
+
+def main():
+    # Folder containing the videos; adjust as needed.
+    video_folder = "../data/0_videos/21_08_2023/mxf"
+
+    for file in sorted(os.listdir(video_folder)):
+        if file.endswith((".mxf", ".mp4")):
+            thumbnails = get_thumbnails(os.path.join(video_folder, file))
+            print(f"{file}: {len(thumbnails)} thumbnails in {thumbnails.cache_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Work queue for processing the archive cooperatively with several worker processes or machines.
+
+The batch scripts list a folder and process it alone, so two machines working on the same share would
+duplicate each other's work. This script keeps one SQLite table of tasks (stage, item) next to the data:
+    - a worker claims a pending task inside a "BEGIN IMMEDIATE" transaction, so no two workers can
+      claim the same task, and gets a lease that expires after "lease_seconds",
+    - while the task runs, a background thread renews the lease (heartbeat),
+    - a task whose lease expired (the worker crashed or the machine went down) is put back to pending by
+      the next worker that claims, until it has been attempted "max_attempts" times,
+    - workers only complete or fail tasks they still hold the lease of.
+No broker or server is needed; the queue file only has to be on storage that all workers can reach.
+The database uses the rollback journal instead of WAL, because WAL needs shared memory that does not
+work across machines. Locking over NFS depends on a working lock daemon.
+
+Stages (handler(item, output_folder)):
+    - "ingest": MXF file -> validated MP4 (ingest_mxf, xmf_to_mp4.py)
+    - "transnet": video file -> TransNetV2 .scenes.txt / .predictions.txt (run_transnet, TransNet_all_videos.py)
+    - "keyframes": shot video -> I-frames (iframe_command, LDA_pipeline/keyframe_FFMPEG.py)
+    - "histograms": video file -> RGB histograms of all frames (rgb_histogram, frame_features.py)
+
+Input:
+    - items (file paths) to enqueue per stage
+
+Output:
+    - work_queue.sqlite in the data folder, and the outputs of the stage handlers
+
+Usage (locally, with 4 worker processes; run the same on other machines to help):
+    queue = WorkQueue()
+    queue.enqueue("transnet", video_paths)
+    drain("transnet", "../data/1_TransNet_files", n_workers=4)
+"""
+
+import os
+import sys
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import subprocess
+from collections import namedtuple
+from multiprocessing import Process
+import numpy as np
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "work_queue.sqlite")
+
+Task = namedtuple("Task", ["stage", "item", "attempts"])
+
+
+def make_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class WorkQueue:
+    """
+    SQLite-backed task table with leased claims. One instance per worker process; instances must not
+    be shared between processes.
+    """
+
+    def __init__(self, queue_path=DEFAULT_QUEUE_PATH, lease_seconds=300, max_attempts=3, worker_id=None):
+        self.queue_path = queue_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or make_worker_id()
+
+        # Autocommit mode: transactions are started explicitly; wait up to a minute for the lock
+        self.connection = sqlite3.connect(queue_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute("PRAGMA journal_mode=DELETE")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "stage TEXT, item TEXT, status TEXT, worker TEXT, lease_expires REAL, attempts INTEGER, "
+            "error TEXT, updated REAL, PRIMARY KEY (stage, item))"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (stage, status)")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, statements):
+        """
+        Runs (sql, parameters) statements in one immediate transaction and returns their row counts.
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                counts = [self.connection.execute(sql, parameters).rowcount for sql, parameters in statements]
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        return counts
+
+    def enqueue(self, stage, items):
+        """
+        Adds tasks for the given items. Items that are already queued (in any status) are left alone.
+
+        Returns:
+        - int: number of new tasks.
+        """
+        now = time.time()
+        sql = ("INSERT OR IGNORE INTO tasks (stage, item, status, attempts, updated) "
+               "VALUES (?, ?, 'pending', 0, ?)")
+        return sum(self._write([(sql, (stage, item, now)) for item in items]))
+
+    def _requeue_expired_statements(self, now):
+        return [
+            ("UPDATE tasks SET status = 'failed', worker = NULL, error = 'lease expired', updated = ? "
+             "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?", (now, now, self.max_attempts)),
+            ("UPDATE tasks SET status = 'pending', worker = NULL, updated = ? "
+             "WHERE status = 'running' AND lease_expires < ?", (now, now)),
+        ]
+
+    def requeue_expired(self):
+        """
+        Puts the tasks with an expired lease back to pending (or failed after "max_attempts").
+
+        Returns:
+        - int: number of tasks that were pending again.
+        """
+        return self._write(self._requeue_expired_statements(time.time()))[1]
+
+    def claim(self, stage):
+        """
+        Claims the next pending task of a stage, after requeueing expired leases.
+
+        Returns:
+        - Task, or None if there is no pending task.
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, parameters in self._requeue_expired_statements(now):
+                    self.connection.execute(sql, parameters)
+                row = self.connection.execute(
+                    "SELECT item, attempts FROM tasks WHERE stage = ? AND status = 'pending' ORDER BY item LIMIT 1",
+                    (stage,)
+                ).fetchone()
+                if row is not None:
+                    self.connection.execute(
+                        "UPDATE tasks SET status = 'running', worker = ?, lease_expires = ?, attempts = ?, "
+                        "updated = ? WHERE stage = ? AND item = ?",
+                        (self.worker_id, now + self.lease_seconds, row[1] + 1, now, stage, row[0])
+                    )
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        return None if row is None else Task(stage, row[0], row[1] + 1)
+
+    def heartbeat(self, task):
+        """
+        Renews the lease of a task.
+
+        Returns:
+        - bool: False if the lease was lost (it expired and the task was requeued).
+        """
+        now = time.time()
+        return self._write([(
+            "UPDATE tasks SET lease_expires = ?, updated = ? "
+            "WHERE stage = ? AND item = ? AND status = 'running' AND worker = ?",
+            (now + self.lease_seconds, now, task.stage, task.item, self.worker_id)
+        )])[0] == 1
+
+    def complete(self, task):
+        """
+        Marks a task as done. Returns False if the lease was lost in the meantime.
+        """
+        return self._write([(
+            "UPDATE tasks SET status = 'done', worker = NULL, error = NULL, updated = ? "
+            "WHERE stage = ? AND item = ? AND status = 'running' AND worker = ?",
+            (time.time(), task.stage, task.item, self.worker_id)
+        )])[0] == 1
+
+    def fail(self, task, error):
+        """
+        Puts a failed task back to pending, or marks it as failed after "max_attempts" attempts.
+        """
+        status = "failed" if task.attempts >= self.max_attempts else "pending"
+        return self._write([(
+            "UPDATE tasks SET status = ?, worker = NULL, error = ?, updated = ? "
+            "WHERE stage = ? AND item = ? AND status = 'running' AND worker = ?",
+            (status, str(error), time.time(), task.stage, task.item, self.worker_id)
+        )])[0] == 1
+
+    def counts(self, stage):
+        """
+        Returns the number of tasks per status of a stage.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT status, COUNT(*) FROM tasks WHERE stage = ? GROUP BY status", (stage,)
+            ).fetchall()
+        return dict(rows)
+
+    def failed(self, stage):
+        """
+        Returns (item, error) of the failed tasks of a stage.
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT item, error FROM tasks WHERE stage = ? AND status = 'failed' ORDER BY item", (stage,)
+            ).fetchall()
+
+
+class Heartbeat:
+    """
+    Context manager that renews the lease of a task every "interval" seconds in a background thread.
+    "lost" is set when the lease could not be renewed.
+    """
+
+    def __init__(self, queue, task, interval=None):
+        self.queue = queue
+        self.task = task
+        self.interval = interval or queue.lease_seconds / 3
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            if not self.queue.heartbeat(self.task):
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+# Stage handlers: handler(item, output_folder). They must be safe to run again on the same item, since a
+# task is retried when a worker dies after (part of) the work was done.
+
+def ingest_handler(item, output_folder):
+    from xmf_to_mp4 import ingest_mxf
+    os.makedirs(output_folder, exist_ok=True)
+    return ingest_mxf(item, output_folder)
+
+
+def transnet_handler(item, output_folder):
+    from TransNet_all_videos import run_transnet
+
+    # transnetv2.py writes {video}.scenes.txt and {video}.predictions.txt next to the video
+    scenes_path = item + ".scenes.txt"
+    if os.path.exists(os.path.join(output_folder, os.path.basename(scenes_path))):
+        return "skipped"
+    process = run_transnet(item)
+    if process.returncode != 0 or not os.path.exists(scenes_path):
+        raise RuntimeError(f"TransNetV2 failed for {item}: {process.stderr.decode(errors='replace')[-2000:]}")
+
+    os.makedirs(output_folder, exist_ok=True)
+    for suffix in (".predictions.txt", ".scenes.txt"):
+        if os.path.exists(item + suffix):
+            os.replace(item + suffix, os.path.join(output_folder, os.path.basename(item) + suffix))
+    return "processed"
+
+
+def keyframes_handler(item, output_folder):
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "LDA_pipeline"))
+    from keyframe_FFMPEG import iframe_command
+
+    os.makedirs(output_folder, exist_ok=True)
+    pattern = os.path.join(output_folder, f"{os.path.splitext(os.path.basename(item))[0]}_iframe_%03d.jpg")
+    process = subprocess.run(["ffmpeg", "-y"] + iframe_command(item, pattern)[1:],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(f"Error extracting I-frames for {item}: {process.stderr.decode(errors='replace')[-2000:]}")
+    return "processed"
+
+
+def histograms_handler(item, output_folder):
+    from frame_features import extract_features, iter_video_batches
+    from media_index import get_metadata, video_name
+
+    output_path = os.path.join(output_folder, f"{video_name(item)}_rgb_histograms.npy")
+    if os.path.exists(output_path):
+        return "skipped"
+    os.makedirs(output_folder, exist_ok=True)
+    features = extract_features(iter_video_batches(item), get_metadata(item)["frame_count"] or 0,
+                                names=["rgb_histogram"])
+
+    # Write under a temporary name, so a worker that dies halfway never leaves a truncated file behind
+    partial_path = output_path[:-len(".npy")] + ".part.npy"
+    np.save(partial_path, features["rgb_histogram"])
+    os.replace(partial_path, output_path)
+    return "processed"
+
+
+STAGES = {
+    "ingest": ingest_handler,
+    "transnet": transnet_handler,
+    "keyframes": keyframes_handler,
+    "histograms": histograms_handler,
+}
+
+
+def run_worker(stage, output_folder, queue_path=DEFAULT_QUEUE_PATH, lease_seconds=300, handler=None):
+    """
+    Claims and processes tasks of a stage until there are no pending tasks left.
+
+    Returns:
+    - int: number of tasks this worker completed.
+    """
+    handler = handler or STAGES[stage]
+    completed = 0
+    with WorkQueue(queue_path, lease_seconds) as queue:
+        while True:
+            task = queue.claim(stage)
+            if task is None:
+                break
+            try:
+                with Heartbeat(queue, task) as heartbeat:
+                    result = handler(task.item, output_folder)
+            except Exception as e:
+                queue.fail(task, e)
+                print(f"[{queue.worker_id}] {task.item}: failed (attempt {task.attempts}): {e}")
+                continue
+
+            if heartbeat.lost.is_set() or not queue.complete(task):
+                print(f"[{queue.worker_id}] {task.item}: lease lost, result not recorded.")
+                continue
+            completed += 1
+            print(f"[{queue.worker_id}] {task.item}: {result}")
+    return completed
+
+
+def drain(stage, output_folder, n_workers=4, queue_path=DEFAULT_QUEUE_PATH, lease_seconds=300):
+    """
+    Starts "n_workers" worker processes on this machine and waits until the stage has no pending tasks.
+    Tasks that other machines are still running are left to them (or requeued when their lease expires).
+    """
+    workers = [Process(target=run_worker, args=(stage, output_folder, queue_path, lease_seconds))
+               for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with WorkQueue(queue_path, lease_seconds) as queue:
+        counts = queue.counts(stage)
+        print(f"Stage {stage}: {counts}")
+        for item, error in queue.failed(stage):
+            print(f"Failed: {item}: {error}")
+    return counts
+
+
+def main():
+    # Adjust these paths as needed.
+    video_folder = "../data/0_videos/21_08_2023/mxf"
+    transnet_folder = "../data/1_TransNet_files"
+    n_workers = 2
+
+    video_paths = [os.path.abspath(os.path.join(video_folder, file)) for file in sorted(os.listdir(video_folder))
+                   if file.endswith((".mxf", ".mp4"))]
+
+    with WorkQueue() as queue:
+        print(f"Enqueued {queue.enqueue('transnet', video_paths)} new videos.")
+
+    drain("transnet", transnet_folder, n_workers)
+
+
+if __name__ == "__main__":
+    main()
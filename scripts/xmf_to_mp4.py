@@ -1,11 +1,20 @@
 import os
-from moviepy.editor import VideoFileClip
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from media_probe import probe_media
+
+# Codecs that can be stream-copied into an MP4 container without re-encoding. MPEG-2 covers the
+# broadcast MXF flavours (IMX, XDCAM); their PCM audio does not fit in MP4 and is re-encoded on its own.
+MP4_VIDEO_CODECS = {"h264", "hevc", "mpeg4", "av1", "mpeg1video", "mpeg2video"}
+MP4_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3", "alac"}
 
 def convert_mxf_to_mp4(mxf_file_path, output_folder):
     """
     Converts an MXF file to MP4 format and saves it to the specified output folder.
     Also outputs the sound of the input video.
     """
+    from moviepy.editor import VideoFileClip
+
     # Create the output folder if it doesn't exist
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
@@ -21,12 +30,117 @@ def convert_mxf_to_mp4(mxf_file_path, output_folder):
     # Write the video file in MP4 format
     video_clip.write_videofile(mp4_file_path, codec="libx264", audio_codec="aac")
 
-def main():
+def build_ingest_command(mxf_file_path, output_path, info, threads=2):
+    """
+    Builds the FFmpeg command for one file: stream copy for codecs that fit in MP4,
+    re-encoding (libx264/AAC) only for the streams that need it.
+
+    Returns:
+    - (cmd, mode): the command and "remuxed", "remuxed (audio re-encoded)" or "re-encoded".
+    """
+    copy_video = info["video_codec"] in MP4_VIDEO_CODECS
+    copy_audio = info["audio_codec"] is None or info["audio_codec"] in MP4_AUDIO_CODECS
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-y",
+        "-loglevel", "error",
+        "-threads", str(threads),
+        "-i", mxf_file_path,
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+    ]
+    cmd += ["-c:v", "copy"] if copy_video else ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+                                                "-threads", str(threads)]
+    cmd += ["-c:a", "copy"] if copy_audio else ["-c:a", "aac"]
+    cmd += ["-movflags", "+faststart", "-f", "mp4", output_path]
+    if not copy_video:
+        return cmd, "re-encoded"
+    return cmd, "remuxed" if copy_audio else "remuxed (audio re-encoded)"
+
+def is_valid_output(mp4_file_path, source_info, duration_tolerance=0.5, frame_tolerance=2):
+    """
+    Checks that a converted file has the same duration and frame count as its source,
+    instead of only checking that the file exists.
+    """
+    if not os.path.exists(mp4_file_path):
+        return False
+    try:
+        output_info = probe_media(mp4_file_path, count_frames=True)
+    except RuntimeError:
+        return False
+    return (abs(output_info["duration"] - source_info["duration"]) <= duration_tolerance
+            and abs(output_info["frame_count"] - source_info["frame_count"]) <= frame_tolerance)
+
+def ingest_mxf(mxf_file_path, output_folder, threads=2):
+    """
+    Converts an MXF file to MP4 by remuxing (stream copy) when the codecs allow it and
+    re-encoding otherwise. The output is written to a temporary file and only moved into
+    place after it has been validated by duration and frame count.
+
+    Returns:
+    - str: "skipped" or the mode of "build_ingest_command".
+    """
+    base_name = os.path.splitext(os.path.basename(mxf_file_path))[0]
+    mp4_file_path = os.path.join(output_folder, base_name + ".mp4")
+    source_info = probe_media(mxf_file_path, count_frames=True)
+
+    if is_valid_output(mp4_file_path, source_info):
+        return "skipped"
+
+    partial_path = os.path.join(output_folder, base_name + ".part.mp4")
+    cmd, mode = build_ingest_command(mxf_file_path, partial_path, source_info, threads)
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed for {mxf_file_path}: {process.stderr.decode(errors='replace')}")
+
+    if not is_valid_output(partial_path, source_info):
+        os.remove(partial_path)
+        raise RuntimeError(f"Converted file of {mxf_file_path} does not match the source duration/frame count.")
+
+    os.replace(partial_path, mp4_file_path)
+    return mode
+
+def ingest_folder(mxf_folder, output_folder, max_workers=4, threads_per_job=2):
+    """
+    Converts all MXF files in a folder with a bounded pool of FFmpeg workers.
+    Each FFmpeg job is capped at "threads_per_job" threads, so max_workers * threads_per_job
+    should roughly match the number of cores. A failing file (FFmpeg, ffprobe or file system
+    error) is reported and the others are still converted.
+
+    Returns:
+    - dict: file name -> error message, for the files that failed.
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    mxf_files = [os.path.join(mxf_folder, file) for file in sorted(os.listdir(mxf_folder)) if file.endswith(".mxf")]
+
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(ingest_mxf, path, output_folder, threads_per_job): path for path in mxf_files}
+        for future in as_completed(futures):
+            file = os.path.basename(futures[future])
+            try:
+                print(f"{file}: {future.result()}.")
+            except Exception as e:
+                failed[file] = f"{type(e).__name__}: {e}"
+                print(f"Error converting {file}: {failed[file]}")
+
+    if failed:
+        print(f"{len(failed)} of {len(mxf_files)} files failed: {', '.join(sorted(failed))}")
+    return failed
+
+def main(mode="remux"):
     # Folder containing MXF files
     mxf_folder = "../data/21_08_2023"
     # Output folder for MP4 files
     output_folder = "../data/conversions"
 
+    if mode == "remux":
+        # Probe each file, stream-copy when possible and validate the outputs
+        ingest_folder(mxf_folder, output_folder, max_workers=4, threads_per_job=2)
+        return
+
     # Get a list of all files already converted to MP4 in the output folder
     already_converted = {file for file in os.listdir(output_folder) if file.endswith(".mp4")}
 
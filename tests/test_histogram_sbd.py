@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from histogram_sbd import detect_transitions, histogram_differences, transitions_to_scenes
+
+
+def test_cut_starts_the_next_shot():
+    scenes = transitions_to_scenes([(100, 100)], 200)
+    assert scenes.tolist() == [[0, 99], [100, 199]]
+
+
+def test_gradual_transition_frames_belong_to_no_shot():
+    scenes = transitions_to_scenes([(100, 104)], 200)
+    assert scenes.tolist() == [[0, 99], [105, 199]]
+
+
+def test_no_transitions():
+    assert transitions_to_scenes([], 50).tolist() == [[0, 49]]
+
+
+def synthetic_scene(n_frames, seed):
+    # Smooth color gradients with a little noise and a slow brightness change
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:72, 0:96]
+    base = np.stack([rng.uniform(20, 235) + rng.uniform(-1, 1) * x + rng.uniform(-1, 1) * y for _ in range(3)],
+                    axis=2)
+    return np.stack([np.clip(base + rng.normal(0, 1, base.shape) + 2 * np.sin(i / 7), 0, 255)
+                     for i in range(n_frames)])
+
+
+def test_hard_cut_is_one_cut():
+    frames = np.concatenate((synthetic_scene(150, 1), synthetic_scene(150, 2))).astype(np.uint8)
+    transitions, _ = detect_transitions(histogram_differences([(0, frames)]))
+    assert transitions == [(150, 150)]
+
+
+def test_dissolve_is_one_gradual_transition():
+    first, second = synthetic_scene(210, 1), synthetic_scene(190, 2)
+    weights = np.linspace(0, 1, 32)[1:-1]
+    dissolve = [(1 - w) * first[180 + i] + w * second[i] for i, w in enumerate(weights)]
+    frames = np.concatenate((first[:180], dissolve, second[30:])).astype(np.uint8)
+
+    transitions, _ = detect_transitions(histogram_differences([(0, frames)]))
+    assert len(transitions) == 1
+    start, end = transitions[0]
+    assert start < end
+    assert 175 <= start <= 185 and 205 <= end <= 215
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts", "LDA_pipeline"))
+from pelt import MeanShiftCost, pelt
+
+
+def optimal_partitioning(features, penalty, min_size):
+    # Unpruned O(n^2) dynamic program over all start points
+    cost = MeanShiftCost(features)
+    n = cost.n
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    for end in range(min_size, n + 1):
+        for start in [0] + list(range(min_size, end - min_size + 1)):
+            best[end] = min(best[end], best[start] + cost.cost(np.array([start]), end)[0] + penalty)
+    return best[n]
+
+
+def test_pelt_matches_optimal_partitioning():
+    rng = np.random.default_rng(0)
+    for trial in range(25):
+        n = int(rng.integers(10, 50))
+        features = rng.normal(size=(n, 2)) + np.repeat(rng.normal(scale=2, size=(4, 2)), (n + 3) // 4, axis=0)[:n]
+        penalty = float(rng.uniform(0.5, 10))
+        for min_size in (1, 2, 3, 4, 7):
+            boundaries, total_cost = pelt(features, penalty, min_size=min_size)
+            np.testing.assert_allclose(total_cost + penalty * len(boundaries),
+                                       optimal_partitioning(features, penalty, min_size), rtol=1e-9, atol=1e-9)
+            segments = np.diff([0] + boundaries + [n])
+            assert segments.min() >= min_size
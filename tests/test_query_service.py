@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from query_service import QueryService, make_handler
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "TAPE.mxf.scenes.txt").write_text("0 99\n100 199\n")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(QueryService(str(tmp_path))))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url + "/batch", data=json.dumps(body).encode(), method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("body", [{"video": "TAPE"}, "TAPE", 3, ["TAPE"], [{"video": "TAPE"}, None]])
+def test_batch_rejects_bodies_that_are_not_lists_of_objects(server, body):
+    status, data = post(server, body)
+    assert status == 400
+    assert "error" in data
+
+
+def test_batch_answers_each_request(server):
+    status, data = post(server, [{"video": "TAPE", "start": 50, "end": 120, "unit": "frame"},
+                                 {"video": "OTHER", "start": 0, "end": 1, "unit": "frame"},
+                                 {"video": "TAPE", "start": None, "end": 1, "unit": "frame"}])
+    assert status == 200
+    assert [shot["shot"] for shot in data[0]["shots"]] == [0, 1]
+    assert "error" in data[1] and "error" in data[2]
@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from shot_classifier import find_annotated_videos, split_videos
+
+
+def make_annotations(root, folder, videos):
+    for video in videos:
+        os.makedirs(os.path.join(root, folder, video))
+        open(os.path.join(root, folder, video, f"{video}.eaf"), "w").close()
+    return os.path.join(root, folder)
+
+
+def test_video_in_both_annotation_folders_is_used_once(tmp_path):
+    transnet_folder = tmp_path / "transnet"
+    transnet_folder.mkdir()
+    for video in ("A", "B", "C", "D"):
+        (transnet_folder / f"{video}.mxf.scenes.txt").write_text("0 99\n")
+    sbd = make_annotations(str(tmp_path), "SBD", ["A", "B", "D"])
+    caspian = make_annotations(str(tmp_path), "caspian", ["B", "C", "D"])
+
+    videos = find_annotated_videos([sbd, caspian], str(transnet_folder))
+    names = [video for video, _, _, _ in videos]
+    assert sorted(names) == ["A", "B", "C", "D"]
+    assert dict((video, eaf_path) for video, eaf_path, _, _ in videos)["B"].startswith(sbd)
+
+    train_videos, test_videos = split_videos(videos, n_test_videos=2)
+    train_names = {video for video, _, _, _ in train_videos}
+    test_names = {video for video, _, _, _ in test_videos}
+    assert not train_names & test_names
+    assert train_names | test_names == set(names)